@@ -0,0 +1,158 @@
+"""
+Рассылка новых цен подписчикам Server-Sent Events в процессе API.
+
+PriceBroadcaster получает пачки цен от PriceEventListener (Redis pub/sub,
+см. app.cache.events) и раскладывает их по очередям подписчиков нужных
+тикеров. Событие сериализуется один раз на цену, а не на подписчика.
+
+У каждого подписчика ограниченная очередь: если клиент не успевает читать,
+самые старые события вытесняются новыми, поэтому медленный клиент не
+задерживает рассылку остальным и не раздувает память процесса.
+"""
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.api.schemas import PriceResponse
+from app.cache.latest_price import latest_price_cache
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Пауза переподключения для EventSource, миллисекунды
+SSE_RETRY_MS = 3000
+# Максимум событий, отправляемых клиенту одной порцией
+SSE_DRAIN_LIMIT = 100
+
+
+class TooManySubscribersError(Exception):
+    """Достигнут лимит подписчиков процесса API."""
+
+
+def format_price_event(price: PriceResponse) -> bytes:
+    """Событие SSE с ценой в формате PriceResponse."""
+    return b"event: price\ndata: " + price.model_dump_json().encode() + b"\n\n"
+
+
+class PriceSubscription:
+    """Подписка клиента на тикеры с ограниченной очередью событий."""
+
+    def __init__(self, tickers: Iterable[str], queue_size: int):
+        """Инициализация подписки."""
+        self.tickers = frozenset(tickers)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def put(self, event: bytes) -> None:
+        """Добавить событие, вытеснив самое старое при переполнении."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get_many(self, limit: int = SSE_DRAIN_LIMIT) -> List[bytes]:
+        """Дождаться события и забрать вместе с ним уже накопленные."""
+        events = [await self.queue.get()]
+        while len(events) < limit and not self.queue.empty():
+            events.append(self.queue.get_nowait())
+        return events
+
+
+class PriceBroadcaster:
+    """Рассылка цен подписчикам по тикерам."""
+
+    def __init__(self, queue_size: Optional[int] = None, max_subscribers: Optional[int] = None):
+        """Инициализация рассылки."""
+        self.queue_size = queue_size or settings.sse_queue_size
+        self.max_subscribers = max_subscribers or settings.sse_max_subscribers
+        self._subscribers: Dict[str, Set[PriceSubscription]] = {}
+        self._subscriptions: Set[PriceSubscription] = set()
+        self._last_moments: Dict[str, Tuple[int, int]] = {}
+
+    @property
+    def subscriber_count(self) -> int:
+        """Число активных подписок."""
+        return len(self._subscriptions)
+
+    @property
+    def is_full(self) -> bool:
+        """Достигнут ли лимит подписчиков."""
+        return self.subscriber_count >= self.max_subscribers
+
+    def subscribe(self, tickers: Iterable[str]) -> PriceSubscription:
+        """
+        Подписаться на тикеры.
+
+        Raises:
+            TooManySubscribersError: Достигнут лимит подписчиков
+        """
+        if self.is_full:
+            raise TooManySubscribersError(f"Subscriber limit reached ({self.max_subscribers})")
+        subscription = PriceSubscription(tickers, self.queue_size)
+        self._subscriptions.add(subscription)
+        for ticker in subscription.tickers:
+            self._subscribers.setdefault(ticker, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: PriceSubscription) -> None:
+        """Отменить подписку."""
+        self._subscriptions.discard(subscription)
+        for ticker in subscription.tickers:
+            subscribers = self._subscribers.get(ticker)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[ticker]
+        if subscription.dropped:
+            logger.info(f"Slow SSE subscriber dropped {subscription.dropped} events")
+
+    def publish(self, prices: Iterable[PriceResponse]) -> None:
+        """Разослать пачку цен подписчикам (обработчик событий ingestion)."""
+        for price in prices:
+            # Цены старее уже разосланной по тикеру не считаются новыми
+            moment = (price.timestamp, price.timestamp_ms)
+            if moment < self._last_moments.get(price.ticker, (0, 0)):
+                continue
+            self._last_moments[price.ticker] = moment
+            subscribers = self._subscribers.get(price.ticker)
+            if not subscribers:
+                continue
+            event = format_price_event(price)
+            for subscription in subscribers:
+                subscription.put(event)
+
+
+price_broadcaster = PriceBroadcaster()
+
+
+async def stream_price_events(
+    broadcaster: PriceBroadcaster,
+    tickers: List[str],
+    heartbeat_interval: Optional[float] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Генератор тела ответа SSE.
+
+    Сначала отправляются последние цены из кэша, затем новые цены по мере
+    поступления. При отсутствии событий раз в heartbeat_interval секунд
+    отправляется комментарий, чтобы прокси не закрывали соединение.
+    Подписка снимается при отключении клиента.
+    """
+    heartbeat_interval = heartbeat_interval or settings.sse_heartbeat_interval
+    subscription = broadcaster.subscribe(tickers)
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n".encode()
+        for ticker in tickers:
+            cached = latest_price_cache.get(ticker)
+            if cached is not None:
+                yield format_price_event(cached.price)
+        while True:
+            try:
+                events = await asyncio.wait_for(subscription.get_many(), heartbeat_interval)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            yield b"".join(events)
+    finally:
+        broadcaster.unsubscribe(subscription)
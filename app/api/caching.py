@@ -0,0 +1,132 @@
+"""
+HTTP-кэширование ответов /api/prices/* (ETag, Last-Modified, 304).
+
+Валидаторы строятся по водяному знаку тикера - моменту его последней
+цены (секунды с долями из timestamp_ms, чтобы ETag менялся и при
+нескольких ценах в пределах секунды). Last-Modified и If-Modified-Since
+сравниваются с точностью до секунды, как того требует формат даты
+HTTP. Пока новых цен нет, ETag и Last-Modified не меняются, и повторный
+запрос с If-None-Match/If-Modified-Since получает 304 без чтения строк.
+Водяной знак берется из кэша последних цен, при промахе - одним
+запросом последней записи по индексу.
+
+У закрытых диапазонов /filter (end_date раньше водяного знака) валидаторы
+строятся по данным диапазона - числу строк, последнему моменту, created_at
+и версиям архивных файлов, - поэтому опоздавшая запись (перенос журнала,
+смена шарда, архивирование) меняет ETag. Cache-Control immutable для CDN
+отдается, только когда конец диапазона старше горизонта settle_horizon().
+"""
+import hashlib
+from datetime import timezone
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, Optional
+from fastapi import Request, Response
+
+from app.api.schemas import PriceResponse
+from app.cache.latest_price import latest_price_cache
+from app.config import settings
+from app.db.crud import PriceRepository
+
+
+def price_watermark(price: Any) -> float:
+    """Водяной знак цены: timestamp с долями секунды из timestamp_ms."""
+    return price.timestamp + (price.timestamp_ms or 0) / 1000
+
+
+async def load_latest_price(repository: PriceRepository, ticker: str) -> Optional[PriceResponse]:
+    """Последняя цена тикера из кэша, при промахе - из БД (с наполнением кэша)."""
+    cached = latest_price_cache.get(ticker)
+    if cached is not None:
+        return cached.price
+    latest = await repository.get_latest_by_ticker(ticker)
+    if latest is None:
+        return None
+    price = PriceResponse.model_validate(latest)
+    latest_price_cache.set(price)
+    return price
+
+
+async def get_price_watermark(repository: PriceRepository, ticker: str) -> Optional[float]:
+    """Водяной знак последней цены тикера или None, если цен нет."""
+    latest = await load_latest_price(repository, ticker)
+    return price_watermark(latest) if latest is not None else None
+
+
+def settle_horizon() -> float:
+    """
+    Секунды после момента цены, в течение которых она еще может быть записана.
+
+    По умолчанию - интервал переноса журнала ingestion плюс интервал опроса
+    (HTTP_CACHE_SETTLE_SECONDS переопределяет значение).
+    """
+    if settings.http_cache_settle_seconds is not None:
+        return settings.http_cache_settle_seconds
+    return settings.ingest_buffer_drain_interval + settings.poll_interval
+
+
+def http_date(timestamp: float) -> str:
+    """UNIX timestamp в формате даты HTTP."""
+    return formatdate(timestamp, usegmt=True)
+
+
+def make_etag(request: Request, watermark: Optional[float], variant: str = "") -> str:
+    """
+    ETag представления: путь, параметры запроса, вариант и водяной знак.
+
+    Args:
+        request: Запрос
+        watermark: Водяной знак данных ответа
+        variant: Дополнительный признак представления (например, MIME-тип)
+    """
+    query = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    digest = hashlib.sha1(f"{request.url.path}?{query}|{variant}|{watermark}".encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def cache_headers(
+    request: Request,
+    watermark: Optional[float],
+    max_age: int,
+    immutable: bool = False,
+    variant: str = "",
+) -> Dict[str, str]:
+    """Заголовки ETag, Last-Modified и Cache-Control для ответа."""
+    cache_control = f"public, max-age={max_age}"
+    if immutable:
+        cache_control += ", immutable"
+    headers = {
+        "ETag": make_etag(request, watermark, variant),
+        "Cache-Control": cache_control,
+    }
+    if watermark is not None:
+        headers["Last-Modified"] = http_date(watermark)
+    return headers
+
+
+def is_not_modified(request: Request, headers: Dict[str, str], watermark: Optional[float]) -> bool:
+    """
+    Проверить условный запрос.
+
+    If-None-Match имеет приоритет; If-Modified-Since учитывается только без
+    него (RFC 9110).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or headers["ETag"] in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or watermark is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return int(watermark) <= int(since.timestamp())
+
+
+def not_modified_response(headers: Dict[str, str]) -> Response:
+    """Ответ 304 с валидаторами."""
+    return Response(status_code=304, headers=headers)
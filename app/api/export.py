@@ -0,0 +1,75 @@
+import csv
+import io
+import json
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.db.crud import PriceRepository
+
+EXPORT_COLUMNS = ("id", "ticker", "price", "timestamp", "timestamp_ms", "created_at")
+
+
+def encode_ndjson(rows: List[Row]) -> bytes:
+    """Сериализовать порцию строк в NDJSON (по объекту на строку)."""
+    lines = [
+        json.dumps({
+            "id": row.id,
+            "ticker": row.ticker,
+            "price": str(row.price),
+            "timestamp": row.timestamp,
+            "timestamp_ms": row.timestamp_ms,
+            "created_at": row.created_at.isoformat(),
+        })
+        for row in rows
+    ]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def encode_csv(rows: List[Row]) -> bytes:
+    """Сериализовать порцию строк в CSV без заголовка."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(
+        (row.id, row.ticker, str(row.price), row.timestamp, row.timestamp_ms, row.created_at.isoformat())
+        for row in rows
+    )
+    return buffer.getvalue().encode()
+
+
+class ExportFormat(NamedTuple):
+    """Формат выгрузки: MIME-тип, заголовок и кодировщик порции строк."""
+
+    media_type: str
+    header: bytes
+    encode: Callable[[List[Row]], bytes]
+
+
+EXPORT_FORMATS: Dict[str, ExportFormat] = {
+    "ndjson": ExportFormat("application/x-ndjson", b"", encode_ndjson),
+    "csv": ExportFormat("text/csv", (",".join(EXPORT_COLUMNS) + "\r\n").encode(), encode_csv),
+}
+
+
+async def stream_export(
+    session_factory: async_sessionmaker,
+    export_format: ExportFormat,
+    ticker: str,
+    start_timestamp: Optional[int],
+    end_timestamp: Optional[int],
+) -> AsyncIterator[bytes]:
+    """
+    Генератор тела ответа выгрузки.
+
+    Сессия открывается внутри генератора и живет, пока отправляется ответ.
+    """
+    if export_format.header:
+        yield export_format.header
+    async with session_factory() as session:
+        repository = PriceRepository(session)
+        async for partition in repository.stream_by_ticker_and_date_range(
+            ticker,
+            start_timestamp=start_timestamp,
+            end_timestamp=end_timestamp,
+        ):
+            yield export_format.encode(partition)
@@ -0,0 +1,130 @@
+"""
+Форматы ответов со списками цен и выбор формата по заголовку Accept.
+
+Поддерживаемые типы для /api/prices/all и /api/prices/filter:
+
+- application/json - список объектов PriceListResponse (по умолчанию);
+- application/vnd.deribit.prices.columnar+json - колонки
+  {"ticker", "count", "timestamps", "timestamps_ms", "prices", "next_cursor"};
+- application/msgpack (application/x-msgpack) - те же колонки в MessagePack;
+- application/vnd.apache.arrow.stream - Arrow IPC stream со столбцами
+  timestamp (int64), timestamp_ms (int16) и price (decimal128(20, 8));
+  ticker и next_cursor передаются в метаданных схемы.
+
+В колоночных JSON и MessagePack цены - строки Decimal, как и в PriceResponse.
+"""
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+import msgpack
+import orjson
+import pyarrow as pa
+
+from app.api.serialization import dumps_price_list
+
+ARROW_SCHEMA = pa.schema([
+    ("timestamp", pa.int64()),
+    ("timestamp_ms", pa.int16()),
+    ("price", pa.decimal128(20, 8)),
+])
+
+
+def price_columns(ticker: str, rows: Sequence[Sequence], next_cursor: Optional[str] = None) -> dict:
+    """Колоночное представление строк цен."""
+    return {
+        "ticker": ticker,
+        "count": len(rows),
+        "timestamps": [row[3] for row in rows],
+        "timestamps_ms": [row[5] for row in rows],
+        "prices": [str(row[2]) for row in rows],
+        "next_cursor": next_cursor,
+    }
+
+
+def dumps_columnar_json(ticker: str, rows: Sequence[Sequence], next_cursor: Optional[str] = None) -> bytes:
+    """Сериализовать строки цен в колоночный JSON."""
+    return orjson.dumps(price_columns(ticker, rows, next_cursor))
+
+
+def dumps_msgpack(ticker: str, rows: Sequence[Sequence], next_cursor: Optional[str] = None) -> bytes:
+    """Сериализовать строки цен в колоночный MessagePack."""
+    return msgpack.packb(price_columns(ticker, rows, next_cursor))
+
+
+def dumps_arrow(ticker: str, rows: Sequence[Sequence], next_cursor: Optional[str] = None) -> bytes:
+    """Сериализовать строки цен в Arrow IPC stream."""
+    metadata = {"ticker": ticker}
+    if next_cursor:
+        metadata["next_cursor"] = next_cursor
+    schema = ARROW_SCHEMA.with_metadata(metadata)
+    table = pa.Table.from_arrays(
+        [
+            pa.array([row[3] for row in rows], type=pa.int64()),
+            pa.array([row[5] for row in rows], type=pa.int16()),
+            pa.array([row[2] for row in rows], type=pa.decimal128(20, 8)),
+        ],
+        schema=schema,
+    )
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class PriceFormat(NamedTuple):
+    """Формат ответа: MIME-тип и сериализатор строк цен."""
+
+    media_type: str
+    render: Callable[[str, Sequence[Sequence], Optional[str]], bytes]
+
+
+JSON_FORMAT = PriceFormat("application/json", dumps_price_list)
+COLUMNAR_JSON_FORMAT = PriceFormat("application/vnd.deribit.prices.columnar+json", dumps_columnar_json)
+MSGPACK_FORMAT = PriceFormat("application/msgpack", dumps_msgpack)
+ARROW_FORMAT = PriceFormat("application/vnd.apache.arrow.stream", dumps_arrow)
+
+# Порядок определяет выбор при Accept: */* и application/*
+PRICE_FORMATS: Dict[str, PriceFormat] = {
+    JSON_FORMAT.media_type: JSON_FORMAT,
+    COLUMNAR_JSON_FORMAT.media_type: COLUMNAR_JSON_FORMAT,
+    MSGPACK_FORMAT.media_type: MSGPACK_FORMAT,
+    "application/x-msgpack": MSGPACK_FORMAT,
+    ARROW_FORMAT.media_type: ARROW_FORMAT,
+}
+
+
+def parse_accept(accept: str) -> List[str]:
+    """Медиа-типы из заголовка Accept по убыванию q (q=0 исключаются)."""
+    ranges = []
+    for position, item in enumerate(accept.split(",")):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        if not media_type:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            ranges.append((-quality, position, media_type.lower()))
+    return [media_type for _, _, media_type in sorted(ranges)]
+
+
+def negotiate_price_format(accept: Optional[str]) -> PriceFormat:
+    """
+    Выбрать формат ответа по заголовку Accept.
+
+    Без заголовка, а также для */* и application/* выбирается JSON.
+
+    Raises:
+        ValueError: Ни один из запрошенных типов не поддерживается
+    """
+    if not accept:
+        return JSON_FORMAT
+    for media_type in parse_accept(accept):
+        if media_type in PRICE_FORMATS:
+            return PRICE_FORMATS[media_type]
+        if media_type in ("*/*", "application/*"):
+            return JSON_FORMAT
+    raise ValueError(f"Acceptable formats: {sorted(PRICE_FORMATS)}")
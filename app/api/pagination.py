@@ -0,0 +1,23 @@
+import base64
+from typing import Tuple
+
+
+def encode_cursor(timestamp: int, price_id: int) -> str:
+    """Закодировать позицию (timestamp, id) в непрозрачный курсор."""
+    raw = f"{timestamp}:{price_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    """
+    Раскодировать курсор в позицию (timestamp, id).
+
+    Raises:
+        ValueError: Если курсор поврежден
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, price_id = base64.urlsafe_b64decode(padded.encode()).decode().split(":")
+        return int(timestamp), int(price_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
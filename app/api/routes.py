@@ -1,17 +1,37 @@
 import logging
+import time
 from datetime import datetime
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from app.api.schemas import (
     DateFilterQuery,
+    OHLCResponse,
+    PriceLatestManyResponse,
     PriceLatestResponse,
     PriceListResponse,
+    PriceResponse,
     TickerQuery,
 )
-from app.db.crud import PriceRepository
-from app.db.database import get_db
+from app.api.broadcast import price_broadcaster, stream_price_events
+from app.api.caching import (
+    cache_headers,
+    get_price_watermark,
+    is_not_modified,
+    load_latest_price,
+    not_modified_response,
+    price_watermark,
+    settle_horizon,
+)
+from app.api.export import EXPORT_FORMATS, stream_export
+from app.api.formats import PriceFormat, negotiate_price_format
+from app.api.pagination import decode_cursor, encode_cursor
+from app.cache.latest_price import latest_price_cache
+from app.config import settings
+from app.db.crud import OHLC_INTERVALS, PriceRepository
+from app.db.database import get_db, get_session_factory
 
 logger = logging.getLogger(__name__)
 
@@ -46,24 +66,95 @@ def parse_timestamp(date_str: Optional[str]) -> Optional[int]:
         )
 
 
+def resolve_date_range(
+    date: Optional[str],
+    start_date: Optional[str],
+    end_date: Optional[str],
+) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Получить диапазон UNIX timestamp из параметров запроса.
+
+    Если указана конкретная дата, диапазон охватывает сутки от нее.
+    """
+    start_timestamp = None
+    end_timestamp = None
+
+    if date:
+        # Если указана конкретная дата, используем её как начало и конец дня
+        date_timestamp = parse_timestamp(date)
+        if date_timestamp:
+            # Начало дня
+            start_timestamp = date_timestamp
+            # Конец дня (добавляем 86400 секунд = 24 часа)
+            end_timestamp = date_timestamp + 86400
+    else:
+        if start_date:
+            start_timestamp = parse_timestamp(start_date)
+        if end_date:
+            end_timestamp = parse_timestamp(end_date)
+
+        if start_timestamp and end_timestamp and start_timestamp > end_timestamp:
+            raise HTTPException(
+                status_code=400,
+                detail="start_date must be less than or equal to end_date",
+            )
+
+    return start_timestamp, end_timestamp
+
+
+def resolve_price_format(accept: Optional[str]) -> PriceFormat:
+    """Выбрать формат списка цен по заголовку Accept (406, если не поддерживается)."""
+    try:
+        return negotiate_price_format(accept)
+    except ValueError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+
+def price_list_response(
+    price_format: PriceFormat,
+    ticker: str,
+    rows: list,
+    next_cursor: Optional[str] = None,
+    headers: Optional[dict] = None,
+) -> Response:
+    """Ответ со списком цен в выбранном формате."""
+    # Строки сериализуются напрямую, без ORM-объектов и валидации pydantic
+    return Response(
+        content=price_format.render(ticker, rows, next_cursor),
+        media_type=price_format.media_type,
+        headers=headers,
+    )
+
+
 @router.get("/all", response_model=PriceListResponse)
 async def get_all_prices(
-    ticker: str = Query(..., description="Тикер валюты (BTC_USD или ETH_USD)"),
-    limit: Optional[int] = Query(None, ge=1, le=1000, description="Лимит записей"),
-    offset: int = Query(0, ge=0, description="Смещение для пагинации"),
+    request: Request,
+    ticker: str = Query(..., description="Тикер индекса Deribit (например, BTC_USD)"),
+    limit: int = Query(
+        settings.api_default_page_size,
+        ge=1,
+        le=settings.api_max_page_size,
+        description="Размер страницы",
+    ),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor из ответа)"),
+    offset: int = Query(0, ge=0, description="Смещение для пагинации (устарело, используйте cursor)", deprecated=True),
+    accept: Optional[str] = Header(None, description="Формат ответа: JSON, колоночный JSON, MessagePack или Arrow IPC"),
     db: AsyncSession = Depends(get_db),
 ):
     """
-    Получить все сохраненные данные по указанной валюте.
+    Получить сохраненные данные по указанной валюте постранично.
 
     Args:
+        request: Запрос (условные заголовки)
         ticker: Тикер валюты (обязательный параметр)
-        limit: Максимальное количество записей
+        limit: Размер страницы
+        cursor: Курсор следующей страницы
         offset: Смещение для пагинации
+        accept: Заголовок Accept
         db: Сессия базы данных
 
     Returns:
-        Список всех цен для указанного тикера
+        Страница цен для указанного тикера и курсор следующей страницы
     """
     # Валидация тикера
     try:
@@ -72,25 +163,58 @@ async def get_all_prices(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    price_format = resolve_price_format(accept)
+
+    position = None
+    if cursor:
+        if offset:
+            raise HTTPException(status_code=400, detail="cursor and offset cannot be used together")
+        try:
+            position = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     repository = PriceRepository(db)
-    prices = await repository.get_all_by_ticker(validated_ticker, limit=limit, offset=offset)
+    watermark = await get_price_watermark(repository, validated_ticker)
+    headers = cache_headers(
+        request,
+        watermark,
+        max_age=settings.http_cache_max_age_series,
+        variant=price_format.media_type,
+    )
+    headers["Vary"] = "Accept"
+    if is_not_modified(request, headers, watermark):
+        return not_modified_response(headers)
 
-    return PriceListResponse(
-        ticker=validated_ticker,
-        count=len(prices),
-        prices=prices,
+    rows, next_position = await repository.get_page_rows_by_ticker(
+        validated_ticker,
+        limit=limit,
+        cursor=position,
+        offset=offset,
+    )
+
+    return price_list_response(
+        price_format,
+        validated_ticker,
+        rows,
+        next_cursor=encode_cursor(*next_position) if next_position else None,
+        headers=headers,
     )
 
 
 @router.get("/latest", response_model=PriceLatestResponse)
 async def get_latest_price(
-    ticker: str = Query(..., description="Тикер валюты (BTC_USD или ETH_USD)"),
+    request: Request,
+    response: Response,
+    ticker: str = Query(..., description="Тикер индекса Deribit (например, BTC_USD)"),
     db: AsyncSession = Depends(get_db),
 ):
     """
     Получить последнюю цену валюты.
 
     Args:
+        request: Запрос (условные заголовки)
+        response: Ответ (заголовки кэширования)
         ticker: Тикер валюты (обязательный параметр)
         db: Сессия базы данных
 
@@ -104,31 +228,146 @@ async def get_latest_price(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    repository = PriceRepository(db)
-    latest_price = await repository.get_latest_by_ticker(validated_ticker)
+    # Последняя цена обновляется событиями ingestion, БД - только при промахе
+    latest_price = await load_latest_price(PriceRepository(db), validated_ticker)
+    watermark = price_watermark(latest_price) if latest_price is not None else None
+    headers = cache_headers(request, watermark, max_age=settings.http_cache_max_age_latest)
+    if is_not_modified(request, headers, watermark):
+        return not_modified_response(headers)
+
+    # Готовое тело из кэша подходит, только если оно для той же цены, что и валидаторы
+    cached = latest_price_cache.get(validated_ticker)
+    if cached is not None and cached.price is latest_price:
+        return Response(content=cached.body, media_type="application/json", headers=headers)
 
+    response.headers.update(headers)
     return PriceLatestResponse(
         ticker=validated_ticker,
         price=latest_price,
     )
 
 
+@router.get("/latest/many", response_model=PriceLatestManyResponse)
+async def get_latest_prices(
+    request: Request,
+    response: Response,
+    ticker: List[str] = Query(..., description="Тикеры индексов (параметр можно повторять)"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Получить последние цены нескольких валют одним запросом.
+
+    Цены берутся из кэша последних цен, промахи читаются из БД одним
+    запросом (PriceRepository.get_latest_many).
+
+    Args:
+        request: Запрос (условные заголовки)
+        response: Ответ (заголовки кэширования)
+        ticker: Тикеры валют (обязательный параметр)
+        db: Сессия базы данных
+
+    Returns:
+        Последние цены в порядке запрошенных тикеров
+    """
+    # Валидация тикеров
+    try:
+        validated_tickers = list(dict.fromkeys(TickerQuery(ticker=item).ticker for item in ticker))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(validated_tickers) > settings.api_max_batch_tickers:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.api_max_batch_tickers} tickers per request",
+        )
+
+    prices = {}
+    missing = []
+    for validated_ticker in validated_tickers:
+        cached = latest_price_cache.get(validated_ticker)
+        if cached is not None:
+            prices[validated_ticker] = cached.price
+        else:
+            missing.append(validated_ticker)
+
+    if missing:
+        repository = PriceRepository(db)
+        for latest_price in await repository.get_latest_many(missing):
+            price = PriceResponse.model_validate(latest_price)
+            latest_price_cache.set(price)
+            prices[price.ticker] = price
+
+    watermark = max((price_watermark(price) for price in prices.values()), default=None)
+    headers = cache_headers(
+        request,
+        watermark,
+        max_age=settings.http_cache_max_age_latest,
+        variant=",".join(f"{name}:{price_watermark(price)}" for name, price in sorted(prices.items())),
+    )
+    if is_not_modified(request, headers, watermark):
+        return not_modified_response(headers)
+
+    response.headers.update(headers)
+    return PriceLatestManyResponse(
+        count=len(validated_tickers),
+        prices=[
+            PriceLatestResponse(ticker=validated_ticker, price=prices.get(validated_ticker))
+            for validated_ticker in validated_tickers
+        ],
+    )
+
+
+@router.get("/stream")
+async def stream_latest_prices(
+    ticker: List[str] = Query(..., description="Тикеры валют (параметр можно повторять)"),
+):
+    """
+    Поток новых цен по тикерам (Server-Sent Events).
+
+    Сначала отправляются последние известные цены, затем каждая новая цена,
+    сохраненная ingestion, событием `price` с телом PriceResponse.
+
+    Args:
+        ticker: Тикеры валют (обязательный параметр)
+
+    Returns:
+        Потоковый ответ text/event-stream
+    """
+    # Валидация тикеров
+    try:
+        validated_tickers = list(dict.fromkeys(TickerQuery(ticker=item).ticker for item in ticker))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if price_broadcaster.is_full:
+        raise HTTPException(status_code=503, detail="Too many subscribers, retry later")
+
+    return StreamingResponse(
+        stream_price_events(price_broadcaster, validated_tickers),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/filter", response_model=PriceListResponse)
 async def get_prices_by_date(
-    ticker: str = Query(..., description="Тикер валюты (BTC_USD или ETH_USD)"),
+    request: Request,
+    ticker: str = Query(..., description="Тикер индекса Deribit (например, BTC_USD)"),
     date: Optional[str] = Query(None, description="Конкретная дата (ISO 8601 или UNIX timestamp)"),
     start_date: Optional[str] = Query(None, description="Начальная дата (ISO 8601 или UNIX timestamp)"),
     end_date: Optional[str] = Query(None, description="Конечная дата (ISO 8601 или UNIX timestamp)"),
+    accept: Optional[str] = Header(None, description="Формат ответа: JSON, колоночный JSON, MessagePack или Arrow IPC"),
     db: AsyncSession = Depends(get_db),
 ):
     """
     Получить цены валюты с фильтром по дате.
 
     Args:
+        request: Запрос (условные заголовки)
         ticker: Тикер валюты (обязательный параметр)
         date: Конкретная дата для фильтрации
         start_date: Начальная дата диапазона
         end_date: Конечная дата диапазона
+        accept: Заголовок Accept
         db: Сессия базы данных
 
     Returns:
@@ -141,39 +380,160 @@ async def get_prices_by_date(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    # Парсинг дат
-    start_timestamp = None
-    end_timestamp = None
+    price_format = resolve_price_format(accept)
 
-    if date:
-        # Если указана конкретная дата, используем её как начало и конец дня
-        date_timestamp = parse_timestamp(date)
-        if date_timestamp:
-            # Начало дня
-            start_timestamp = date_timestamp
-            # Конец дня (добавляем 86400 секунд = 24 часа)
-            end_timestamp = date_timestamp + 86400
-    else:
-        if start_date:
-            start_timestamp = parse_timestamp(start_date)
-        if end_date:
-            end_timestamp = parse_timestamp(end_date)
+    start_timestamp, end_timestamp = resolve_date_range(date, start_date, end_date)
 
-        if start_timestamp and end_timestamp and start_timestamp > end_timestamp:
-            raise HTTPException(
-                status_code=400,
-                detail="start_date must be less than or equal to end_date",
-            )
+    repository = PriceRepository(db)
+    watermark = await get_price_watermark(repository, validated_ticker)
+    variant = price_format.media_type
+    immutable = False
+    # В диапазон, закончившийся раньше последней цены, еще могут дописываться
+    # опоздавшие записи, поэтому валидаторы строятся по его собственным данным
+    if end_timestamp is not None and watermark is not None and end_timestamp < int(watermark):
+        version = await repository.get_range_version(validated_ticker, start_timestamp, end_timestamp)
+        watermark = version.modified_at
+        variant = f"{variant}|{version.count}|{version.max_moment}|{version.archive}"
+        immutable = end_timestamp < time.time() - settle_horizon()
+    headers = cache_headers(
+        request,
+        watermark,
+        max_age=settings.http_cache_max_age_immutable if immutable else settings.http_cache_max_age_series,
+        immutable=immutable,
+        variant=variant,
+    )
+    headers["Vary"] = "Accept"
+    if is_not_modified(request, headers, watermark):
+        return not_modified_response(headers)
+
+    rows = await repository.get_rows_by_ticker_and_date_range(
+        validated_ticker,
+        start_timestamp=start_timestamp,
+        end_timestamp=end_timestamp,
+    )
+
+    return price_list_response(price_format, validated_ticker, rows, headers=headers)
+
+
+@router.get("/ohlc", response_model=OHLCResponse)
+async def get_ohlc(
+    request: Request,
+    response: Response,
+    ticker: str = Query(..., description="Тикер индекса Deribit (например, BTC_USD)"),
+    interval: str = Query("1h", description="Интервал свечи: 1m, 5m, 1h или 1d"),
+    start_date: Optional[str] = Query(None, description="Начальная дата (ISO 8601 или UNIX timestamp)"),
+    end_date: Optional[str] = Query(None, description="Конечная дата (ISO 8601 или UNIX timestamp)"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Получить свечи OHLC (а также среднюю цену и число записей) по интервалам.
+
+    Агрегация выполняется в БД. Если start_date не указан, берутся последние
+    ohlc_max_buckets интервалов до end_date (или до текущего момента).
+
+    Args:
+        request: Запрос (условные заголовки)
+        response: Ответ (заголовки кэширования)
+        ticker: Тикер валюты (обязательный параметр)
+        interval: Интервал свечи
+        start_date: Начальная дата диапазона
+        end_date: Конечная дата диапазона
+        db: Сессия базы данных
+
+    Returns:
+        Свечи по возрастанию времени начала интервала
+    """
+    # Валидация тикера
+    try:
+        ticker_query = TickerQuery(ticker=ticker)
+        validated_ticker = ticker_query.ticker
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    interval_seconds = OHLC_INTERVALS.get(interval)
+    if interval_seconds is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Interval must be one of {list(OHLC_INTERVALS)}",
+        )
+
+    start_timestamp, end_timestamp = resolve_date_range(None, start_date, end_date)
+    max_span = interval_seconds * settings.ohlc_max_buckets
+    if start_timestamp is None:
+        start_timestamp = (end_timestamp or int(time.time())) - max_span
+    elif (end_timestamp or int(time.time())) - start_timestamp > max_span:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range is too large for interval {interval}: at most {settings.ohlc_max_buckets} candles",
+        )
 
     repository = PriceRepository(db)
-    prices = await repository.get_by_ticker_and_date_range(
+    watermark = await get_price_watermark(repository, validated_ticker)
+    headers = cache_headers(request, watermark, max_age=settings.http_cache_max_age_series)
+    if is_not_modified(request, headers, watermark):
+        return not_modified_response(headers)
+
+    candles = await repository.get_ohlc(
         validated_ticker,
+        interval_seconds,
         start_timestamp=start_timestamp,
         end_timestamp=end_timestamp,
     )
 
-    return PriceListResponse(
+    response.headers.update(headers)
+    return OHLCResponse(
         ticker=validated_ticker,
-        count=len(prices),
-        prices=prices,
+        interval=interval,
+        count=len(candles),
+        candles=candles,
+    )
+
+
+@router.get("/export")
+async def export_prices(
+    ticker: str = Query(..., description="Тикер индекса Deribit (например, BTC_USD)"),
+    format: str = Query("ndjson", description="Формат выгрузки: ndjson или csv"),
+    date: Optional[str] = Query(None, description="Конкретная дата (ISO 8601 или UNIX timestamp)"),
+    start_date: Optional[str] = Query(None, description="Начальная дата (ISO 8601 или UNIX timestamp)"),
+    end_date: Optional[str] = Query(None, description="Конечная дата (ISO 8601 или UNIX timestamp)"),
+    session_factory: async_sessionmaker = Depends(get_session_factory),
+):
+    """
+    Потоковая выгрузка истории цен в NDJSON или CSV.
+
+    Строки читаются из БД серверным курсором и отправляются порциями по мере
+    чтения, поэтому память не зависит от размера диапазона.
+
+    Args:
+        ticker: Тикер валюты (обязательный параметр)
+        format: Формат выгрузки
+        date: Конкретная дата для фильтрации
+        start_date: Начальная дата диапазона
+        end_date: Конечная дата диапазона
+        session_factory: Фабрика сессий базы данных
+
+    Returns:
+        Потоковый ответ с ценами по возрастанию timestamp
+    """
+    # Валидация тикера
+    try:
+        ticker_query = TickerQuery(ticker=ticker)
+        validated_ticker = ticker_query.ticker
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    export_format = EXPORT_FORMATS.get(format.lower())
+    if export_format is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Format must be one of {set(EXPORT_FORMATS)}",
+        )
+
+    start_timestamp, end_timestamp = resolve_date_range(date, start_date, end_date)
+    filename = f"{validated_ticker}_{start_timestamp or 'start'}_{end_timestamp or 'end'}.{format.lower()}"
+
+    return StreamingResponse(
+        stream_export(session_factory, export_format, validated_ticker, start_timestamp, end_timestamp),
+        media_type=export_format.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
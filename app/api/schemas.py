@@ -4,6 +4,8 @@ from typing import List, Optional
 from pydantic import BaseModel, Field, field_validator, field_serializer
 from pydantic import ConfigDict
 
+from app.cache.instruments import instrument_registry
+
 
 class PriceResponse(BaseModel):
     """Схема ответа с данными о цене."""
@@ -14,6 +16,7 @@ class PriceResponse(BaseModel):
     ticker: str
     price: Decimal
     timestamp: int
+    timestamp_ms: int = 0
     created_at: datetime
 
     @field_serializer('price')
@@ -28,6 +31,7 @@ class PriceListResponse(BaseModel):
     ticker: str
     count: int
     prices: List[PriceResponse]
+    next_cursor: Optional[str] = None
 
 
 class PriceLatestResponse(BaseModel):
@@ -37,19 +41,53 @@ class PriceLatestResponse(BaseModel):
     price: Optional[PriceResponse] = None
 
 
+class PriceLatestManyResponse(BaseModel):
+    """Схема ответа с последними ценами нескольких тикеров."""
+
+    count: int
+    prices: List[PriceLatestResponse]
+
+
+class CandleResponse(BaseModel):
+    """Схема свечи OHLC."""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    bucket: int
+    open: Decimal
+    high: Decimal
+    low: Decimal
+    close: Decimal
+    mean: Decimal
+    count: int
+
+    @field_serializer("open", "high", "low", "close", "mean")
+    def serialize_price(self, value: Decimal) -> str:
+        """Сериализация цен в строку."""
+        return str(value)
+
+
+class OHLCResponse(BaseModel):
+    """Схема ответа со свечами OHLC."""
+
+    ticker: str
+    interval: str
+    count: int
+    candles: List[CandleResponse]
+
+
 class TickerQuery(BaseModel):
     """Схема для валидации query параметра ticker."""
 
-    ticker: str = Field(..., description="Тикер валюты (BTC_USD или ETH_USD)")
+    ticker: str = Field(..., description="Тикер индекса Deribit (например, BTC_USD)")
 
     @field_validator("ticker")
     @classmethod
     def validate_ticker(cls, v: str) -> str:
-        """Валидация тикера."""
-        valid_tickers = {"BTC_USD", "ETH_USD"}
+        """Валидация тикера по реестру инструментов."""
         ticker_upper = v.upper()
-        if ticker_upper not in valid_tickers:
-            raise ValueError(f"Ticker must be one of {valid_tickers}")
+        if ticker_upper not in instrument_registry:
+            raise ValueError(f"Unknown ticker: {ticker_upper}")
         return ticker_upper
 
 
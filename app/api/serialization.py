@@ -0,0 +1,42 @@
+"""
+Быстрая сериализация списков цен в JSON через orjson.
+
+Используется для строк PRICE_COLUMNS (id, ticker, price, timestamp,
+created_at, timestamp_ms) в обход валидации PriceResponse. Результат совпадает с JSON,
+который FastAPI строит по PriceListResponse: цена - строка Decimal,
+created_at - ISO 8601.
+"""
+from typing import Optional, Sequence
+import orjson
+
+
+def price_row_to_dict(row: Sequence) -> dict:
+    """Представление строки цены в формате PriceResponse."""
+    return {
+        "id": row[0],
+        "ticker": row[1],
+        "price": str(row[2]),
+        "timestamp": row[3],
+        "timestamp_ms": row[5],
+        "created_at": row[4],
+    }
+
+
+def dumps_price_list(ticker: str, rows: Sequence[Sequence], next_cursor: Optional[str] = None) -> bytes:
+    """
+    Сериализовать ответ PriceListResponse из строк цен.
+
+    Args:
+        ticker: Тикер валюты
+        rows: Строки PRICE_COLUMNS
+        next_cursor: Курсор следующей страницы
+
+    Returns:
+        Тело ответа в JSON
+    """
+    return orjson.dumps({
+        "ticker": ticker,
+        "count": len(rows),
+        "prices": [price_row_to_dict(row) for row in rows],
+        "next_cursor": next_cursor,
+    })
@@ -0,0 +1,117 @@
+"""
+Мост событий о новых ценах через Redis pub/sub.
+
+Ingestion (Celery задача, потоковый сервис) публикует сохраненные цены
+в канал price_events_channel, процессы API подписываются на него и
+обновляют локальный кэш последних цен.
+
+Публикация идет через долгоживущий клиент процесса (get_redis): пул
+соединений Redis создается один раз на event loop, а не на каждую пачку.
+"""
+import asyncio
+import json
+import logging
+from typing import Callable, Iterable, List, Optional
+from weakref import WeakKeyDictionary
+import redis.asyncio as redis
+
+from app.api.schemas import PriceResponse
+from app.config import settings
+from app.db.models import Price
+
+logger = logging.getLogger(__name__)
+
+PriceHandler = Callable[[List[PriceResponse]], None]
+
+# Клиент с пулом соединений привязан к event loop, в котором создан
+_clients: "WeakKeyDictionary[asyncio.AbstractEventLoop, redis.Redis]" = WeakKeyDictionary()
+
+
+def get_redis() -> redis.Redis:
+    """Клиент Redis процесса для текущего event loop (создается при первом обращении)."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = redis.from_url(settings.redis_url)
+    return client
+
+
+async def close_redis() -> None:
+    """Закрыть клиент Redis текущего event loop."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def publish_prices(prices: Iterable[Price]) -> None:
+    """
+    Опубликовать сохраненные цены для подписчиков.
+
+    Ошибки Redis не прерывают ingestion: кэш API все равно устареет по TTL.
+    """
+    if not settings.price_events_enabled:
+        return
+    payload = [PriceResponse.model_validate(price).model_dump(mode="json") for price in prices]
+    if not payload:
+        return
+    try:
+        await get_redis().publish(settings.price_events_channel, json.dumps(payload))
+    except Exception as e:
+        logger.warning(f"Failed to publish price events: {e}")
+
+
+class PriceEventListener:
+    """Подписчик на события о ценах с автоматическим переподключением."""
+
+    def __init__(
+        self,
+        handlers: Optional[List[PriceHandler]] = None,
+        on_connect: Optional[Callable[[], None]] = None,
+        url: Optional[str] = None,
+        channel: Optional[str] = None,
+        reconnect_delay: float = 1.0,
+        reconnect_max_delay: float = 30.0,
+    ):
+        """Инициализация подписчика."""
+        self.handlers = list(handlers or [])
+        self.on_connect = on_connect
+        self.url = url or settings.redis_url
+        self.channel = channel or settings.price_events_channel
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_max_delay = reconnect_max_delay
+
+    def add_handler(self, handler: PriceHandler) -> None:
+        """Добавить обработчик пачки цен."""
+        self.handlers.append(handler)
+
+    def dispatch(self, data: str) -> None:
+        """Разобрать сообщение и передать цены обработчикам."""
+        prices = [PriceResponse.model_validate(item) for item in json.loads(data)]
+        for handler in self.handlers:
+            try:
+                handler(prices)
+            except Exception as e:
+                logger.error(f"Price event handler failed: {e}", exc_info=True)
+
+    async def run(self) -> None:
+        """Слушать канал до отмены задачи."""
+        delay = self.reconnect_delay
+        while True:
+            try:
+                async with redis.from_url(self.url, decode_responses=True) as client:
+                    async with client.pubsub() as pubsub:
+                        await pubsub.subscribe(self.channel)
+                        logger.info(f"Subscribed to price events on {self.channel}")
+                        # Пропущенные за время простоя события делают локальное состояние устаревшим
+                        if self.on_connect is not None:
+                            self.on_connect()
+                        delay = self.reconnect_delay
+                        async for message in pubsub.listen():
+                            if message["type"] == "message":
+                                self.dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Price event listener error: {e}. Reconnecting in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.reconnect_max_delay)
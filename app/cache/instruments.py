@@ -0,0 +1,121 @@
+"""
+Реестр отслеживаемых тикеров (индексов Deribit).
+
+Источник истины - таблица instruments, которую задача Celery
+app.tasks.maintenance.refresh_instruments синхронизирует с
+public/get_index_price_names. Процессы API держат копию реестра в памяти
+(frozenset, проверка тикера за O(1)) и периодически перечитывают ее из БД,
+поэтому новый индекс становится доступен без деплоя.
+
+Пока реестр в БД пуст (до первой синхронизации), используются тикеры из
+настройки TICKERS.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.client.deribit_client import DeribitClient
+from app.config import settings
+from app.db.crud import InstrumentRepository
+
+logger = logging.getLogger(__name__)
+
+
+async def load_active_tickers(session: AsyncSession) -> List[str]:
+    """Активные тикеры реестра или тикеры по умолчанию, если реестр пуст."""
+    names = await InstrumentRepository(session).get_active_names()
+    return names or [ticker.upper() for ticker in settings.tickers]
+
+
+async def refresh_instruments(session: AsyncSession, client: DeribitClient) -> Dict[str, List[str]]:
+    """
+    Синхронизировать реестр с индексами Deribit.
+
+    При ошибке или пустом ответе Deribit реестр не меняется.
+
+    Returns:
+        Словарь с добавленными и деактивированными тикерами
+    """
+    names = await client.get_index_price_names()
+    if not names:
+        logger.warning("Deribit returned no index names, instrument registry left unchanged")
+        return {"added": [], "deactivated": []}
+    changes = await InstrumentRepository(session).sync(names)
+    if changes["added"] or changes["deactivated"]:
+        logger.info(f"Instrument registry updated: {changes}")
+    return changes
+
+
+class InstrumentRegistry:
+    """Копия реестра тикеров в памяти процесса."""
+
+    def __init__(self, tickers: Optional[Iterable[str]] = None):
+        """Инициализация реестра тикерами по умолчанию."""
+        self._tickers = frozenset(ticker.upper() for ticker in (tickers or settings.tickers))
+        self._refreshed_at: Optional[float] = None
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self._tickers
+
+    @property
+    def tickers(self) -> List[str]:
+        """Тикеры реестра по алфавиту."""
+        return sorted(self._tickers)
+
+    def replace(self, tickers: Iterable[str]) -> None:
+        """Заменить набор тикеров (пустой набор игнорируется)."""
+        tickers = frozenset(ticker.upper() for ticker in tickers)
+        if tickers:
+            self._tickers = tickers
+
+    async def load(self, session: AsyncSession) -> List[str]:
+        """Перечитать реестр из БД."""
+        self.replace(await load_active_tickers(session))
+        self._refreshed_at = time.monotonic()
+        return self.tickers
+
+    async def refresh(self, session_factory: async_sessionmaker, max_age: Optional[float] = None) -> List[str]:
+        """
+        Тикеры реестра, перечитанные из БД не чаще раза в max_age секунд.
+
+        Ошибка или таймаут чтения БД не мешают опросу цен: возвращаются
+        последние известные тикеры (до первого чтения - тикеры TICKERS),
+        следующая попытка - через max_age секунд.
+
+        Args:
+            session_factory: Фабрика сессий БД
+            max_age: Допустимый возраст копии в секундах (по умолчанию INSTRUMENTS_RELOAD_INTERVAL)
+
+        Returns:
+            Тикеры реестра по алфавиту
+        """
+        max_age = settings.instruments_reload_interval if max_age is None else max_age
+        if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < max_age:
+            return self.tickers
+        self._refreshed_at = time.monotonic()
+
+        async def _load() -> None:
+            async with session_factory() as session:
+                await self.load(session)
+
+        try:
+            await asyncio.wait_for(_load(), timeout=settings.fetch_ticker_timeout)
+        except Exception as e:
+            logger.warning(f"Failed to reload instrument registry, using {len(self._tickers)} known tickers: {e}")
+        return self.tickers
+
+    async def run(self, session_factory: async_sessionmaker, interval: Optional[float] = None) -> None:
+        """Периодически перечитывать реестр до отмены задачи."""
+        interval = interval or settings.instruments_reload_interval
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with session_factory() as session:
+                    await self.load(session)
+            except Exception as e:
+                logger.warning(f"Failed to reload instrument registry: {e}")
+
+
+instrument_registry = InstrumentRegistry()
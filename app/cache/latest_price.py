@@ -0,0 +1,77 @@
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+from app.api.schemas import PriceLatestResponse, PriceResponse
+from app.config import settings
+
+
+@dataclass
+class CachedLatestPrice:
+    """Закэшированная последняя цена и готовое тело ответа."""
+
+    price: PriceResponse
+    body: bytes
+    expires_at: float
+
+
+class LatestPriceCache:
+    """
+    Кэш последних цен по тикерам в памяти процесса API.
+
+    Наполняется событиями ingestion (см. app.cache.events) и ответами БД
+    при промахе. Хранит уже сериализованное тело ответа /api/prices/latest,
+    чтобы отдавать его без обращения к БД и повторной валидации.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        """Инициализация кэша."""
+        self.ttl = settings.latest_cache_ttl if ttl is None else ttl
+        self._entries: Dict[str, CachedLatestPrice] = {}
+
+    @property
+    def enabled(self) -> bool:
+        """Включен ли кэш (TTL больше нуля)."""
+        return self.ttl > 0
+
+    def get(self, ticker: str) -> Optional[CachedLatestPrice]:
+        """Получить актуальную запись по тикеру или None."""
+        entry = self._entries.get(ticker)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            self._entries.pop(ticker, None)
+            return None
+        return entry
+
+    def set(self, price: PriceResponse) -> None:
+        """Сохранить цену, если она не старее уже закэшированной."""
+        if not self.enabled:
+            return
+        current = self._entries.get(price.ticker)
+        if current is not None and (
+            (current.price.timestamp, current.price.timestamp_ms) > (price.timestamp, price.timestamp_ms)
+        ):
+            return
+        body = PriceLatestResponse(ticker=price.ticker, price=price).model_dump_json().encode()
+        self._entries[price.ticker] = CachedLatestPrice(
+            price=price,
+            body=body,
+            expires_at=time.monotonic() + self.ttl,
+        )
+
+    def update_many(self, prices: Iterable[PriceResponse]) -> None:
+        """Сохранить пачку цен (обработчик событий ingestion)."""
+        for price in prices:
+            self.set(price)
+
+    def invalidate(self, ticker: str) -> None:
+        """Удалить запись по тикеру."""
+        self._entries.pop(ticker, None)
+
+    def clear(self) -> None:
+        """Очистить кэш."""
+        self._entries.clear()
+
+
+latest_price_cache = LatestPriceCache()
@@ -1,20 +1,221 @@
+import asyncio
 import logging
-from typing import Optional
+import time
+from typing import Dict, List, NamedTuple, Optional
 import aiohttp
 from aiohttp import ClientError, ClientTimeout
 
+from app.client.resilience import CircuitBreaker, RetryPolicy, TokenBucket, parse_retry_after
 from app.config import settings
+from app.metrics import FETCH_DURATION, pools
 
 logger = logging.getLogger(__name__)
 
+# Ответы, после которых запрос повторяется
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class PriceTick(NamedTuple):
+    """Индексная цена и момент ее получения (миллисекунды Unix)."""
+
+    price: float
+    timestamp_ms: int
+
 
 class DeribitClient:
-    """Клиент для получения данных из Deribit API."""
+    """
+    Клиент для получения данных из Deribit API.
+
+    Держит один долгоживущий aiohttp.ClientSession с пулом соединений
+    (keep-alive, кэш DNS), поэтому повторные запросы не тратят время на
+    TCP/TLS handshake. Жизненным циклом можно управлять через
+    `async with DeribitClient() as client:` или явными `start()`/`close()`.
 
-    def __init__(self, base_url: Optional[str] = None):
+    Запросы проходят через ограничитель частоты (общий для клиента),
+    размыкатель цепи на метод API и повторы с экспоненциальной задержкой
+    (см. app.client.resilience).
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        pool_limit: Optional[int] = None,
+        pool_limit_per_host: Optional[int] = None,
+        keepalive_timeout: Optional[float] = None,
+        dns_cache_ttl: Optional[int] = None,
+        request_timeout: Optional[float] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+    ):
         """Инициализация клиента."""
         self.base_url = base_url or settings.deribit_api_base_url
-        self.timeout = ClientTimeout(total=10)
+        self.timeout = ClientTimeout(total=request_timeout or settings.deribit_request_timeout)
+        self.pool_limit = pool_limit if pool_limit is not None else settings.deribit_pool_limit
+        self.pool_limit_per_host = (
+            pool_limit_per_host if pool_limit_per_host is not None else settings.deribit_pool_limit_per_host
+        )
+        self.keepalive_timeout = (
+            keepalive_timeout if keepalive_timeout is not None else settings.deribit_keepalive_timeout
+        )
+        self.dns_cache_ttl = dns_cache_ttl if dns_cache_ttl is not None else settings.deribit_dns_cache_ttl
+        self.retry_policy = retry_policy or RetryPolicy(
+            max_attempts=settings.deribit_retry_attempts,
+            base_delay=settings.deribit_retry_base_delay,
+            max_delay=settings.deribit_retry_max_delay,
+        )
+        self.rate_limiter = rate_limiter or TokenBucket(
+            rate=settings.deribit_rate_limit,
+            capacity=settings.deribit_rate_burst,
+        )
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def __aenter__(self) -> "DeribitClient":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    @property
+    def closed(self) -> bool:
+        """Закрыта ли HTTP-сессия клиента."""
+        return self._session is None or self._session.closed
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        """Создать сессию с настроенным пулом соединений."""
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_limit,
+            limit_per_host=self.pool_limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            use_dns_cache=True,
+            ttl_dns_cache=self.dns_cache_ttl,
+        )
+        return aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+    async def start(self) -> aiohttp.ClientSession:
+        """
+        Открыть (или переиспользовать) HTTP-сессию.
+
+        Сессия aiohttp привязана к event loop, поэтому при смене loop
+        создается новая.
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is not None and not self._session.closed and self._loop is not loop:
+            logger.warning("Event loop changed, recreating Deribit HTTP session")
+            self._session = None
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+            self._loop = loop
+        return self._session
+
+    async def close(self) -> None:
+        """Закрыть HTTP-сессию и освободить соединения пула."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+    def pool_stats(self) -> Optional[Dict[str, int]]:
+        """
+        Состояние пула соединений или None, если сессия не открыта.
+
+        Занятые и свободные соединения aiohttp публично не отдает, поэтому
+        читаются внутренние поля коннектора; если в другой версии aiohttp
+        их нет, возвращается None.
+        """
+        if self.closed:
+            return None
+        connector = self._session.connector
+        acquired = getattr(connector, "_acquired", None)
+        conns = getattr(connector, "_conns", None)
+        if acquired is None or conns is None:
+            return None
+        return {
+            "limit": connector.limit,
+            "in_use": len(acquired),
+            "idle": sum(len(idle) for idle in conns.values()),
+        }
+
+    def _breaker(self, method: str) -> CircuitBreaker:
+        """Размыкатель цепи для метода API."""
+        breaker = self._breakers.get(method)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                failure_threshold=settings.deribit_breaker_failure_threshold,
+                reset_timeout=settings.deribit_breaker_reset_timeout,
+            )
+            self._breakers[method] = breaker
+        return breaker
+
+    async def _get(self, method: str, params: Optional[dict] = None) -> Optional[dict]:
+        """
+        GET-запрос к публичному методу API с повторами и ограничением частоты.
+
+        Повторяются сетевые ошибки, таймауты, 429 и 5xx. Для 429/503
+        учитывается Retry-After: на это время приостанавливается весь
+        ограничитель частоты клиента. Сетевые ошибки и 5xx размыкают цепь
+        метода, пока она разомкнута, запросы не отправляются.
+
+        Остаток кредитов Deribit в заголовках ответа не публикует, поэтому
+        ограничитель настроен статически по документированным лимитам
+        (DERIBIT_RATE_LIMIT, DERIBIT_RATE_BURST), а сервер подстраивает его
+        только через 429 с Retry-After.
+
+        Args:
+            method: Метод API (например, 'public/get_index_price')
+            params: Параметры запроса
+
+        Returns:
+            Тело ответа HTTP 200 или None
+        """
+        url = f"{self.base_url}/{method}"
+        breaker = self._breaker(method)
+        attempts = self.retry_policy.max_attempts
+
+        for attempt in range(attempts):
+            if not breaker.allow():
+                logger.warning(f"Circuit breaker open for {method}, request {params} skipped")
+                return None
+            await self.rate_limiter.acquire()
+
+            retry_after = None
+            try:
+                session = await self.start()
+                async with session.get(url, params=params) as response:
+                    if response.status == 200:
+                        breaker.record_success()
+                        return await response.json()
+
+                    error_text = await response.text()
+                    if response.status not in RETRYABLE_STATUSES:
+                        # Ошибка запроса, а не сервера: цепь не размыкается
+                        breaker.record_success()
+                        logger.error(f"Error calling {method} {params}: HTTP {response.status}, Response: {error_text}")
+                        return None
+                    if response.status in (429, 503):
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    if response.status == 429:
+                        self.rate_limiter.pause(retry_after or self.retry_policy.delay(attempt))
+                    else:
+                        breaker.record_failure()
+                    logger.warning(
+                        f"Error calling {method} {params}: HTTP {response.status} "
+                        f"(attempt {attempt + 1}/{attempts}), Response: {error_text}"
+                    )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                breaker.record_failure()
+                logger.warning(f"Client error calling {method} {params}: {e!r} (attempt {attempt + 1}/{attempts})")
+            except Exception:
+                breaker.record_failure()
+                raise
+
+            if attempt + 1 < attempts:
+                await asyncio.sleep(self.retry_policy.delay(attempt, retry_after))
+
+        logger.error(f"Giving up on {method} {params} after {attempts} attempts")
+        return None
 
     async def get_index_price(self, ticker: str) -> Optional[float]:
         """
@@ -26,35 +227,94 @@ class DeribitClient:
         Returns:
             Цена или None в случае ошибки
         """
-        url = f"{self.base_url}/public/get_index_price"
-        params = {"index_name": ticker}
+        tick = await self.get_index_price_tick(ticker)
+        return tick.price if tick is not None else None
+
+    async def get_index_price_tick(self, ticker: str) -> Optional[PriceTick]:
+        """
+        Получить индексную цену вместе с моментом ее получения.
+
+        Момент берется из поля ответа usOut (время отправки ответа биржей,
+        в микросекундах), а если его нет - из локальных часов по приходу
+        ответа.
+
+        Args:
+            ticker: Тикер валюты (например, 'BTC_USD' или 'ETH_USD')
+
+        Returns:
+            Цена с моментом в миллисекундах Unix или None в случае ошибки
+        """
+        started = time.perf_counter()
+        tick = await self._get_index_price_tick(ticker)
+        outcome = "error" if tick is None else "ok"
+        FETCH_DURATION.labels(ticker.upper(), outcome).observe(time.perf_counter() - started)
+        return tick
 
+    async def _get_index_price_tick(self, ticker: str) -> Optional[PriceTick]:
         try:
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        # Deribit API может возвращать данные в разных форматах
-                        # Проверяем наличие result или прямого ответа
-                        if "result" in data:
-                            result = data.get("result", {})
-                            index_price = result.get("index_price")
-                        else:
-                            # Если result нет, возможно данные в корне
-                            index_price = data.get("index_price")
-                        
-                        if index_price is not None:
-                            return float(index_price)
-                        else:
-                            logger.warning(f"Index price not found in response for {ticker}. Response: {data}")
-                            return None
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Error fetching price for {ticker}: HTTP {response.status}, Response: {error_text}")
-                        return None
-        except aiohttp.ClientError as e:
-            logger.error(f"Client error fetching price for {ticker}: {e}")
-            return None
+            data = await self._get("public/get_index_price", {"index_name": ticker})
+            if data is None:
+                return None
+            received_ms = time.time_ns() // 1_000_000
+            # Deribit API может возвращать данные в разных форматах
+            # Проверяем наличие result или прямого ответа
+            if "result" in data:
+                result = data.get("result", {})
+                index_price = result.get("index_price")
+            else:
+                # Если result нет, возможно данные в корне
+                index_price = data.get("index_price")
+
+            if index_price is not None:
+                us_out = data.get("usOut")
+                timestamp_ms = int(us_out) // 1000 if us_out else received_ms
+                return PriceTick(float(index_price), timestamp_ms)
+            else:
+                logger.warning(f"Index price not found in response for {ticker}. Response: {data}")
+                return None
         except Exception as e:
             logger.error(f"Unexpected error fetching price for {ticker}: {e}", exc_info=True)
             return None
+
+    async def get_index_price_names(self) -> Optional[List[str]]:
+        """
+        Получить названия всех индексов Deribit.
+
+        Returns:
+            Тикеры индексов в верхнем регистре (например, 'BTC_USD') или None в случае ошибки
+        """
+        try:
+            data = await self._get("public/get_index_price_names")
+            if data is None:
+                return None
+            names = data.get("result")
+            if not isinstance(names, list):
+                logger.warning(f"Index names not found in response. Response: {data}")
+                return None
+            return [name.upper() for name in names]
+        except Exception as e:
+            logger.error(f"Unexpected error fetching index names: {e}", exc_info=True)
+            return None
+
+
+# Общий клиент процесса: один пул соединений на процесс (API или Celery worker)
+_shared_client: Optional[DeribitClient] = None
+
+
+def get_deribit_client() -> DeribitClient:
+    """Получить общий для процесса экземпляр DeribitClient."""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = DeribitClient()
+    return _shared_client
+
+
+pools.register_http_pool("deribit", lambda: _shared_client.pool_stats() if _shared_client is not None else None)
+
+
+async def close_deribit_client() -> None:
+    """Закрыть общий клиент процесса (вызывается при остановке)."""
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.close()
+        _shared_client = None
@@ -0,0 +1,101 @@
+import asyncio
+import itertools
+import json
+import logging
+from typing import AsyncIterator, Dict, List, Optional
+import aiohttp
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+PRICE_INDEX_CHANNEL_PREFIX = "deribit_price_index."
+
+
+def price_index_channel(ticker: str) -> str:
+    """Имя канала подписки на индекс, например deribit_price_index.btc_usd."""
+    return f"{PRICE_INDEX_CHANNEL_PREFIX}{ticker.lower()}"
+
+
+def ticker_from_channel(channel: str) -> str:
+    """Тикер по имени канала индекса: deribit_price_index.btc_usd -> BTC_USD."""
+    return channel[len(PRICE_INDEX_CHANNEL_PREFIX):].upper()
+
+
+class DeribitWebSocketClient:
+    """
+    Клиент JSON-RPC WebSocket API Deribit для потоковых подписок.
+
+    При обрыве соединения переподключается с экспоненциальной задержкой
+    и заново подписывается на каналы. Включает heartbeat Deribit и отвечает
+    на test_request; если от сервера долго нет сообщений, соединение
+    считается мертвым и переоткрывается.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        heartbeat_interval: Optional[int] = None,
+        reconnect_initial_delay: float = 1.0,
+        reconnect_max_delay: Optional[float] = None,
+    ):
+        """Инициализация клиента."""
+        self.url = url or settings.deribit_ws_url
+        self.heartbeat_interval = heartbeat_interval or settings.stream_heartbeat_interval
+        self.reconnect_initial_delay = reconnect_initial_delay
+        self.reconnect_max_delay = reconnect_max_delay or settings.stream_reconnect_max_delay
+        self._request_ids = itertools.count(1)
+
+    async def _send(self, ws: aiohttp.ClientWebSocketResponse, method: str, params: Optional[Dict] = None) -> None:
+        """Отправить JSON-RPC запрос (ответ обрабатывается в цикле чтения)."""
+        await ws.send_json({
+            "jsonrpc": "2.0",
+            "id": next(self._request_ids),
+            "method": method,
+            "params": params or {},
+        })
+
+    async def subscribe(self, channels: List[str]) -> AsyncIterator[Dict]:
+        """
+        Подписаться на каналы и выдавать уведомления подписки.
+
+        Args:
+            channels: Имена каналов Deribit
+
+        Yields:
+            Параметры уведомления: {"channel": ..., "data": {...}}
+        """
+        delay = self.reconnect_initial_delay
+        # Без сообщений дольше двух интервалов heartbeat соединение считается потерянным
+        read_timeout = self.heartbeat_interval * 2
+
+        async with aiohttp.ClientSession() as session:
+            while True:
+                try:
+                    async with session.ws_connect(self.url) as ws:
+                        await self._send(ws, "public/set_heartbeat", {"interval": self.heartbeat_interval})
+                        await self._send(ws, "public/subscribe", {"channels": channels})
+                        logger.info(f"Subscribed to {len(channels)} channels at {self.url}")
+                        delay = self.reconnect_initial_delay
+
+                        while True:
+                            msg = await ws.receive(timeout=read_timeout)
+                            if msg.type != aiohttp.WSMsgType.TEXT:
+                                logger.warning(f"WebSocket closed: {msg.type.name}")
+                                break
+
+                            message = json.loads(msg.data)
+                            method = message.get("method")
+                            if method == "subscription":
+                                yield message["params"]
+                            elif method == "heartbeat":
+                                if message.get("params", {}).get("type") == "test_request":
+                                    await self._send(ws, "public/test")
+                            elif "error" in message:
+                                logger.error(f"Deribit WebSocket error: {message['error']}")
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    logger.warning(f"WebSocket connection error: {e!r}")
+
+                logger.info(f"Reconnecting to {self.url} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.reconnect_max_delay)
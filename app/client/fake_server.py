@@ -0,0 +1,216 @@
+"""
+Локальный фейковый сервер Deribit для офлайн-тестов и разработки.
+
+Поддерживает REST `public/get_index_price`, `public/get_index_price_names`
+и JSON-RPC WebSocket
+(`public/subscribe`, `public/set_heartbeat`, `public/test`) с потоком
+уведомлений по каналам `deribit_price_index.*`.
+
+Запуск:
+    python -m app.client.fake_server --port 8765
+
+После этого можно указать DERIBIT_API_BASE_URL=http://127.0.0.1:8765/api/v2
+и DERIBIT_WS_URL=ws://127.0.0.1:8765/ws/api/v2.
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+from aiohttp import WSMsgType, web
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRICES = {"btc_usd": 45000.0, "eth_usd": 2500.0}
+
+
+class FakeDeribitServer:
+    """Фейковый сервер Deribit со случайным блужданием индексных цен."""
+
+    def __init__(self, tick_interval: float = 0.1, prices: Optional[Dict[str, float]] = None):
+        """Инициализация сервера."""
+        self.tick_interval = tick_interval
+        self.prices = dict(prices or DEFAULT_PRICES)
+        self.subscribe_count = 0
+        self.test_responses = 0
+        self.rest_requests = 0
+        self._rest_failures: List[Tuple[int, Dict[str, str]]] = []
+        self._connections: Set[web.WebSocketResponse] = set()
+        self._runner: Optional[web.AppRunner] = None
+        self.port: Optional[int] = None
+
+    @property
+    def base_url(self) -> str:
+        """Базовый URL REST API."""
+        return f"http://127.0.0.1:{self.port}/api/v2"
+
+    @property
+    def ws_url(self) -> str:
+        """URL WebSocket API."""
+        return f"ws://127.0.0.1:{self.port}/ws/api/v2"
+
+    def make_app(self) -> web.Application:
+        """Создать aiohttp приложение сервера."""
+        app = web.Application()
+        app.router.add_get("/api/v2/public/get_index_price", self._handle_index_price)
+        app.router.add_get("/api/v2/public/get_index_price_names", self._handle_index_price_names)
+        app.router.add_get("/ws/api/v2", self._handle_ws)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        """Запустить сервер (port=0 - случайный свободный порт)."""
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        logger.info(f"Fake Deribit server listening on {host}:{self.port}")
+
+    async def stop(self) -> None:
+        """Остановить сервер."""
+        await self.drop_connections()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def drop_connections(self) -> None:
+        """Разорвать все WebSocket соединения (имитация сбоя сети)."""
+        for ws in list(self._connections):
+            await ws.close()
+
+    async def send_notification(self, params: Any) -> None:
+        """Отправить всем соединениям уведомление подписки с произвольными params."""
+        for ws in list(self._connections):
+            await ws.send_json({"jsonrpc": "2.0", "method": "subscription", "params": params})
+
+    def fail_next(self, status: int, count: int = 1, headers: Optional[Dict[str, str]] = None) -> None:
+        """Ответить ошибкой status на следующие count запросов get_index_price."""
+        self._rest_failures.extend([(status, dict(headers or {}))] * count)
+
+    def _next_price(self, index_name: str) -> float:
+        """Следующая цена индекса (случайное блуждание)."""
+        price = self.prices.setdefault(index_name, 100.0)
+        price = round(price * (1 + random.uniform(-0.0005, 0.0005)), 2)
+        self.prices[index_name] = price
+        return price
+
+    async def _handle_index_price(self, request: web.Request) -> web.Response:
+        """REST public/get_index_price."""
+        self.rest_requests += 1
+        if self._rest_failures:
+            status, headers = self._rest_failures.pop(0)
+            message = "too_many_requests" if status == 429 else "internal_server_error"
+            return web.json_response(
+                {"jsonrpc": "2.0", "error": {"code": 10028 if status == 429 else 11094, "message": message}},
+                status=status,
+                headers=headers,
+            )
+        index_name = request.query.get("index_name", "").lower()
+        if index_name not in self.prices:
+            return web.json_response(
+                {"jsonrpc": "2.0", "error": {"code": 10001, "message": "not_found"}},
+                status=400,
+            )
+        now_us = int(time.time() * 1_000_000)
+        return web.json_response({
+            "jsonrpc": "2.0",
+            "result": {"index_price": self._next_price(index_name), "estimated_delivery_price": None},
+            "usIn": now_us,
+            "usOut": now_us,
+            "usDiff": 0,
+        })
+
+    async def _handle_index_price_names(self, request: web.Request) -> web.Response:
+        """REST public/get_index_price_names."""
+        self.rest_requests += 1
+        return web.json_response({"jsonrpc": "2.0", "result": sorted(self.prices)})
+
+    async def _handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        """JSON-RPC WebSocket с подписками на индексы."""
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self._connections.add(ws)
+        channels: Set[str] = set()
+        tasks = [asyncio.create_task(self._publish(ws, channels))]
+
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    break
+                message = msg.json()
+                method = message.get("method")
+                params = message.get("params", {})
+                result = None
+
+                if method == "public/subscribe":
+                    self.subscribe_count += 1
+                    channels.update(params.get("channels", []))
+                    result = sorted(channels)
+                elif method == "public/set_heartbeat":
+                    tasks.append(asyncio.create_task(self._heartbeat(ws, params["interval"])))
+                    result = "ok"
+                elif method == "public/test":
+                    self.test_responses += 1
+                    result = {"version": "fake"}
+
+                await ws.send_json({"jsonrpc": "2.0", "id": message.get("id"), "result": result})
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._connections.discard(ws)
+
+        return ws
+
+    async def _heartbeat(self, ws: web.WebSocketResponse, interval: float) -> None:
+        """Периодически отправлять test_request."""
+        while not ws.closed:
+            await asyncio.sleep(interval)
+            await ws.send_json({"jsonrpc": "2.0", "method": "heartbeat", "params": {"type": "test_request"}})
+
+    async def _publish(self, ws: web.WebSocketResponse, channels: Set[str]) -> None:
+        """Рассылать уведомления по подписанным каналам."""
+        while not ws.closed:
+            await asyncio.sleep(self.tick_interval)
+            for channel in list(channels):
+                index_name = channel.split(".", 1)[1]
+                await ws.send_json({
+                    "jsonrpc": "2.0",
+                    "method": "subscription",
+                    "params": {
+                        "channel": channel,
+                        "data": {
+                            "index_name": index_name,
+                            "price": self._next_price(index_name),
+                            "timestamp": int(time.time() * 1000),
+                        },
+                    },
+                })
+
+
+async def _serve(host: str, port: int, tick_interval: float) -> None:
+    server = FakeDeribitServer(tick_interval=tick_interval)
+    await server.start(host, port)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main() -> None:
+    """Точка входа CLI."""
+    parser = argparse.ArgumentParser(description="Fake Deribit server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tick-interval", type=float, default=0.1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_serve(args.host, args.port, args.tick_interval))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
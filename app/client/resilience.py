@@ -0,0 +1,169 @@
+"""
+Механизмы устойчивости HTTP-клиента Deribit.
+
+- RetryPolicy - повторы с экспоненциальной задержкой и полным jitter;
+- CircuitBreaker - размыкатель на метод API: после серии отказов запросы
+  к методу не отправляются reset_timeout секунд, затем пропускается
+  пробный запрос;
+- TokenBucket - клиентское ограничение частоты запросов под кредитные
+  лимиты Deribit (публичный запрос стоит 500 кредитов, пул 50 000,
+  пополнение 10 000 в секунду: 20 запросов/с с запасом на всплеск 100).
+  Остаток кредитов сервер не сообщает, поэтому ведро настраивается
+  статически и приостанавливается только по 429 (TokenBucket.pause).
+
+Все классы не держат примитивов asyncio, привязанных к event loop, поэтому
+переживают пересоздание loop (см. DeribitClient.start).
+"""
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Политика повторов запроса."""
+
+    max_attempts: int = 3
+    base_delay: float = 0.2
+    max_delay: float = 5.0
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Задержка перед следующей попыткой.
+
+        Args:
+            attempt: Номер неудачной попытки, начиная с 0
+            retry_after: Пауза, запрошенная сервером (Retry-After)
+
+        Returns:
+            Задержка в секундах
+        """
+        if retry_after is not None:
+            return retry_after
+        # Полный jitter: одновременные клиенты не повторяют запросы синхронно
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Пауза из заголовка Retry-After (секунды или дата HTTP) или None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class CircuitBreaker:
+    """Размыкатель цепи: closed -> open после отказов -> half-open -> closed."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """Инициализация размыкателя."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_started_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        """Текущее состояние."""
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        """
+        Можно ли отправить запрос.
+
+        В half-open пропускается один пробный запрос; если его результат не
+        учтен (например, запрос отменен), через reset_timeout пропускается
+        следующий.
+        """
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.OPEN:
+            return False
+        now = time.monotonic()
+        if self._probe_started_at is not None and now - self._probe_started_at < self.reset_timeout:
+            return False
+        self._probe_started_at = now
+        return True
+
+    def record_success(self) -> None:
+        """Учесть успешный ответ: цепь замыкается."""
+        self.failures = 0
+        self._opened_at = None
+        self._probe_started_at = None
+
+    def record_failure(self) -> None:
+        """Учесть отказ: при достижении порога (или отказе пробы) цепь размыкается."""
+        self.failures += 1
+        if self._probe_started_at is not None or self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+        self._probe_started_at = None
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты «ведро токенов».
+
+    Токены резервируются сразу, а баланс может уходить в минус: каждый
+    следующий запрос ждет своей очереди, поэтому ожидающие обслуживаются
+    по порядку без блокировок.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Инициализация ведра.
+
+        Args:
+            rate: Пополнение, токенов в секунду
+            capacity: Емкость ведра (допустимый всплеск)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def reserve(self, cost: float = 1.0) -> float:
+        """Зарезервировать токены и вернуть время ожидания в секундах."""
+        self._refill()
+        self.tokens -= cost
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    async def acquire(self, cost: float = 1.0) -> None:
+        """Дождаться доступности токенов."""
+        wait = self.reserve(cost)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Не выдавать токены ближайшие seconds секунд (ответ 429, Retry-After)."""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
@@ -0,0 +1,302 @@
+"""
+Колоночный архив истории цен в Parquet.
+
+Закрытые месяцы из таблицы prices переносятся в файлы
+<ARCHIVE_URI>/<TICKER>/<YYYY-MM>.parquet (локальный диск или объектное
+хранилище, поддерживаемое pyarrow.fs, например s3://bucket/prices) и
+удаляются из таблицы. Чтения PriceRepository по диапазону, страницы
+/all, выгрузка и свечи по сырым ценам прозрачно дочитывают архивные
+месяцы, пересекающиеся с запрошенным диапазоном; локальные файлы
+читаются через memory map. Список архивных месяцев кэшируется в
+процессе на archive_manifest_ttl секунд и сбрасывается при записи месяца.
+
+Агрегаты (rollup) при архивировании не трогаются, поэтому свечи OHLC
+по архивной истории продолжают строиться из БД.
+"""
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from pyarrow import fs
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db.models import Price
+from app.db.partitions import add_months, month_bounds
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("ticker", pa.string()),
+    ("price", pa.decimal128(20, 8)),
+    ("timestamp", pa.int64()),
+    ("created_at", pa.timestamp("us")),
+    ("timestamp_ms", pa.int16()),
+])
+
+ARCHIVE_ROW_GROUP_SIZE = 65536
+
+
+class ArchiveRow(NamedTuple):
+    """Строка архива (порядок полей совпадает с PRICE_COLUMNS в app.db.crud)."""
+
+    id: int
+    ticker: str
+    price: Decimal
+    timestamp: int
+    created_at: datetime
+    timestamp_ms: int
+
+
+def archive_moments(table: pa.Table) -> pa.Array:
+    """Время строк архива в миллисекундах."""
+    return pc.add(pc.multiply(table["timestamp"], 1000), pc.cast(table["timestamp_ms"], pa.int64()))
+
+
+def table_rows(table: pa.Table) -> List[ArchiveRow]:
+    """Строки таблицы Arrow в виде ArchiveRow."""
+    columns = [table.column(name).to_pylist() for name in ARCHIVE_SCHEMA.names]
+    return list(map(ArchiveRow._make, zip(*columns)))
+
+
+class PriceArchive:
+    """Хранилище архивных месяцев в Parquet (файл на тикер и месяц)."""
+
+    def __init__(self, uri: str, manifest_ttl: Optional[float] = None):
+        """
+        Инициализация архива по URI или локальному пути.
+
+        Args:
+            uri: URI pyarrow.fs или локальный путь
+            manifest_ttl: Время жизни кэша списка месяцев в секундах
+                (по умолчанию archive_manifest_ttl)
+        """
+        if "://" not in uri:
+            uri = os.path.abspath(uri)
+        self.filesystem, self.base_path = fs.FileSystem.from_uri(uri)
+        self.is_local = isinstance(self.filesystem, fs.LocalFileSystem)
+        self.manifest_ttl = settings.archive_manifest_ttl if manifest_ttl is None else manifest_ttl
+        # Тикер -> (момент листинга, {(год, месяц): (размер, mtime_ns)})
+        self._manifests: Dict[str, Tuple[float, Dict[Tuple[int, int], Tuple[int, Optional[int]]]]] = {}
+
+    def path_for(self, ticker: str, year: int, month: int) -> str:
+        """Путь файла архива за месяц."""
+        return f"{self.base_path}/{ticker.upper()}/{year:04d}-{month:02d}.parquet"
+
+    def tickers(self) -> List[str]:
+        """Тикеры, у которых есть архивные месяцы, по алфавиту."""
+        selector = fs.FileSelector(self.base_path, allow_not_found=True)
+        return sorted(
+            info.base_name for info in self.filesystem.get_file_info(selector) if info.type == fs.FileType.Directory
+        )
+
+    def manifest(self, ticker: str) -> Dict[Tuple[int, int], Tuple[int, Optional[int]]]:
+        """
+        Архивные месяцы тикера с версией файла (размер, mtime_ns).
+
+        Листинг каталога кэшируется на manifest_ttl секунд: задача
+        архивирования работает в другом процессе, поэтому новые месяцы
+        становятся видны API не позже чем через manifest_ttl.
+        """
+        ticker = ticker.upper()
+        cached = self._manifests.get(ticker)
+        if cached is not None and time.monotonic() - cached[0] < self.manifest_ttl:
+            return cached[1]
+
+        selector = fs.FileSelector(f"{self.base_path}/{ticker}", allow_not_found=True)
+        months = {}
+        for info in self.filesystem.get_file_info(selector):
+            name = info.base_name
+            if info.type == fs.FileType.File and name.endswith(".parquet"):
+                year, month = name[:-len(".parquet")].split("-")
+                months[(int(year), int(month))] = (info.size, info.mtime_ns)
+        self._manifests[ticker] = (time.monotonic(), months)
+        return months
+
+    def invalidate(self, ticker: Optional[str] = None) -> None:
+        """Сбросить кэш списка месяцев тикера (без тикера - всех тикеров)."""
+        if ticker is None:
+            self._manifests.clear()
+        else:
+            self._manifests.pop(ticker.upper(), None)
+
+    def archived_months(self, ticker: str) -> List[Tuple[int, int]]:
+        """Архивные месяцы тикера в виде (год, месяц), по возрастанию."""
+        return sorted(self.manifest(ticker))
+
+    def write_month(self, ticker: str, year: int, month: int, rows: Sequence[ArchiveRow]) -> str:
+        """
+        Записать месяц в архив, объединив с уже заархивированными строками.
+
+        Строки с уже сохраненным временем пропускаются. Файл пишется во
+        временный путь и затем переименовывается, чтобы читатели не видели
+        частично записанный файл.
+        """
+        path = self.path_for(ticker, year, month)
+        table = pa.Table.from_pylist(
+            [dict(zip(ARCHIVE_SCHEMA.names, row)) for row in rows],
+            schema=ARCHIVE_SCHEMA,
+        )
+        if self.filesystem.get_file_info(path).type == fs.FileType.File:
+            existing = pq.read_table(path, filesystem=self.filesystem, schema=ARCHIVE_SCHEMA)
+            # Повторное архивирование того же месяца не должно дублировать строки
+            is_new = pc.invert(pc.is_in(archive_moments(table), value_set=archive_moments(existing)))
+            table = pa.concat_tables([existing, table.filter(is_new)])
+        table = table.sort_by([("timestamp", "ascending"), ("timestamp_ms", "ascending")])
+
+        self.filesystem.create_dir(path.rsplit("/", 1)[0], recursive=True)
+        tmp_path = f"{path}.tmp"
+        # Небольшие группы строк позволяют отсекать их по статистике при чтении страниц
+        pq.write_table(table, tmp_path, filesystem=self.filesystem, row_group_size=ARCHIVE_ROW_GROUP_SIZE)
+        self.filesystem.move(tmp_path, path)
+        self.invalidate(ticker)
+        return path
+
+    def read_range(
+        self,
+        ticker: str,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None,
+    ) -> List[ArchiveRow]:
+        """Прочитать архивные строки тикера в диапазоне дат."""
+        filters = []
+        if start_timestamp:
+            filters.append(("timestamp", ">=", start_timestamp))
+        if end_timestamp:
+            filters.append(("timestamp", "<=", end_timestamp))
+
+        rows: List[ArchiveRow] = []
+        for year, month in self.archived_months(ticker):
+            month_start, month_end = month_bounds(year, month)
+            if (start_timestamp and month_end <= start_timestamp) or (end_timestamp and month_start > end_timestamp):
+                continue
+            table = pq.read_table(
+                self.path_for(ticker, year, month),
+                filesystem=self.filesystem,
+                schema=ARCHIVE_SCHEMA,
+                memory_map=self.is_local,
+                filters=filters or None,
+            )
+            rows.extend(table_rows(table))
+        return rows
+
+    def read_page(
+        self,
+        ticker: str,
+        limit: int,
+        before: Optional[Tuple[int, int]] = None,
+        floor: Optional[int] = None,
+    ) -> List[ArchiveRow]:
+        """
+        Последние архивные строки тикера по убыванию (timestamp, id).
+
+        Условие курсора и нижняя граница передаются в pyarrow, который
+        отбрасывает группы строк по статистике Parquet; сортировка и
+        обрезка до limit выполняются в Arrow, так что объекты Python
+        создаются только для строк страницы. Месяцы читаются от новых к
+        старым, пока строк не хватает.
+
+        Args:
+            ticker: Тикер валюты
+            limit: Сколько строк нужно
+            before: Позиция (timestamp, id), строго до которой читать
+            floor: Минимальный timestamp строк
+        """
+        bounds = [] if floor is None else [("timestamp", ">=", floor)]
+        if before is not None:
+            filters = [
+                bounds + [("timestamp", "<", before[0])],
+                bounds + [("timestamp", "=", before[0]), ("id", "<", before[1])],
+            ]
+        else:
+            filters = [bounds] if bounds else None
+
+        rows: List[ArchiveRow] = []
+        for year, month in reversed(self.archived_months(ticker)):
+            month_start, month_end = month_bounds(year, month)
+            if floor is not None and month_end <= floor:
+                break
+            if before is not None and month_start > before[0]:
+                continue
+            table = pq.read_table(
+                self.path_for(ticker, year, month),
+                filesystem=self.filesystem,
+                schema=ARCHIVE_SCHEMA,
+                memory_map=self.is_local,
+                filters=filters,
+            )
+            table = table.sort_by([("timestamp", "descending"), ("id", "descending")])
+            rows.extend(table_rows(table.slice(0, limit - len(rows))))
+            if len(rows) >= limit:
+                break
+        return rows
+
+
+_archive: Optional[PriceArchive] = None
+
+
+def get_archive() -> Optional[PriceArchive]:
+    """Архив процесса по настройке archive_uri или None, если архив выключен."""
+    global _archive
+    if not settings.archive_uri:
+        return None
+    if _archive is None:
+        _archive = PriceArchive(settings.archive_uri)
+    return _archive
+
+
+async def archive_closed_months(
+    session: AsyncSession,
+    archive: PriceArchive,
+    after_months: Optional[int] = None,
+    now: Optional[datetime] = None,
+) -> List[str]:
+    """
+    Перенести закрытые месяцы из таблицы prices в архив.
+
+    Архивируются месяцы, закончившиеся больше after_months месяцев назад.
+    Каждый месяц тикера записывается в файл и удаляется из таблицы в
+    отдельной транзакции.
+
+    Returns:
+        Пути записанных файлов
+    """
+    after_months = settings.archive_after_months if after_months is None else after_months
+    now = now or datetime.now(timezone.utc)
+    cutoff_year, cutoff_month = add_months(now.year, now.month, -after_months)
+    cutoff_timestamp = month_bounds(cutoff_year, cutoff_month)[0]
+
+    oldest = await session.execute(
+        select(Price.ticker, func.min(Price.timestamp))
+        .where(Price.timestamp < cutoff_timestamp)
+        .group_by(Price.ticker)
+    )
+
+    written = []
+    for ticker, min_timestamp in oldest.all():
+        first = datetime.fromtimestamp(min_timestamp, timezone.utc)
+        year, month = first.year, first.month
+        while (year, month) < (cutoff_year, cutoff_month):
+            start, end = month_bounds(year, month)
+            result = await session.execute(
+                select(Price.id, Price.ticker, Price.price, Price.timestamp, Price.created_at, Price.timestamp_ms)
+                .where(Price.ticker == ticker, Price.timestamp >= start, Price.timestamp < end)
+                .order_by(Price.timestamp, Price.timestamp_ms)
+            )
+            rows = [tuple(row) for row in result.all()]
+            if rows:
+                written.append(archive.write_month(ticker, year, month, rows))
+                await session.execute(
+                    delete(Price).where(Price.ticker == ticker, Price.timestamp >= start, Price.timestamp < end)
+                )
+                await session.commit()
+                logger.info(f"Archived {len(rows)} prices of {ticker} for {year:04d}-{month:02d}")
+            year, month = add_months(year, month, 1)
+    return written
@@ -1,9 +1,299 @@
-from datetime import datetime
-from typing import List, Optional
-from sqlalchemy import select, desc
+import asyncio
+from datetime import datetime, timezone
+from decimal import Decimal
+from operator import itemgetter
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple, Type
+from sqlalchemy import Row, Select, String, and_, case, column, delete, func, select, desc, true, tuple_, update, values
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
-from app.db.models import Price
+from app.config import settings
+from app.db.models import ROLLUP_MODELS, Instrument, Price, PriceRollupMixin
+from app.db.partitions import month_bounds
+from app.metrics import count_page_rows, ingestion_lag, observe_query
+
+# Поддерживаемые интервалы свечей в секундах
+OHLC_INTERVALS = {"1m": 60, "5m": 300, "1h": 3600, "1d": 86400}
+
+# Столбцы облегченного чтения (строки вместо ORM-объектов Price)
+PRICE_COLUMNS = (Price.id, Price.ticker, Price.price, Price.timestamp, Price.created_at, Price.timestamp_ms)
+
+# Время записи в миллисекундах UNIX
+PRICE_MOMENT = Price.timestamp * 1000 + Price.timestamp_ms
+
+# Размер порции строк при потоковом чтении через серверный курсор
+STREAM_PARTITION_SIZE = 5000
+
+# asyncpg ограничивает число параметров запроса (32767), 4 параметра на строку
+BULK_INSERT_CHUNK_SIZE = 5000
+# Для таблиц агрегатов 10 параметров на строку
+ROLLUP_UPSERT_CHUNK_SIZE = 3000
+
+
+def dialect_insert(session: AsyncSession, model):
+    """INSERT с поддержкой ON CONFLICT для диалекта сессии."""
+    if session.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
+
+
+def price_buckets_query(
+    interval_seconds: int,
+    ticker: Optional[str] = None,
+    start_timestamp: Optional[int] = None,
+    end_timestamp: Optional[int] = None,
+) -> Select:
+    """
+    Запрос агрегатов сырых цен по интервалам.
+
+    Бакет - начало интервала: timestamp - timestamp % interval_seconds.
+    High/low/сумма/число считаются агрегатами по бакету, а open/close -
+    ценами первой и последней записи бакета (с точностью до миллисекунды),
+    которые достаются по уникальному индексу (ticker, timestamp, timestamp_ms).
+
+    Returns:
+        Select со столбцами ticker, bucket, open, high, low, close,
+        price_sum, count, open_moment, close_moment
+    """
+    bucket = (Price.timestamp - Price.timestamp % interval_seconds).label("bucket")
+    buckets = select(
+        Price.ticker,
+        bucket,
+        func.max(Price.price).label("high"),
+        func.min(Price.price).label("low"),
+        func.sum(Price.price).label("price_sum"),
+        func.count().label("count"),
+        func.min(PRICE_MOMENT).label("open_moment"),
+        func.max(PRICE_MOMENT).label("close_moment"),
+    )
+
+    if ticker:
+        buckets = buckets.where(Price.ticker == ticker.upper())
+    if start_timestamp:
+        buckets = buckets.where(Price.timestamp >= start_timestamp)
+    if end_timestamp:
+        buckets = buckets.where(Price.timestamp <= end_timestamp)
+
+    buckets = buckets.group_by(Price.ticker, bucket).subquery()
+    open_price = aliased(Price)
+    close_price = aliased(Price)
+
+    return (
+        select(
+            buckets.c.ticker,
+            buckets.c.bucket,
+            open_price.price.label("open"),
+            buckets.c.high,
+            buckets.c.low,
+            close_price.price.label("close"),
+            buckets.c.price_sum,
+            buckets.c.count,
+            buckets.c.open_moment,
+            buckets.c.close_moment,
+        )
+        .join(open_price, and_(
+            open_price.ticker == buckets.c.ticker,
+            open_price.timestamp == buckets.c.open_moment // 1000,
+            open_price.timestamp_ms == buckets.c.open_moment % 1000,
+        ))
+        .join(close_price, and_(
+            close_price.ticker == buckets.c.ticker,
+            close_price.timestamp == buckets.c.close_moment // 1000,
+            close_price.timestamp_ms == buckets.c.close_moment % 1000,
+        ))
+    )
+
+
+def aggregate_prices(prices: Iterable[Price], resolution: int) -> List[dict]:
+    """Свернуть записи о ценах в строки агрегатов по (ticker, bucket)."""
+    rows: Dict[Tuple[str, int], dict] = {}
+    for price_obj in prices:
+        price = price_obj.price
+        timestamp = price_obj.timestamp
+        # Время записи с миллисекундами: порядок open/close внутри секунды
+        moment = timestamp * 1000 + (price_obj.timestamp_ms or 0)
+        key = (price_obj.ticker, timestamp - timestamp % resolution)
+        row = rows.get(key)
+        if row is None:
+            rows[key] = {
+                "ticker": key[0],
+                "bucket": key[1],
+                "open": price,
+                "high": price,
+                "low": price,
+                "close": price,
+                "price_sum": price,
+                "count": 1,
+                "open_moment": moment,
+                "close_moment": moment,
+            }
+            continue
+        row["high"] = max(row["high"], price)
+        row["low"] = min(row["low"], price)
+        row["price_sum"] += price
+        row["count"] += 1
+        if moment < row["open_moment"]:
+            row["open"], row["open_moment"] = price, moment
+        if moment > row["close_moment"]:
+            row["close"], row["close_moment"] = price, moment
+    return list(rows.values())
+
+
+class RangeVersion(NamedTuple):
+    """Версия данных диапазона цен (см. PriceRepository.get_range_version)."""
+
+    count: int
+    max_moment: Optional[int]
+    modified_at: Optional[float]
+    archive: Tuple[Tuple[int, int, int, Optional[int]], ...]
+
+
+class Candle(NamedTuple):
+    """Свеча OHLC, посчитанная в Python (по строкам архива)."""
+
+    bucket: int
+    open: Decimal
+    high: Decimal
+    low: Decimal
+    close: Decimal
+    mean: Decimal
+    count: int
+
+
+def candles_from_prices(prices: Iterable, interval_seconds: int) -> List[Candle]:
+    """Свечи OHLC по записям о ценах по возрастанию bucket."""
+    rows = sorted(aggregate_prices(prices, interval_seconds), key=itemgetter("bucket"))
+    return [
+        Candle(
+            row["bucket"], row["open"], row["high"], row["low"], row["close"],
+            round(row["price_sum"] / row["count"], 8), row["count"],
+        )
+        for row in rows
+    ]
+
+
+def split_by_archived_months(
+    start_timestamp: Optional[int],
+    end_timestamp: Optional[int],
+    months: Sequence[Tuple[int, int]],
+) -> List[Tuple[Optional[int], Optional[int], bool]]:
+    """
+    Разбить диапазон дат на архивные месяцы и промежутки между ними.
+
+    Args:
+        start_timestamp: Начало диапазона (None - без границы)
+        end_timestamp: Конец диапазона включительно (None - без границы)
+        months: Границы [начало, конец) архивных месяцев, пересекающихся
+            с диапазоном, по возрастанию
+
+    Returns:
+        Участки (начало, конец включительно, архивный ли) по возрастанию
+    """
+    segments = []
+    position = start_timestamp
+    for month_start, month_end in months:
+        if position is None or position < month_start:
+            segments.append((position, month_start - 1, False))
+        segments.append((
+            month_start if position is None else max(position, month_start),
+            month_end - 1 if end_timestamp is None else min(end_timestamp, month_end - 1),
+            True,
+        ))
+        position = month_end
+    if position is None or end_timestamp is None or position <= end_timestamp:
+        segments.append((position, end_timestamp, False))
+    return segments
+
+
+async def read_archive(
+    ticker: str,
+    start_timestamp: Optional[int],
+    end_timestamp: Optional[int],
+) -> List[Sequence]:
+    """Архивные строки тикера в диапазоне дат (пустой список, если архив выключен)."""
+    if not settings.archive_uri:
+        return []
+    from app.db.archive import get_archive
+
+    return await asyncio.to_thread(
+        get_archive().read_range, ticker.upper(), start_timestamp, end_timestamp
+    )
+
+
+async def read_archive_page(
+    ticker: str,
+    limit: int,
+    before: Optional[Tuple[int, int]],
+    floor: Optional[int],
+) -> List[Sequence]:
+    """Последние limit архивных строк тикера до позиции before (см. PriceArchive.read_page)."""
+    if not settings.archive_uri:
+        return []
+    from app.db.archive import get_archive
+
+    return await asyncio.to_thread(get_archive().read_page, ticker.upper(), limit, before, floor)
+
+
+def overlaps_range(
+    month_start: int,
+    month_end: int,
+    start_timestamp: Optional[int],
+    end_timestamp: Optional[int],
+) -> bool:
+    """Пересекается ли месяц [month_start, month_end) с диапазоном дат."""
+    return not ((start_timestamp and month_end <= start_timestamp) or (end_timestamp and month_start > end_timestamp))
+
+
+async def archived_month_versions(
+    ticker: str,
+    start_timestamp: Optional[int],
+    end_timestamp: Optional[int],
+) -> Tuple[Tuple[int, int, int, Optional[int]], ...]:
+    """(год, месяц, размер, mtime_ns) файлов архива тикера, пересекающихся с диапазоном."""
+    if not settings.archive_uri:
+        return ()
+    from app.db.archive import get_archive
+
+    manifest = await asyncio.to_thread(get_archive().manifest, ticker.upper())
+    return tuple(
+        (year, month, *version)
+        for (year, month), version in sorted(manifest.items())
+        if overlaps_range(*month_bounds(year, month), start_timestamp, end_timestamp)
+    )
+
+
+async def archived_month_bounds(
+    ticker: str,
+    start_timestamp: Optional[int],
+    end_timestamp: Optional[int],
+) -> List[Tuple[int, int]]:
+    """Границы [начало, конец) архивных месяцев тикера, пересекающихся с диапазоном."""
+    if not settings.archive_uri:
+        return []
+    from app.db.archive import get_archive
+
+    months = await asyncio.to_thread(get_archive().archived_months, ticker.upper())
+    bounds = [month_bounds(year, month) for year, month in months]
+    return [
+        (month_start, month_end)
+        for month_start, month_end in bounds
+        if overlaps_range(month_start, month_end, start_timestamp, end_timestamp)
+    ]
+
+
+async def archived_tickers() -> List[str]:
+    """Тикеры, у которых есть архивные месяцы."""
+    if not settings.archive_uri:
+        return []
+    from app.db.archive import get_archive
+
+    return await asyncio.to_thread(get_archive().tickers)
+
+
+def archive_price(row: Sequence) -> Price:
+    """ORM-объект Price (не привязанный к сессии) по строке архива."""
+    return Price(id=row[0], ticker=row[1], price=row[2], timestamp=row[3], created_at=row[4], timestamp_ms=row[5])
 
 
 class PriceRepository:
@@ -13,6 +303,7 @@ class PriceRepository:
         """Инициализация репозитория."""
         self.session = session
 
+    @observe_query("create")
     async def create(self, ticker: str, price: float, timestamp: int) -> Price:
         """Создать новую запись о цене."""
         price_obj = Price(
@@ -21,43 +312,656 @@ class PriceRepository:
             timestamp=timestamp,
         )
         self.session.add(price_obj)
+        if settings.rollups_enabled:
+            await RollupRepository(self.session).apply([price_obj])
         await self.session.commit()
         await self.session.refresh(price_obj)
         return price_obj
 
+    @observe_query("bulk_create")
+    async def bulk_create(
+        self,
+        items: Iterable[Mapping],
+        ignore_conflicts: bool = True,
+    ) -> List[Price]:
+        """
+        Создать пачку записей о ценах multi-row INSERT в одной транзакции.
+
+        Args:
+            items: Записи с ключами ticker, price, timestamp и необязательным
+                timestamp_ms (миллисекунды внутри секунды)
+            ignore_conflicts: Пропускать записи, уже сохраненные для того же
+                тикера и времени (ON CONFLICT DO NOTHING)
+
+        Returns:
+            Фактически вставленные записи
+        """
+        created_at = datetime.utcnow()
+        rows = [
+            {
+                "ticker": item["ticker"].upper(),
+                "price": item["price"],
+                "timestamp": item["timestamp"],
+                "timestamp_ms": item.get("timestamp_ms", 0),
+                "created_at": created_at,
+            }
+            for item in items
+        ]
+        if not rows:
+            return []
+
+        created: List[Price] = []
+        for start in range(0, len(rows), BULK_INSERT_CHUNK_SIZE):
+            stmt = dialect_insert(self.session, Price).values(rows[start:start + BULK_INSERT_CHUNK_SIZE])
+            if ignore_conflicts:
+                stmt = stmt.on_conflict_do_nothing(index_elements=["ticker", "timestamp", "timestamp_ms"])
+            result = await self.session.scalars(stmt.returning(Price))
+            created.extend(result.all())
+        if settings.rollups_enabled and created:
+            # Агрегаты обновляются в той же транзакции только по новым записям
+            await RollupRepository(self.session).apply(created)
+        await self.session.commit()
+        ingestion_lag.record(created)
+        return created
+
+    @observe_query("get_all_by_ticker")
     async def get_all_by_ticker(self, ticker: str, limit: Optional[int] = None, offset: int = 0) -> List[Price]:
-        """Получить все записи по тикеру."""
-        query = select(Price).where(Price.ticker == ticker.upper()).order_by(desc(Price.timestamp))
-        if limit:
-            query = query.limit(limit).offset(offset)
+        """Получить записи по тикеру (не больше api_max_page_size за раз)."""
+        limit = min(limit or settings.api_max_page_size, settings.api_max_page_size)
+        query = (
+            select(Price)
+            .where(Price.ticker == ticker.upper())
+            .order_by(desc(Price.timestamp), desc(Price.id))
+            .limit(limit)
+            .offset(offset)
+        )
         result = await self.session.execute(query)
         return list(result.scalars().all())
 
+    @staticmethod
+    def _page_query(
+        entities: tuple,
+        ticker: str,
+        limit: int,
+        cursor: Optional[Tuple[int, int]],
+        offset: int,
+    ) -> Select:
+        query = select(*entities).where(Price.ticker == ticker.upper())
+        if cursor is not None:
+            cursor_timestamp, cursor_id = cursor
+            query = query.where(
+                Price.timestamp <= cursor_timestamp,
+                tuple_(Price.timestamp, Price.id) < tuple_(cursor_timestamp, cursor_id),
+            )
+        # Лишняя строка показывает, есть ли следующая страница
+        return (
+            query.order_by(desc(Price.timestamp), desc(Price.id))
+            .limit(limit + 1)
+            .offset(offset)
+        )
+
+    @observe_query("get_page_by_ticker", count=count_page_rows)
+    async def get_page_by_ticker(
+        self,
+        ticker: str,
+        limit: int,
+        cursor: Optional[Tuple[int, int]] = None,
+        offset: int = 0,
+    ) -> Tuple[List[Price], Optional[Tuple[int, int]]]:
+        """
+        Получить страницу записей по тикеру (keyset-пагинация).
+
+        Записи упорядочены по (timestamp, id) по убыванию. Следующая страница
+        начинается строго после позиции курсора, поэтому запрос идет по
+        индексу idx_ticker_timestamp без сканирования пропущенных строк.
+        Если включен архив, страница дополняется архивными месяцами.
+
+        Args:
+            ticker: Тикер валюты
+            limit: Размер страницы (не больше api_max_page_size)
+            cursor: Позиция (timestamp, id) последней записи предыдущей страницы
+            offset: Смещение (устаревший способ пагинации)
+
+        Returns:
+            Кортеж (записи страницы, позиция для следующей страницы или None)
+        """
+        limit = min(limit, settings.api_max_page_size)
+        months = await archived_month_bounds(ticker, None, cursor[0] if cursor else None)
+        if months:
+            # Смещение применяется к объединению записей БД и архива
+            result = await self.session.execute(self._page_query((Price,), ticker, offset + limit, cursor, 0))
+            prices = await self._merge_archive_page(
+                list(result.scalars().all()), ticker, limit, cursor, offset, archive_price,
+            )
+        else:
+            result = await self.session.execute(self._page_query((Price,), ticker, limit, cursor, offset))
+            prices = list(result.scalars().all())
+
+        next_position = None
+        if len(prices) > limit:
+            prices = prices[:limit]
+            next_position = (prices[-1].timestamp, prices[-1].id)
+        return prices, next_position
+
+    @observe_query("get_page_rows_by_ticker", count=count_page_rows)
+    async def get_page_rows_by_ticker(
+        self,
+        ticker: str,
+        limit: int,
+        cursor: Optional[Tuple[int, int]] = None,
+        offset: int = 0,
+    ) -> Tuple[List[Row], Optional[Tuple[int, int]]]:
+        """
+        То же, что get_page_by_ticker, но без создания ORM-объектов.
+
+        Returns:
+            Кортеж (строки PRICE_COLUMNS, позиция для следующей страницы или None)
+        """
+        limit = min(limit, settings.api_max_page_size)
+        months = await archived_month_bounds(ticker, None, cursor[0] if cursor else None)
+        if months:
+            result = await self.session.execute(self._page_query(PRICE_COLUMNS, ticker, offset + limit, cursor, 0))
+            rows = await self._merge_archive_page(list(result.all()), ticker, limit, cursor, offset)
+        else:
+            result = await self.session.execute(self._page_query(PRICE_COLUMNS, ticker, limit, cursor, offset))
+            rows = list(result.all())
+
+        next_position = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_position = (rows[-1].timestamp, rows[-1].id)
+        return rows, next_position
+
+    @observe_query("get_range_version")
+    async def get_range_version(
+        self,
+        ticker: str,
+        start_timestamp: Optional[int],
+        end_timestamp: Optional[int],
+    ) -> RangeVersion:
+        """
+        Версия данных тикера в диапазоне дат для HTTP-валидаторов.
+
+        Меняется при любой записи в диапазон, в том числе опоздавшей: число
+        строк и самый поздний момент считаются по БД, время изменения - по
+        created_at строк и mtime архивных файлов диапазона.
+        """
+        query = select(func.count(), func.max(PRICE_MOMENT), func.max(Price.created_at)).where(
+            Price.ticker == ticker.upper()
+        )
+        if start_timestamp:
+            query = query.where(Price.timestamp >= start_timestamp)
+        if end_timestamp:
+            query = query.where(Price.timestamp <= end_timestamp)
+        count, max_moment, created_at = (await self.session.execute(query)).one()
+
+        archive = await archived_month_versions(ticker, start_timestamp, end_timestamp)
+        modified = [created_at.replace(tzinfo=timezone.utc).timestamp()] if created_at is not None else []
+        modified.extend(mtime_ns / 1e9 for *_, mtime_ns in archive if mtime_ns is not None)
+        return RangeVersion(count, max_moment, max(modified, default=None), archive)
+
+    @observe_query("get_latest_by_ticker")
     async def get_latest_by_ticker(self, ticker: str) -> Optional[Price]:
         """Получить последнюю цену по тикеру."""
         query = (
             select(Price)
             .where(Price.ticker == ticker.upper())
-            .order_by(desc(Price.timestamp))
+            .order_by(desc(Price.timestamp), desc(Price.timestamp_ms))
             .limit(1)
         )
         result = await self.session.execute(query)
         return result.scalar_one_or_none()
 
+    @staticmethod
+    def _date_range_query(
+        entities: tuple,
+        ticker: str,
+        start_timestamp: Optional[int],
+        end_timestamp: Optional[int],
+    ) -> Select:
+        query = select(*entities).where(Price.ticker == ticker.upper())
+
+        if start_timestamp:
+            query = query.where(Price.timestamp >= start_timestamp)
+        if end_timestamp:
+            query = query.where(Price.timestamp <= end_timestamp)
+
+        return query.order_by(desc(Price.timestamp), desc(Price.timestamp_ms))
+
+    async def _read_archived_segment(self, ticker: str, start_timestamp: int, end_timestamp: int) -> List[Sequence]:
+        """
+        Строки участка архивного месяца по возрастанию времени.
+
+        Вместе с архивом читаются записи того же месяца, дописанные в БД
+        после архивирования (например, из журнала ingestion).
+        """
+        rows = await read_archive(ticker, start_timestamp, end_timestamp)
+        result = await self.session.execute(
+            self._date_range_query(PRICE_COLUMNS, ticker, start_timestamp, end_timestamp)
+        )
+        rows.extend(result.all())
+        rows.sort(key=itemgetter(3, 5))
+        return rows
+
+    async def _merge_archive_page(
+        self,
+        items: list,
+        ticker: str,
+        limit: int,
+        cursor: Optional[Tuple[int, int]],
+        offset: int,
+        convert: Optional[Callable[[Sequence], object]] = None,
+    ) -> list:
+        """
+        Объединить первые offset + limit + 1 записей БД с архивом и применить смещение.
+
+        Из архива читаются не больше offset + limit + 1 строк до курсора;
+        строки старше записи, замыкающей страницу БД, не читаются.
+        """
+        count = offset + limit + 1
+        floor = items[-1].timestamp if len(items) >= count else None
+        archived = await read_archive_page(ticker, count, cursor, floor)
+        merged = items + (archived if convert is None else [convert(row) for row in archived])
+        merged.sort(key=lambda item: (item.timestamp, item.id), reverse=True)
+        return merged[offset:count]
+
+    @observe_query("get_latest_many")
+    async def get_latest_many(self, tickers: Iterable[str]) -> List[Price]:
+        """
+        Получить последние цены нескольких тикеров одним запросом.
+
+        В PostgreSQL для каждого тикера выполняется LATERAL-подзапрос с
+        LIMIT 1 по индексу idx_ticker_timestamp (одна проба индекса на тикер
+        независимо от длины истории). В других СУБД используется соединение
+        с максимальным временем записи по тикеру.
+
+        Returns:
+            Последние цены найденных тикеров, по тикеру
+        """
+        tickers = sorted({ticker.upper() for ticker in tickers})
+        if not tickers:
+            return []
+
+        if self.session.get_bind().dialect.name == "postgresql":
+            requested = values(column("ticker", String), name="requested").data([(ticker,) for ticker in tickers])
+            latest = (
+                select(Price)
+                .where(Price.ticker == requested.c.ticker)
+                .order_by(desc(Price.timestamp), desc(Price.timestamp_ms))
+                .limit(1)
+                .lateral("latest")
+            )
+            latest_price = aliased(Price, latest)
+            query = (
+                select(latest_price)
+                .select_from(requested)
+                .join(latest, true())
+                .order_by(latest_price.ticker)
+            )
+        else:
+            newest = (
+                select(Price.ticker, func.max(PRICE_MOMENT).label("moment"))
+                .where(Price.ticker.in_(tickers))
+                .group_by(Price.ticker)
+                .subquery()
+            )
+            query = (
+                select(Price)
+                .join(newest, and_(
+                    Price.ticker == newest.c.ticker,
+                    Price.timestamp == newest.c.moment // 1000,
+                    Price.timestamp_ms == newest.c.moment % 1000,
+                ))
+                .order_by(Price.ticker)
+            )
+
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
+    @observe_query("get_by_ticker_and_date_range")
     async def get_by_ticker_and_date_range(
         self,
         ticker: str,
         start_timestamp: Optional[int] = None,
         end_timestamp: Optional[int] = None,
     ) -> List[Price]:
-        """Получить цены по тикеру в диапазоне дат."""
-        query = select(Price).where(Price.ticker == ticker.upper())
+        """
+        Получить цены по тикеру в диапазоне дат.
+
+        Если включен архив (archive_uri), результат дополняется строками
+        заархивированных месяцев, пересекающихся с диапазоном.
+        """
+        query = self._date_range_query((Price,), ticker, start_timestamp, end_timestamp)
+        result = await self.session.execute(query)
+        prices = list(result.scalars().all())
+
+        archived = await read_archive(ticker, start_timestamp, end_timestamp)
+        if archived:
+            prices.extend(archive_price(row) for row in archived)
+            prices.sort(key=lambda price_obj: (price_obj.timestamp, price_obj.timestamp_ms), reverse=True)
+        return prices
+
+    @observe_query("get_rows_by_ticker_and_date_range")
+    async def get_rows_by_ticker_and_date_range(
+        self,
+        ticker: str,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None,
+    ) -> List[Sequence]:
+        """
+        Получить цены по тикеру в диапазоне дат в виде строк PRICE_COLUMNS.
+
+        Облегченный вариант get_by_ticker_and_date_range для больших
+        диапазонов: выбираются только нужные столбцы, ORM-объекты не
+        создаются. Архивные строки имеют тот же порядок столбцов.
+        """
+        query = self._date_range_query(PRICE_COLUMNS, ticker, start_timestamp, end_timestamp)
+        result = await self.session.execute(query)
+        rows: List[Sequence] = list(result.all())
+
+        archived = await read_archive(ticker, start_timestamp, end_timestamp)
+        if archived:
+            rows.extend(archived)
+            rows.sort(key=itemgetter(3, 5), reverse=True)
+        return rows
+
+    async def stream_by_ticker_and_date_range(
+        self,
+        ticker: str,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None,
+        partition_size: int = STREAM_PARTITION_SIZE,
+    ) -> AsyncIterator[List[Row]]:
+        """
+        Потоково читать цены по тикеру в диапазоне дат порциями.
+
+        Строки PRICE_COLUMNS читаются через серверный курсор по возрастанию
+        времени, поэтому память не растет с размером диапазона. Архивные
+        месяцы (если включен архив) читаются по одному месяцу за раз.
+
+        Yields:
+            Порции строк размером до partition_size
+        """
+        months = await archived_month_bounds(ticker, start_timestamp, end_timestamp)
+        for segment_start, segment_end, archived in split_by_archived_months(start_timestamp, end_timestamp, months):
+            if archived:
+                rows = await self._read_archived_segment(ticker, segment_start, segment_end)
+                for start in range(0, len(rows), partition_size):
+                    yield rows[start:start + partition_size]
+                continue
+
+            query = select(*PRICE_COLUMNS).where(Price.ticker == ticker.upper())
+            if segment_start:
+                query = query.where(Price.timestamp >= segment_start)
+            if segment_end:
+                query = query.where(Price.timestamp <= segment_end)
+
+            query = query.order_by(Price.timestamp, Price.timestamp_ms, Price.id)
+            result = await self.session.stream(query, execution_options={"yield_per": partition_size})
+            try:
+                async for partition in result.partitions():
+                    yield partition
+            finally:
+                await result.close()
+
+    @observe_query("get_ohlc")
+    async def get_ohlc(
+        self,
+        ticker: str,
+        interval_seconds: int,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None,
+    ) -> List[Row]:
+        """
+        Получить свечи OHLC по тикеру.
+
+        При включенных агрегатах свечи строятся из самой грубой таблицы
+        rollup, разрешение которой делит интервал, иначе - по сырым ценам
+        (архивные месяцы - по строкам архива). Интервалы свечей делят сутки,
+        поэтому свеча не пересекает границу месяца.
+
+        Returns:
+            Строки (bucket, open, high, low, close, mean, count) по возрастанию bucket
+        """
+        if settings.rollups_enabled:
+            return await RollupRepository(self.session).get_candles(
+                ticker, interval_seconds, start_timestamp, end_timestamp
+            )
+
+        months = await archived_month_bounds(ticker, start_timestamp, end_timestamp)
+        candles: List[Sequence] = []
+        for segment_start, segment_end, archived in split_by_archived_months(start_timestamp, end_timestamp, months):
+            if archived:
+                rows = await self._read_archived_segment(ticker, segment_start, segment_end)
+                candles.extend(candles_from_prices(rows, interval_seconds))
+            else:
+                candles.extend(await self._price_candles(ticker, interval_seconds, segment_start, segment_end))
+        return candles
+
+    async def _price_candles(
+        self,
+        ticker: str,
+        interval_seconds: int,
+        start_timestamp: Optional[int],
+        end_timestamp: Optional[int],
+    ) -> List[Row]:
+        buckets = price_buckets_query(interval_seconds, ticker, start_timestamp, end_timestamp).subquery()
+        query = select(
+            buckets.c.bucket,
+            buckets.c.open,
+            buckets.c.high,
+            buckets.c.low,
+            buckets.c.close,
+            func.round(buckets.c.price_sum / buckets.c.count, 8).label("mean"),
+            buckets.c.count,
+        ).order_by(buckets.c.bucket)
+        result = await self.session.execute(query)
+        return list(result.all())
+
+
+class RollupRepository:
+    """Репозиторий таблиц агрегатов цен (1m/1h/1d)."""
+
+    def __init__(self, session: AsyncSession):
+        """Инициализация репозитория."""
+        self.session = session
+
+    @staticmethod
+    def model_for_interval(interval_seconds: int) -> Type[PriceRollupMixin]:
+        """Самая грубая таблица агрегатов, разрешение которой делит интервал."""
+        for model in reversed(ROLLUP_MODELS):
+            if interval_seconds % model.resolution == 0:
+                return model
+        raise ValueError(f"No rollup table for interval {interval_seconds}s")
+
+    async def apply(self, prices: List[Price]) -> None:
+        """
+        Инкрементально учесть новые записи во всех таблицах агрегатов.
+
+        Не коммитит транзакцию: вызывается вместе со вставкой цен.
+        """
+        for model in ROLLUP_MODELS:
+            await self._upsert(model, aggregate_prices(prices, model.resolution))
+
+    async def _upsert(self, model: Type[PriceRollupMixin], rows: List[dict]) -> None:
+        """Слить строки агрегатов с уже сохраненными строками тех же бакетов."""
+        for start in range(0, len(rows), ROLLUP_UPSERT_CHUNK_SIZE):
+            stmt = dialect_insert(self.session, model).values(rows[start:start + ROLLUP_UPSERT_CHUNK_SIZE])
+            new = stmt.excluded
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["ticker", "bucket"],
+                set_={
+                    "high": case((new.high > model.high, new.high), else_=model.high),
+                    "low": case((new.low < model.low, new.low), else_=model.low),
+                    "open": case(
+                        (new.open_moment < model.open_moment, new.open),
+                        else_=model.open,
+                    ),
+                    "open_moment": case(
+                        (new.open_moment < model.open_moment, new.open_moment),
+                        else_=model.open_moment,
+                    ),
+                    # Сравнение с миллисекундами: более ранняя запись той же
+                    # секунды, пришедшая позже, не перезаписывает close
+                    "close": case(
+                        (new.close_moment > model.close_moment, new.close),
+                        else_=model.close,
+                    ),
+                    "close_moment": case(
+                        (new.close_moment > model.close_moment, new.close_moment),
+                        else_=model.close_moment,
+                    ),
+                    "price_sum": model.price_sum + new.price_sum,
+                    "count": model.count + new.count,
+                },
+            )
+            await self.session.execute(stmt)
+
+    async def rebuild(
+        self,
+        ticker: Optional[str] = None,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None,
+    ) -> None:
+        """
+        Пересчитать агрегаты по сырым ценам (backfill).
+
+        Границы диапазона расширяются до целых интервалов каждой таблицы.
+        Архивные месяцы (см. app.db.archive) пересчитываются по строкам
+        архива вместе с записями, дописанными в БД после архивирования.
+        """
+        bounds = {}
+        for model in ROLLUP_MODELS:
+            resolution = model.resolution
+            start = start_timestamp - start_timestamp % resolution if start_timestamp else None
+            end = end_timestamp - end_timestamp % resolution + resolution - 1 if end_timestamp else None
+            bounds[model] = (start, end)
+
+            delete_stmt = delete(model)
+            if ticker:
+                delete_stmt = delete_stmt.where(model.ticker == ticker.upper())
+            if start is not None:
+                delete_stmt = delete_stmt.where(model.bucket >= start)
+            if end is not None:
+                delete_stmt = delete_stmt.where(model.bucket <= end)
+            await self.session.execute(delete_stmt)
+
+            source = price_buckets_query(resolution, ticker, start_timestamp=start, end_timestamp=end)
+            columns = [column.name for column in source.selected_columns]
+            await self.session.execute(
+                dialect_insert(self.session, model).from_select(columns, source)
+            )
+
+        # Самая грубая таблица задает самый широкий диапазон чтения архива
+        widest_start, widest_end = bounds[ROLLUP_MODELS[-1]]
+        for archived_ticker in [ticker.upper()] if ticker else await archived_tickers():
+            for month_start, month_end in await archived_month_bounds(archived_ticker, widest_start, widest_end):
+                # Архив читается по месяцу: память не растет с длиной истории
+                rows = await read_archive(archived_ticker, month_start, month_end - 1)
+                for model, (start, end) in bounds.items():
+                    in_range = [
+                        row for row in rows
+                        if (start is None or row.timestamp >= start) and (end is None or row.timestamp <= end)
+                    ]
+                    await self._upsert(model, aggregate_prices(in_range, model.resolution))
+        await self.session.commit()
+
+    async def get_candles(
+        self,
+        ticker: str,
+        interval_seconds: int,
+        start_timestamp: Optional[int] = None,
+        end_timestamp: Optional[int] = None,
+    ) -> List[Row]:
+        """
+        Получить свечи по таблице агрегатов.
+
+        Границы диапазона округляются до разрешения выбранной таблицы.
+
+        Returns:
+            Строки (bucket, open, high, low, close, mean, count) по возрастанию bucket
+        """
+        model = self.model_for_interval(interval_seconds)
+        ticker = ticker.upper()
+        bucket = (model.bucket - model.bucket % interval_seconds).label("bucket")
+        buckets = select(
+            bucket,
+            func.max(model.high).label("high"),
+            func.min(model.low).label("low"),
+            func.sum(model.price_sum).label("price_sum"),
+            func.sum(model.count).label("count"),
+            func.min(model.bucket).label("first_bucket"),
+            func.max(model.bucket).label("last_bucket"),
+        ).where(model.ticker == ticker)
 
         if start_timestamp:
-            query = query.where(Price.timestamp >= start_timestamp)
+            buckets = buckets.where(model.bucket >= start_timestamp - start_timestamp % model.resolution)
         if end_timestamp:
-            query = query.where(Price.timestamp <= end_timestamp)
+            buckets = buckets.where(model.bucket <= end_timestamp)
 
-        query = query.order_by(desc(Price.timestamp))
+        buckets = buckets.group_by(bucket).subquery()
+        first = aliased(model)
+        last = aliased(model)
+
+        query = (
+            select(
+                buckets.c.bucket,
+                first.open,
+                buckets.c.high,
+                buckets.c.low,
+                last.close,
+                func.round(buckets.c.price_sum / buckets.c.count, 8).label("mean"),
+                buckets.c.count,
+            )
+            .join(first, and_(first.ticker == ticker, first.bucket == buckets.c.first_bucket))
+            .join(last, and_(last.ticker == ticker, last.bucket == buckets.c.last_bucket))
+            .order_by(buckets.c.bucket)
+        )
         result = await self.session.execute(query)
+        return list(result.all())
+
+
+class InstrumentRepository:
+    """Репозиторий реестра инструментов."""
+
+    def __init__(self, session: AsyncSession):
+        """Инициализация репозитория."""
+        self.session = session
+
+    async def get_active_names(self) -> List[str]:
+        """Тикеры активных инструментов по алфавиту."""
+        result = await self.session.execute(
+            select(Instrument.name).where(Instrument.is_active.is_(True)).order_by(Instrument.name)
+        )
         return list(result.scalars().all())
+
+    async def sync(self, names: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        Привести реестр к списку индексов Deribit.
+
+        Новые индексы добавляются, вернувшиеся активируются, отсутствующие
+        в списке помечаются неактивными (история их цен сохраняется).
+
+        Returns:
+            Словарь с добавленными/активированными и деактивированными тикерами
+        """
+        names = {name.upper() for name in names}
+        result = await self.session.execute(select(Instrument.name, Instrument.is_active))
+        existing = dict(result.all())
+
+        added = sorted(names - existing.keys())
+        reactivated = sorted(name for name in names if existing.get(name) is False)
+        deactivated = sorted(name for name, is_active in existing.items() if is_active and name not in names)
+
+        self.session.add_all(Instrument(name=name) for name in added)
+        now = datetime.utcnow()
+        if reactivated:
+            await self.session.execute(
+                update(Instrument).where(Instrument.name.in_(reactivated)).values(is_active=True, updated_at=now)
+            )
+        if deactivated:
+            await self.session.execute(
+                update(Instrument).where(Instrument.name.in_(deactivated)).values(is_active=False, updated_at=now)
+            )
+        await self.session.commit()
+        return {"added": added + reactivated, "deactivated": deactivated}
@@ -1,21 +1,38 @@
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
 from app.config import settings
 from app.db.models import Base
+from app.metrics import pools
 
-engine = create_async_engine(
-    settings.database_url,
-    echo=False,
-    future=True,
-)
 
-AsyncSessionLocal = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-    autocommit=False,
-    autoflush=False,
-)
+def create_engine() -> AsyncEngine:
+    """Создать async engine с пулом соединений по настройкам приложения."""
+    return create_async_engine(
+        settings.database_url,
+        echo=False,
+        future=True,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=True,
+    )
+
+
+def create_session_maker(bind: AsyncEngine) -> async_sessionmaker:
+    """Создать фабрику сессий для указанного engine."""
+    return async_sessionmaker(
+        bind,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autocommit=False,
+        autoflush=False,
+    )
+
+
+engine = create_engine()
+pools.register_engine("default", engine)
+
+AsyncSessionLocal = create_session_maker(engine)
 
 
 async def get_db() -> AsyncSession:
@@ -27,8 +44,26 @@ async def get_db() -> AsyncSession:
             await session.close()
 
 
+def get_session_factory() -> async_sessionmaker:
+    """
+    Dependency для получения фабрики сессий.
+
+    Нужна эндпоинтам со StreamingResponse: сессия из get_db закрывается
+    до отправки тела ответа, поэтому такие эндпоинты открывают сессию сами.
+    """
+    return AsyncSessionLocal
+
+
 async def init_db() -> None:
-    """Инициализация базы данных - создание таблиц."""
+    """
+    Инициализация базы данных - создание таблиц.
+
+    При PRICES_PARTITIONING=true также создаются месячные партиции prices
+    и применяется политика хранения.
+    """
     async with engine.begin() as conn:
         from app.db.models import Base as ModelsBase
         await conn.run_sync(ModelsBase.metadata.create_all)
+        if settings.prices_partitioning and conn.dialect.name == "postgresql":
+            from app.db.partitions import maintain_partitions
+            await maintain_partitions(conn)
@@ -1,21 +1,105 @@
 from datetime import datetime
-from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, Numeric, String
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Index, Integer, Numeric, SmallInteger, String
 from sqlalchemy.orm import declarative_base
 
+from app.config import settings
+
 Base = declarative_base()
 
 
 class Price(Base):
-    """Модель для хранения цен криптовалют."""
+    """
+    Модель для хранения цен криптовалют.
+
+    Время записи - timestamp (секунды UNIX) и timestamp_ms (миллисекунды
+    внутри секунды), поэтому цены можно сохранять чаще раза в секунду.
+
+    Индексы рассчитаны на запись в конец таблицы: уникальный
+    (ticker, timestamp, timestamp_ms) обслуживает все выборки по тикеру, а BRIN
+    по timestamp - сканы по времени (обслуживание партиций, архивирование) и
+    почти не стоит ничего при вставке.
+    При PRICES_PARTITIONING=true таблица секционируется по месяцам по timestamp
+    (см. app.db.partitions), и timestamp входит в первичный ключ.
+    """
 
     __tablename__ = "prices"
 
-    id = Column(Integer, primary_key=True, index=True)
-    ticker = Column(String(20), nullable=False, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ticker = Column(String(20), nullable=False)
     price = Column(Numeric(20, 8), nullable=False)
-    timestamp = Column(BigInteger, nullable=False, index=True)
+    timestamp = Column(BigInteger, nullable=False, primary_key=settings.prices_partitioning)
+    timestamp_ms = Column(SmallInteger, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     __table_args__ = (
-        Index("idx_ticker_timestamp", "ticker", "timestamp"),
+        Index("idx_ticker_timestamp", "ticker", "timestamp", "timestamp_ms", unique=True),
+        Index("idx_prices_timestamp_brin", "timestamp", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (timestamp)"} if settings.prices_partitioning else {},
     )
+
+
+class Instrument(Base):
+    """
+    Модель реестра инструментов (индексов Deribit).
+
+    Реестр синхронизируется с public/get_index_price_names: новые индексы
+    добавляются, пропавшие помечаются неактивными. Активные инструменты
+    определяют опрашиваемые тикеры и допустимые тикеры API.
+    """
+
+    __tablename__ = "instruments"
+
+    name = Column(String(20), primary_key=True)
+    is_active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class PriceRollupMixin:
+    """
+    Общие колонки таблиц агрегатов цен (rollup).
+
+    Строка хранит свечу по тикеру за интервал, начинающийся в bucket.
+    Сумма и число цен позволяют досчитывать среднее инкрементально, а
+    open_moment/close_moment (время записей open/close в миллисекундах
+    UNIX) - корректно обновлять open/close при поступлении новых записей,
+    в том числе записей той же секунды в произвольном порядке.
+    """
+
+    resolution: int
+
+    ticker = Column(String(20), primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)
+    open = Column(Numeric(20, 8), nullable=False)
+    high = Column(Numeric(20, 8), nullable=False)
+    low = Column(Numeric(20, 8), nullable=False)
+    close = Column(Numeric(20, 8), nullable=False)
+    price_sum = Column(Numeric(38, 8), nullable=False)
+    count = Column(Integer, nullable=False)
+    open_moment = Column(BigInteger, nullable=False)
+    close_moment = Column(BigInteger, nullable=False)
+
+
+class PriceRollup1m(PriceRollupMixin, Base):
+    """Минутные агрегаты цен."""
+
+    __tablename__ = "price_rollups_1m"
+    resolution = 60
+
+
+class PriceRollup1h(PriceRollupMixin, Base):
+    """Часовые агрегаты цен."""
+
+    __tablename__ = "price_rollups_1h"
+    resolution = 3600
+
+
+class PriceRollup1d(PriceRollupMixin, Base):
+    """Дневные агрегаты цен."""
+
+    __tablename__ = "price_rollups_1d"
+    resolution = 86400
+
+
+# Таблицы агрегатов от самой детальной к самой грубой
+ROLLUP_MODELS = (PriceRollup1m, PriceRollup1h, PriceRollup1d)
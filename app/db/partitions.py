@@ -0,0 +1,152 @@
+"""
+Управление месячными партициями таблицы prices (PostgreSQL).
+
+При PRICES_PARTITIONING=true таблица prices создается секционированной
+по диапазонам timestamp. Партиция за месяц называется prices_yYYYYmMM и
+покрывает [начало месяца, начало следующего месяца) в UNIX timestamp.
+Партиция prices_default принимает записи вне созданных диапазонов
+(например, загрузку старой истории).
+
+Обслуживание (создание будущих партиций и политика хранения) выполняется
+при init_db и ежедневной задачей Celery app.tasks.maintenance.maintain_partitions.
+"""
+import logging
+import re
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+PARTITION_NAME_RE = re.compile(r"^prices_y(\d{4})m(\d{2})$")
+DEFAULT_PARTITION = "prices_default"
+RETENTION_MODES = {"detach", "drop"}
+
+
+def add_months(year: int, month: int, months: int) -> Tuple[int, int]:
+    """Сдвинуть (год, месяц) на указанное число месяцев."""
+    index = year * 12 + (month - 1) + months
+    return index // 12, index % 12 + 1
+
+
+def month_bounds(year: int, month: int) -> Tuple[int, int]:
+    """Границы месяца в UNIX timestamp: [начало, начало следующего)."""
+    next_year, next_month = add_months(year, month, 1)
+    start = datetime(year, month, 1, tzinfo=timezone.utc)
+    end = datetime(next_year, next_month, 1, tzinfo=timezone.utc)
+    return int(start.timestamp()), int(end.timestamp())
+
+
+def partition_name(year: int, month: int) -> str:
+    """Имя партиции за месяц."""
+    return f"prices_y{year:04d}m{month:02d}"
+
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    """Является ли таблица prices секционированной."""
+    result = await conn.execute(text(
+        "SELECT c.relkind FROM pg_class c "
+        "JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relname = 'prices' AND n.nspname = current_schema()"
+    ))
+    return result.scalar_one_or_none() == "p"
+
+
+async def list_partitions(conn: AsyncConnection) -> List[Tuple[int, int, str]]:
+    """Месячные партиции prices в виде (год, месяц, имя), по возрастанию."""
+    result = await conn.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = 'prices'"
+    ))
+    partitions = []
+    for name in result.scalars():
+        match = PARTITION_NAME_RE.match(name)
+        if match:
+            partitions.append((int(match.group(1)), int(match.group(2)), name))
+    return sorted(partitions)
+
+
+async def ensure_partitions(
+    conn: AsyncConnection,
+    months_ahead: Optional[int] = None,
+    now: Optional[datetime] = None,
+) -> List[str]:
+    """
+    Создать партиции на текущий и months_ahead следующих месяцев.
+
+    Returns:
+        Имена созданных партиций
+    """
+    months_ahead = settings.partition_months_ahead if months_ahead is None else months_ahead
+    now = now or datetime.now(timezone.utc)
+    existing = {name for _, _, name in await list_partitions(conn)}
+
+    await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF prices DEFAULT"))
+
+    created = []
+    for offset in range(months_ahead + 1):
+        year, month = add_months(now.year, now.month, offset)
+        name = partition_name(year, month)
+        if name in existing:
+            continue
+        start, end = month_bounds(year, month)
+        await conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF prices "
+            f"FOR VALUES FROM ({start}) TO ({end})"
+        ))
+        created.append(name)
+        logger.info(f"Created partition {name}")
+    return created
+
+
+async def apply_retention(
+    conn: AsyncConnection,
+    retain_months: Optional[int] = None,
+    mode: Optional[str] = None,
+    now: Optional[datetime] = None,
+) -> List[str]:
+    """
+    Отсоединить или удалить партиции старше retain_months полных месяцев.
+
+    В режиме detach партиция становится обычной таблицей с тем же именем
+    (ее можно заархивировать и удалить позже), в режиме drop - удаляется.
+
+    Returns:
+        Имена обработанных партиций
+    """
+    retain_months = settings.retention_months if retain_months is None else retain_months
+    mode = mode or settings.retention_mode
+    if retain_months is None:
+        return []
+    if mode not in RETENTION_MODES:
+        raise ValueError(f"Retention mode must be one of {RETENTION_MODES}")
+
+    now = now or datetime.now(timezone.utc)
+    cutoff = add_months(now.year, now.month, -retain_months)
+
+    processed = []
+    for year, month, name in await list_partitions(conn):
+        if (year, month) >= cutoff:
+            break
+        if mode == "drop":
+            await conn.execute(text(f"DROP TABLE {name}"))
+        else:
+            await conn.execute(text(f"ALTER TABLE prices DETACH PARTITION {name}"))
+        processed.append(name)
+        logger.info(f"Retention: {mode} partition {name}")
+    return processed
+
+
+async def maintain_partitions(conn: AsyncConnection) -> dict:
+    """Создать будущие партиции и применить политику хранения."""
+    if not await is_partitioned(conn):
+        logger.warning("Table prices is not partitioned, skipping partition maintenance")
+        return {"created": [], "retired": []}
+    created = await ensure_partitions(conn)
+    retired = await apply_retention(conn)
+    return {"created": created, "retired": retired}
@@ -0,0 +1,63 @@
+"""
+Пересчет таблиц агрегатов цен (backfill/rebuild).
+
+В штатном режиме агрегаты обновляются инкрементально при вставке цен
+(PriceRepository.bulk_create). Команда нужна для заполнения агрегатов по
+истории, накопленной до их появления, и для исправления расхождений.
+Месяцы, перенесенные в архив Parquet, пересчитываются по файлам архива.
+
+Запуск:
+    python -m app.db.rollups --ticker BTC_USD --start 2024-01-01T00:00:00
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+
+from app.db.crud import RollupRepository
+from app.db.database import AsyncSessionLocal, engine, init_db
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[int]:
+    """UNIX timestamp или дата ISO 8601 в UNIX timestamp."""
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp())
+
+
+async def rebuild_rollups(
+    ticker: Optional[str] = None,
+    start_timestamp: Optional[int] = None,
+    end_timestamp: Optional[int] = None,
+) -> None:
+    """Пересчитать агрегаты по сырым ценам в указанном диапазоне."""
+    await init_db()
+    async with AsyncSessionLocal() as session:
+        await RollupRepository(session).rebuild(ticker, start_timestamp, end_timestamp)
+    await engine.dispose()
+
+
+def main() -> None:
+    """Точка входа CLI."""
+    parser = argparse.ArgumentParser(description="Rebuild price rollup tables")
+    parser.add_argument("--ticker", help="Тикер (по умолчанию все)")
+    parser.add_argument("--start", help="Начало диапазона (ISO 8601 или UNIX timestamp)")
+    parser.add_argument("--end", help="Конец диапазона (ISO 8601 или UNIX timestamp)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    start_timestamp = _parse_timestamp(args.start)
+    end_timestamp = _parse_timestamp(args.end)
+    logger.info(f"Rebuilding rollups for ticker={args.ticker or 'all'} range={start_timestamp}..{end_timestamp}")
+    asyncio.run(rebuild_rollups(args.ticker, start_timestamp, end_timestamp))
+    logger.info("Rollups rebuilt")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+from app.ingest.daemon import main
+
+main()
@@ -0,0 +1,231 @@
+"""
+Локальный журнал упреждающей записи (write-ahead) для ingestion.
+
+Цены сначала дописываются в журнал на диске, затем отдельный сборщик
+переносит их в БД большими пачками. Пока БД недоступна или медленная,
+ingestion продолжает писать в журнал, а после восстановления БД накопленное
+дописывается без пропусков.
+
+Журнал - каталог INGEST_BUFFER_DIR с сегментами <номер>.log. Запись
+идет в последний (активный) сегмент; при достижении
+INGEST_BUFFER_SEGMENT_BYTES начинается новый. Сборщик закрывает активный
+сегмент, записывает закрытые сегменты в БД по порядку и удаляет каждый
+после успешной записи. Вставка идемпотентна (ON CONFLICT DO NOTHING),
+поэтому сегмент, записанный частично до сбоя, безопасно повторяется.
+
+Строка сегмента - запись [ticker, price, timestamp, timestamp_ms] в JSON
+с CRC32: недописанный хвост после аварийной остановки и строки другого
+формата отбрасываются при чтении.
+Процессы (например, prefork worker Celery) синхронизируются блокировками
+fcntl: общий .lock на время записи и смены сегмента, блокировка самого
+сегмента на время его переноса в БД.
+
+Если журнал занимает больше INGEST_BUFFER_MAX_BYTES, запись отклоняется
+с BufferFullError - ingestion должен притормозить, а не заполнить диск.
+"""
+import asyncio
+import fcntl
+import logging
+import os
+import zlib
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Iterator, List, Mapping, Optional, Sequence
+import orjson
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".log"
+LOCK_FILE = ".lock"
+
+BatchSink = Callable[[List[dict]], Awaitable[Any]]
+
+
+class BufferFullError(Exception):
+    """Журнал достиг INGEST_BUFFER_MAX_BYTES."""
+
+
+def encode_record(row: Mapping) -> bytes:
+    """Строка сегмента: CRC32 и запись [ticker, price, timestamp, timestamp_ms] в JSON."""
+    payload = orjson.dumps([row["ticker"], str(row["price"]), row["timestamp"], row["timestamp_ms"]])
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+
+def decode_record(line: bytes) -> Optional[dict]:
+    """Запись из строки сегмента или None для поврежденной строки."""
+    checksum, _, payload = line.rstrip(b"\n").partition(b" ")
+    try:
+        if int(checksum, 16) != zlib.crc32(payload):
+            return None
+        record = orjson.loads(payload)
+        # Объект JSON с четырьмя ключами распаковался бы без ошибки
+        if not isinstance(record, list):
+            return None
+        ticker, price, timestamp, timestamp_ms = record
+        return {"ticker": ticker, "price": Decimal(price), "timestamp": timestamp, "timestamp_ms": timestamp_ms}
+    except (ValueError, TypeError, ArithmeticError):
+        return None
+
+
+class SegmentBuffer:
+    """Журнал цен из файлов-сегментов в локальном каталоге."""
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        segment_bytes: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        fsync: Optional[bool] = None,
+    ):
+        """Инициализация журнала (каталог создается при необходимости)."""
+        self.directory = os.path.abspath(directory or settings.ingest_buffer_dir)
+        self.segment_bytes = segment_bytes or settings.ingest_buffer_segment_bytes
+        self.max_bytes = max_bytes or settings.ingest_buffer_max_bytes
+        self.fsync = settings.ingest_buffer_fsync if fsync is None else fsync
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"{number:020d}{SEGMENT_SUFFIX}")
+
+    def _segment_numbers(self) -> List[int]:
+        return sorted(
+            int(name[:-len(SEGMENT_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.endswith(SEGMENT_SUFFIX)
+        )
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Монопольная блокировка журнала между процессами."""
+        with open(os.path.join(self.directory, LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @property
+    def size_bytes(self) -> int:
+        """Размер всех сегментов журнала."""
+        total = 0
+        for number in self._segment_numbers():
+            try:
+                total += os.path.getsize(self._segment_path(number))
+            except FileNotFoundError:
+                continue
+        return total
+
+    def append(self, rows: Sequence[Mapping]) -> None:
+        """
+        Дописать записи о ценах (ticker, price, timestamp, timestamp_ms) в активный сегмент.
+
+        Raises:
+            BufferFullError: Журнал занимает больше max_bytes
+        """
+        if not rows:
+            return
+        data = b"".join(encode_record(row) for row in rows)
+        with self._locked():
+            if self.size_bytes + len(data) > self.max_bytes:
+                raise BufferFullError(f"Ingest buffer is full ({self.max_bytes} bytes)")
+            numbers = self._segment_numbers()
+            number = numbers[-1] if numbers else 0
+            path = self._segment_path(number)
+            if numbers and os.path.getsize(path) >= self.segment_bytes:
+                path = self._segment_path(number + 1)
+            with open(path, "a+b") as segment:
+                if segment.tell() > 0:
+                    segment.seek(-1, os.SEEK_END)
+                    if segment.read(1) != b"\n":
+                        # Недописанная строка после аварийной остановки не склеивается с новой
+                        data = b"\n" + data
+                segment.write(data)
+                segment.flush()
+                if self.fsync:
+                    os.fsync(segment.fileno())
+
+    async def put(self, rows: Sequence[Mapping]) -> None:
+        """Асинхронная запись в журнал (файловый ввод-вывод в потоке)."""
+        await asyncio.to_thread(self.append, rows)
+
+    def _seal(self) -> List[int]:
+        """Закрыть активный сегмент и вернуть номера закрытых сегментов."""
+        with self._locked():
+            numbers = self._segment_numbers()
+            if numbers and os.path.getsize(self._segment_path(numbers[-1])) > 0:
+                # Новые записи пойдут в следующий сегмент
+                open(self._segment_path(numbers[-1] + 1), "ab").close()
+                numbers.append(numbers[-1] + 1)
+            return numbers[:-1]
+
+    @staticmethod
+    def _read_segment(segment) -> List[dict]:
+        rows = []
+        for line in segment:
+            row = decode_record(line)
+            if row is None:
+                logger.warning(f"Skipping corrupted record in ingest buffer segment {segment.name}")
+                continue
+            rows.append(row)
+        return rows
+
+    async def drain(self, sink: BatchSink, batch_size: Optional[int] = None) -> int:
+        """
+        Перенести закрытые сегменты в БД пачками по batch_size записей.
+
+        Сегмент удаляется после записи всех его пачек; при ошибке sink
+        сегмент остается в журнале и исключение пробрасывается. Сегменты,
+        которые переносит другой процесс, пропускаются.
+
+        Returns:
+            Число перенесенных записей
+        """
+        batch_size = batch_size or settings.ingest_buffer_drain_batch_size
+        drained = 0
+        for number in await asyncio.to_thread(self._seal):
+            path = self._segment_path(number)
+            try:
+                segment = open(path, "rb")
+            except FileNotFoundError:
+                continue
+            with segment:
+                try:
+                    fcntl.flock(segment, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                if not os.path.exists(path):
+                    # Сегмент уже перенесен процессом, снявшим блокировку до нас
+                    continue
+                rows = await asyncio.to_thread(self._read_segment, segment)
+                for start in range(0, len(rows), batch_size):
+                    await sink(rows[start:start + batch_size])
+                os.remove(path)
+            drained += len(rows)
+        if drained:
+            logger.info(f"Drained {drained} records from ingest buffer")
+        return drained
+
+    async def run_drainer(self, sink: BatchSink, interval: Optional[float] = None) -> None:
+        """Периодически переносить журнал в БД до отмены задачи."""
+        interval = interval or settings.ingest_buffer_drain_interval
+        while True:
+            try:
+                await self.drain(sink)
+            except Exception as e:
+                logger.warning(f"Failed to drain ingest buffer, will retry: {e}")
+            await asyncio.sleep(interval)
+
+
+_shared_buffer: Optional[SegmentBuffer] = None
+
+
+def get_ingest_buffer() -> Optional[SegmentBuffer]:
+    """Общий журнал процесса или None, если INGEST_BUFFER_DIR не задан."""
+    global _shared_buffer
+    if settings.ingest_buffer_dir is None:
+        return None
+    if _shared_buffer is None:
+        _shared_buffer = SegmentBuffer()
+    return _shared_buffer
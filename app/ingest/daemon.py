@@ -0,0 +1,213 @@
+"""
+Демон ingestion: опрос цен в одном asyncio-процессе без Celery.
+
+Задача Celery на каждый опрос проходит через брокер Redis, worker и
+event loop процесса, хотя сама работа - несколько HTTP-запросов и один
+INSERT. Демон опрашивает REST API Deribit в собственном цикле: клиент
+Deribit (пул HTTP-соединений) и engine БД (пул соединений) общие на все
+опросы, опросы выровнены по границам POLL_INTERVAL (см.
+app.ingest.scheduler), поэтому подходят и интервалы меньше секунды.
+
+Реестр тикеров перечитывается раз в INSTRUMENTS_RELOAD_INTERVAL секунд,
+а не на каждом опросе. По SIGINT/SIGTERM демон перестает начинать новые
+опросы, ждет текущий (не дольше INGEST_SHUTDOWN_TIMEOUT секунд) и
+закрывает пулы. С журналом упреждающей записи опросы только дописывают
+цены в журнал, в БД их переносит фоновая задача демона. С
+INGEST_SHARDING=true несколько демонов делят тикеры между собой (см.
+app.ingest.sharding). При INGEST_HEALTH_PORT демон отдает состояние на
+GET /health: 200, пока последний успешный опрос был не раньше трех
+интервалов назад, иначе 503.
+
+Запуск (вместо Celery beat с задачей fetch_and_save_prices):
+    python -m app.ingest
+"""
+import asyncio
+import logging
+import signal
+import time
+from functools import partial
+from typing import Optional
+from aiohttp import web
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.cache.events import close_redis
+from app.cache.instruments import InstrumentRegistry
+from app.client.deribit_client import DeribitClient, close_deribit_client, get_deribit_client
+from app.config import settings
+from app.db.database import AsyncSessionLocal, engine
+from app.ingest.buffer import SegmentBuffer, get_ingest_buffer
+from app.ingest.polling import poll_and_store, store_batch
+from app.ingest.scheduler import run_aligned
+from app.ingest.sharding import ShardMember, tick_number
+from app.metrics import start_metrics_server
+
+logger = logging.getLogger(__name__)
+
+# Сколько интервалов без успешного опроса допускается до статуса stale
+STALE_INTERVALS = 3
+
+
+class IngestionDaemon:
+    """Цикл опроса цен с общими пулами HTTP и БД."""
+
+    def __init__(
+        self,
+        client: DeribitClient,
+        session_maker: async_sessionmaker,
+        interval: Optional[float] = None,
+        buffer: Optional[SegmentBuffer] = None,
+        shard: Optional[ShardMember] = None,
+    ):
+        """Инициализация демона (shard - участие в шардировании тикеров или None)."""
+        self.client = client
+        self.session_maker = session_maker
+        self.interval = interval or settings.poll_interval
+        self.buffer = buffer
+        self.shard = shard
+        self.registry = InstrumentRegistry()
+        self.started_at = time.time()
+        self.runs = 0
+        self.consecutive_failures = 0
+        self.last_run_at: Optional[float] = None
+        self.last_success_at: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self._stop = asyncio.Event()
+
+    def stop(self) -> None:
+        """Перестать начинать новые опросы (текущий завершится)."""
+        self._stop.set()
+
+    async def poll(self, boundary: float) -> dict:
+        """
+        Один опрос тикеров реестра.
+
+        Опрос считается успешным, если сохранена хотя бы одна цена.
+
+        Args:
+            boundary: Момент границы интервала (секунды Unix)
+
+        Returns:
+            Результаты poll_and_store
+        """
+        started = time.perf_counter()
+        self.runs += 1
+        self.last_run_at = boundary
+        try:
+            tickers = self.registry.tickers
+            if self.shard is not None:
+                tickers = await self.shard.claim(tickers, tick_number(boundary, self.interval), self.interval)
+                if not tickers:
+                    # Все тикеры достались другим участникам
+                    self.consecutive_failures = 0
+                    self.last_success_at = time.time()
+                    return {"success": [], "failed": []}
+            results = await poll_and_store(self.client, self.session_maker, tickers, self.buffer)
+        except Exception:
+            self.consecutive_failures += 1
+            raise
+        finally:
+            self.last_duration = time.perf_counter() - started
+        if results["success"]:
+            self.consecutive_failures = 0
+            self.last_success_at = time.time()
+        else:
+            self.consecutive_failures += 1
+        return results
+
+    def health(self) -> dict:
+        """Состояние демона для /health."""
+        now = time.time()
+        reference = self.last_success_at or self.started_at
+        healthy = now - reference <= STALE_INTERVALS * self.interval + settings.fetch_ticker_timeout
+        return {
+            "status": "healthy" if healthy else "stale",
+            "interval": self.interval,
+            "tickers": len(self.registry.tickers),
+            "runs": self.runs,
+            "consecutive_failures": self.consecutive_failures,
+            "last_run_at": self.last_run_at,
+            "last_success_at": self.last_success_at,
+            "last_duration": self.last_duration,
+            "buffer_bytes": self.buffer.size_bytes if self.buffer is not None else None,
+            "shard_members": len(self.shard.members) if self.shard is not None else None,
+        }
+
+    async def _handle_health(self, request: web.Request) -> web.Response:
+        state = self.health()
+        return web.json_response(state, status=200 if state["status"] == "healthy" else 503)
+
+    async def start_health_server(self, port: int, host: str = "0.0.0.0") -> web.AppRunner:
+        """Поднять HTTP-сервер с GET /health."""
+        app = web.Application()
+        app.router.add_get("/health", self._handle_health)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        logger.info(f"Ingestion health endpoint listening on {host}:{port}")
+        return runner
+
+    async def run(self) -> None:
+        """Опрашивать цены до stop(); текущий опрос завершается корректно."""
+        try:
+            async with self.session_maker() as session:
+                await self.registry.load(session)
+        except Exception as e:
+            logger.warning(f"Failed to load instrument registry, using defaults: {e}")
+        reloader = asyncio.create_task(self.registry.run(self.session_maker))
+        heartbeat = None
+        if self.shard is not None:
+            try:
+                await self.shard.heartbeat()
+            except Exception as e:
+                logger.warning(f"Ingestion shard heartbeat failed: {e}")
+            heartbeat = asyncio.create_task(self.shard.run_heartbeat())
+        drainer = None
+        if self.buffer is not None:
+            drainer = asyncio.create_task(self.buffer.run_drainer(partial(store_batch, self.session_maker)))
+        poller = asyncio.create_task(run_aligned(self.poll, self.interval, stop=self._stop))
+        logger.info(f"Ingestion daemon polling {len(self.registry.tickers)} tickers every {self.interval}s")
+        try:
+            await self._stop.wait()
+            done, _ = await asyncio.wait({poller}, timeout=settings.ingest_shutdown_timeout)
+            if not done:
+                logger.warning(f"Poll did not finish in {settings.ingest_shutdown_timeout}s, cancelling it")
+        finally:
+            background = [task for task in (poller, reloader, drainer) if task is not None]
+            for task in background:
+                task.cancel()
+            await asyncio.gather(*background, return_exceptions=True)
+            if heartbeat is not None:
+                heartbeat.cancel()
+                await asyncio.gather(heartbeat, return_exceptions=True)
+                # Тикеры сразу переходят к остальным участникам, не дожидаясь TTL
+                await self.shard.close()
+        logger.info("Ingestion daemon stopped")
+
+
+async def _run_daemon() -> None:
+    start_metrics_server()
+    shard = ShardMember() if settings.ingest_sharding else None
+    daemon = IngestionDaemon(get_deribit_client(), AsyncSessionLocal, buffer=get_ingest_buffer(), shard=shard)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, daemon.stop)
+    health_runner = None
+    if settings.ingest_health_port:
+        health_runner = await daemon.start_health_server(settings.ingest_health_port)
+    try:
+        await daemon.run()
+    finally:
+        if health_runner is not None:
+            await health_runner.cleanup()
+        await close_deribit_client()
+        await close_redis()
+        await engine.dispose()
+
+
+def main() -> None:
+    """Точка входа демона."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    asyncio.run(_run_daemon())
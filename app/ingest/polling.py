@@ -0,0 +1,174 @@
+"""
+Опрос индексных цен через REST и запись тика в БД.
+
+Общий код задачи Celery fetch_and_save_prices и демона ingestion
+(python -m app.ingest).
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.cache.events import publish_prices
+from app.cache.instruments import instrument_registry
+from app.client.deribit_client import DeribitClient, PriceTick
+from app.config import settings
+from app.db.crud import PriceRepository
+from app.ingest.buffer import BufferFullError, SegmentBuffer
+
+logger = logging.getLogger(__name__)
+
+
+def price_row(ticker: str, price: Any, timestamp_ms: int) -> dict:
+    """
+    Строка для PriceRepository.bulk_create по моменту в миллисекундах.
+
+    Args:
+        ticker: Тикер валюты
+        price: Цена
+        timestamp_ms: Момент цены в миллисекундах Unix
+
+    Returns:
+        Словарь с ticker, price, timestamp (секунды) и timestamp_ms
+    """
+    timestamp, millis = divmod(timestamp_ms, 1000)
+    return {"ticker": ticker, "price": price, "timestamp": timestamp, "timestamp_ms": millis}
+
+
+async def fetch_prices(
+    client: DeribitClient,
+    tickers: Iterable[str],
+    concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> Tuple[Dict[str, PriceTick], List[dict]]:
+    """
+    Параллельно получить индексные цены для набора тикеров.
+
+    Каждая цена получает собственный момент в миллисекундах (время
+    ответа биржи), а не общий момент начала опроса.
+
+    Одновременно выполняется не более `concurrency` запросов, каждый
+    ограничен `timeout` секундами. Ошибка или таймаут по одному тикеру
+    не мешают остальным.
+
+    Args:
+        client: Клиент Deribit
+        tickers: Тикеры для опроса
+        concurrency: Максимальное число одновременных запросов
+        timeout: Таймаут на один тикер в секундах
+
+    Returns:
+        Кортеж (цены с моментами по тикерам, список неудач с причинами)
+    """
+    tickers = list(tickers)
+    concurrency = concurrency or settings.fetch_concurrency
+    timeout = timeout or settings.fetch_ticker_timeout
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _fetch_one(ticker: str) -> Optional[PriceTick]:
+        async with semaphore:
+            return await asyncio.wait_for(client.get_index_price_tick(ticker), timeout=timeout)
+
+    outcomes = await asyncio.gather(
+        *(_fetch_one(ticker) for ticker in tickers),
+        return_exceptions=True,
+    )
+
+    prices: Dict[str, PriceTick] = {}
+    failed: List[dict] = []
+    for ticker, outcome in zip(tickers, outcomes):
+        if isinstance(outcome, asyncio.TimeoutError):
+            failed.append({"ticker": ticker, "reason": f"Timeout after {timeout}s"})
+            logger.warning(f"Timeout fetching price for {ticker} after {timeout}s")
+        elif isinstance(outcome, BaseException):
+            failed.append({"ticker": ticker, "reason": str(outcome)})
+            logger.error(f"Unexpected error fetching price for {ticker}: {outcome}", exc_info=outcome)
+        elif outcome is None:
+            failed.append({"ticker": ticker, "reason": "Price is None"})
+            logger.warning(f"Failed to get price for {ticker}: price is None")
+        else:
+            prices[ticker] = outcome
+
+    return prices, failed
+
+
+async def store_batch(session_maker: async_sessionmaker, rows: List[dict]) -> None:
+    """
+    Записать пачку цен в БД и опубликовать новые цены.
+
+    Приемник сборщика журнала: buffer.run_drainer(partial(store_batch, session_maker)).
+    """
+    async with session_maker() as async_session:
+        created = await PriceRepository(async_session).bulk_create(rows)
+    await publish_prices(created)
+
+
+async def poll_and_store(
+    client: DeribitClient,
+    session_maker: async_sessionmaker,
+    tickers: Optional[Iterable[str]] = None,
+    buffer: Optional[SegmentBuffer] = None,
+) -> dict:
+    """
+    Один тик опроса: получить цены тикеров и сохранить их в БД.
+
+    С журналом упреждающей записи цены только дописываются в журнал, в БД их
+    переносит фоновый сборщик (buffer.run_drainer со store_batch): опрос не
+    ждет БД, при ее недоступности цены остаются в журнале.
+
+    Args:
+        client: Клиент Deribit
+        session_maker: Фабрика сессий БД
+        tickers: Тикеры для опроса (по умолчанию - тикеры реестра процесса)
+        buffer: Журнал упреждающей записи или None
+
+    Returns:
+        Словарь с результатами: success (ticker, price) и failed (ticker, reason)
+    """
+    if tickers is None:
+        # Копия реестра в памяти: недоступная БД не мешает опросу и записи в журнал
+        tickers = await instrument_registry.refresh(session_maker)
+
+    # Все тикеры опрашиваются параллельно, ошибки собираются по каждому
+    prices, failed = await fetch_prices(client, tickers)
+    results = {"success": [], "failed": failed}
+
+    if not prices:
+        return results
+
+    # Момент каждой цены - время ответа биржи с точностью до миллисекунды
+    rows = [price_row(ticker, tick.price, tick.timestamp_ms) for ticker, tick in prices.items()]
+
+    if buffer is not None:
+        try:
+            # Только журнал на диске: в БД цены переносит фоновый сборщик
+            await buffer.put(rows)
+        except BufferFullError as e:
+            logger.error(f"{e}, writing directly to the database")
+        else:
+            results["success"] = [{"ticker": row["ticker"], "price": row["price"]} for row in rows]
+            return results
+
+    async with session_maker() as async_session:
+        repository = PriceRepository(async_session)
+        try:
+            # Весь тик сохраняется одним INSERT ... ON CONFLICT DO NOTHING
+            created = await repository.bulk_create(rows)
+        except Exception as e:
+            await async_session.rollback()
+            logger.error(f"Database error: {e}")
+            raise
+
+    # Кэши последних цен в процессах API обновляются через Redis
+    await publish_prices(created)
+
+    saved_tickers = {price_obj.ticker for price_obj in created}
+    for row in rows:
+        if row["ticker"] in saved_tickers:
+            results["success"].append({"ticker": row["ticker"], "price": row["price"]})
+            logger.info(f"Successfully saved price for {row['ticker']}: {row['price']}")
+        else:
+            results["failed"].append({"ticker": row["ticker"], "reason": "Already stored for this timestamp"})
+            logger.warning(f"Price for {row['ticker']} at {row['timestamp']}.{row['timestamp_ms']:03d} already stored")
+
+    return results
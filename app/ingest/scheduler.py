@@ -0,0 +1,106 @@
+"""
+Опрос по границам интервала.
+
+Обычное расписание "раз в N секунд" отсчитывается от предыдущего запуска
+и постепенно уплывает относительно часов: опрос раз в минуту начинается
+то в :00, то в :03. Здесь запуски выровнены по границам, кратным
+интервалу от начала эпохи Unix: при POLL_INTERVAL=60 - ровно в начале
+каждой минуты, при 0.25 - в .000, .250, .500 и .750 каждой секунды.
+
+- run_aligned - цикл в asyncio, подходит и для интервалов меньше секунды;
+- aligned - расписание Celery beat с тем же выравниванием.
+
+Если запуск не уложился в интервал, пропущенные границы не догоняются:
+следующий запуск будет на ближайшей будущей границе.
+"""
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional
+from celery.schedules import schedstate, schedule
+
+logger = logging.getLogger(__name__)
+
+
+def next_boundary(interval: float, now: Optional[float] = None) -> float:
+    """
+    Ближайшая граница интервала строго после момента now.
+
+    Args:
+        interval: Интервал в секундах
+        now: Момент (секунды Unix), по умолчанию текущее время
+
+    Returns:
+        Момент границы в секундах Unix
+    """
+    now = time.time() if now is None else now
+    return (math.floor(now / interval) + 1) * interval
+
+
+async def run_aligned(
+    job: Callable[[float], Awaitable[Any]],
+    interval: float,
+    stop: Optional[asyncio.Event] = None,
+) -> None:
+    """
+    Запускать job на каждой границе интервала до stop или отмены задачи.
+
+    Запуски идут последовательно и не перекрываются. Ошибка запуска
+    записывается в лог и не останавливает цикл. Установка stop не прерывает
+    текущий запуск: цикл завершается после него.
+
+    Args:
+        job: Корутина-функция, получает момент границы (секунды Unix)
+        interval: Интервал в секундах (может быть меньше секунды)
+        stop: Событие остановки
+    """
+    stop = stop or asyncio.Event()
+    # Номер границы, а не момент: накопление ошибок float не сдвигает расписание
+    index = math.floor(time.time() / interval) + 1
+    while True:
+        boundary = index * interval
+        if stop.is_set():
+            return
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=max(boundary - time.time(), 0))
+            return
+        except asyncio.TimeoutError:
+            pass
+        try:
+            await job(boundary)
+        except Exception as e:
+            logger.error(f"Scheduled run at {boundary:.3f} failed: {e}", exc_info=True)
+
+        following = max(index + 1, math.floor(time.time() / interval) + 1)
+        if following > index + 1:
+            logger.warning(
+                f"Run at {boundary:.3f} overran the {interval}s interval, skipped {following - index - 1} runs"
+            )
+        index = following
+
+
+class aligned(schedule):
+    """
+    Расписание Celery beat по границам интервала.
+
+    Задача становится due на первой границе после предыдущего запуска,
+    beat просыпается к следующей границе, а не через interval секунд
+    после запуска.
+    """
+
+    def remaining_estimate(self, last_run_at: datetime) -> timedelta:
+        last_run = self.maybe_make_aware(last_run_at).timestamp()
+        now = self.maybe_make_aware(self.now()).timestamp()
+        return timedelta(seconds=next_boundary(self.seconds, last_run) - now)
+
+    def is_due(self, last_run_at: datetime) -> schedstate:
+        remaining = self.remaining_estimate(last_run_at).total_seconds()
+        if remaining > 0:
+            return schedstate(is_due=False, next=remaining)
+        now = self.maybe_make_aware(self.now()).timestamp()
+        return schedstate(is_due=True, next=next_boundary(self.seconds, now) - now)
+
+    def __repr__(self) -> str:
+        return f"<aligned freq: {self.human_seconds}>"
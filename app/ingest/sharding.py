@@ -0,0 +1,198 @@
+"""
+Шардирование опроса цен между несколькими процессами ingestion.
+
+Когда тикеров сотни, один процесс не успевает опросить их за интервал.
+Тикеры делятся между участниками без лидера:
+
+- каждый участник (демон ingestion) раз в треть INGEST_SHARD_TTL секунд
+  продлевает запись о себе в sorted set Redis и получает список живых
+  участников; участник, не продливший запись за INGEST_SHARD_TTL секунд,
+  считается выбывшим;
+- владелец тикера - участник с наибольшим весом hash(участник, тикер)
+  (rendezvous hashing): при появлении или выбывании участника переходят
+  только тикеры этого участника, остальные остаются на месте;
+- перед опросом участник занимает свои тикеры на тик ключом
+  SET NX claim:<тик>:<тикер>. Пока участники по-разному видят состав
+  (сразу после входа или выхода), тикер может достаться двоим, но
+  опросит его только занявший первым, поэтому в пределах тика тикер не
+  опрашивается дважды. В эти же несколько секунд тикер может не достаться
+  никому - такие тики пропускаются до следующего heartbeat.
+
+Задачи Celery шардируются так же по номерам шардов
+(см. app.tasks.price_fetcher): worker, взявший задачу шарда, занимает
+его тикеры теми же ключами.
+
+Моменты жизни участников считаются по часам процессов, поэтому
+расхождение часов между хостами должно быть много меньше INGEST_SHARD_TTL.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Sequence
+import redis.asyncio as redis
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+MEMBERS_KEY = "deribit:ingest:members"
+CLAIM_KEY = "deribit:ingest:claim:{tick}:{ticker}"
+
+
+def shard_weight(member: str, ticker: str) -> int:
+    """Вес пары (участник, тикер) для rendezvous hashing."""
+    digest = hashlib.blake2b(f"{member}\0{ticker}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def shard_owner(ticker: str, members: Sequence[str]) -> Optional[str]:
+    """Участник-владелец тикера или None, если участников нет."""
+    return max(members, key=lambda member: shard_weight(member, ticker), default=None)
+
+
+def assign_tickers(tickers: Iterable[str], members: Sequence[str]) -> Dict[str, List[str]]:
+    """
+    Распределить тикеры между участниками.
+
+    Args:
+        tickers: Тикеры
+        members: Участники
+
+    Returns:
+        Тикеры каждого участника (участники без тикеров тоже в словаре)
+    """
+    assignment: Dict[str, List[str]] = {member: [] for member in members}
+    for ticker in tickers:
+        owner = shard_owner(ticker, members)
+        if owner is not None:
+            assignment[owner].append(ticker)
+    return assignment
+
+
+def tick_number(moment: float, interval: float) -> int:
+    """Номер тика - ближайшей к моменту границы интервала (опрос начинается сразу после нее)."""
+    return round(moment / interval)
+
+
+async def claim_tickers(
+    client: redis.Redis,
+    tickers: Sequence[str],
+    tick: int,
+    owner: str,
+    ttl: float,
+) -> List[str]:
+    """
+    Занять тикеры на тик.
+
+    Тикер занят, если ключ создан этим вызовом или уже принадлежит owner
+    (повтор опроса тем же участником или повторная доставка задачи).
+
+    Args:
+        client: Клиент Redis
+        tickers: Тикеры
+        tick: Номер тика
+        owner: Идентификатор участника или задачи
+        ttl: Время жизни ключей в секундах
+
+    Returns:
+        Занятые тикеры
+    """
+    if not tickers:
+        return []
+    keys = [CLAIM_KEY.format(tick=tick, ticker=ticker) for ticker in tickers]
+    async with client.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.set(key, owner, nx=True, px=max(int(ttl * 1000), 1))
+        created = await pipe.execute()
+    taken = [index for index, ok in enumerate(created) if not ok]
+    holders = await client.mget([keys[index] for index in taken]) if taken else []
+    taken_by_owner = {index for index, holder in zip(taken, holders) if _decode(holder) == owner}
+    return [ticker for index, ticker in enumerate(tickers) if created[index] or index in taken_by_owner]
+
+
+def _decode(value) -> Optional[str]:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def default_member_id() -> str:
+    """Идентификатор участника: хост, pid и случайный суффикс."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class ShardMember:
+    """Участник шардирования тикеров с heartbeat в Redis."""
+
+    def __init__(
+        self,
+        client: Optional[redis.Redis] = None,
+        member_id: Optional[str] = None,
+        ttl: Optional[float] = None,
+    ):
+        """Инициализация участника (в состав он входит первым heartbeat)."""
+        self.client = client or redis.from_url(settings.redis_url)
+        self.member_id = member_id or default_member_id()
+        self.ttl = ttl or settings.ingest_shard_ttl
+        self.members: List[str] = [self.member_id]
+
+    async def heartbeat(self) -> List[str]:
+        """
+        Продлить участие и обновить состав живых участников.
+
+        Returns:
+            Живые участники по алфавиту
+        """
+        now = time.time()
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.zadd(MEMBERS_KEY, {self.member_id: now + self.ttl})
+            pipe.zremrangebyscore(MEMBERS_KEY, "-inf", now)
+            pipe.zrangebyscore(MEMBERS_KEY, now, "+inf")
+            _, _, members = await pipe.execute()
+        members = sorted(_decode(member) for member in members)
+        if members != self.members:
+            logger.info(f"Ingestion shard members changed: {len(self.members)} -> {len(members)}")
+        self.members = members
+        return members
+
+    async def run_heartbeat(self) -> None:
+        """Продлевать участие до отмены задачи."""
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                logger.warning(f"Ingestion shard heartbeat failed: {e}")
+
+    async def leave(self) -> None:
+        """Выйти из состава: тикеры сразу переходят к остальным участникам."""
+        try:
+            await self.client.zrem(MEMBERS_KEY, self.member_id)
+        except Exception as e:
+            logger.warning(f"Failed to leave ingestion shard members: {e}")
+
+    def owned(self, tickers: Iterable[str]) -> List[str]:
+        """Тикеры этого участника по текущему составу."""
+        members = self.members if self.member_id in self.members else self.members + [self.member_id]
+        return [ticker for ticker in tickers if shard_owner(ticker, members) == self.member_id]
+
+    async def claim(self, tickers: Iterable[str], tick: int, interval: float) -> List[str]:
+        """
+        Занять свои тикеры на тик.
+
+        Args:
+            tickers: Все тикеры реестра
+            tick: Номер тика
+            interval: Интервал опроса в секундах (ключи живут два интервала)
+
+        Returns:
+            Тикеры, которые этот участник опрашивает в тике
+        """
+        return await claim_tickers(self.client, self.owned(tickers), tick, self.member_id, max(2 * interval, 1.0))
+
+    async def close(self) -> None:
+        """Выйти из состава и закрыть соединение с Redis."""
+        await self.leave()
+        await self.client.aclose()
@@ -0,0 +1,202 @@
+"""
+Потоковый сбор индексных цен через WebSocket Deribit.
+
+Долгоживущий сервис подписывается на каналы `deribit_price_index.*`
+активных тикеров реестра инструментов и складывает тики в таблицу prices
+микро-пачками: пачка сбрасывается при достижении stream_batch_size записей
+или раз в stream_flush_interval секунд. При изменении реестра сервис
+переподписывается без перезапуска.
+
+Запуск:
+    python -m app.ingest.stream
+"""
+import asyncio
+import logging
+import signal
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.cache.events import close_redis, publish_prices
+from app.cache.instruments import load_active_tickers
+from app.client.deribit_ws import (
+    PRICE_INDEX_CHANNEL_PREFIX,
+    DeribitWebSocketClient,
+    price_index_channel,
+    ticker_from_channel,
+)
+from app.config import settings
+from app.db.crud import PriceRepository
+from app.db.database import AsyncSessionLocal
+from app.ingest.buffer import get_ingest_buffer
+from app.ingest.polling import price_row
+from app.metrics import start_metrics_server
+
+logger = logging.getLogger(__name__)
+
+BatchSink = Callable[[List[dict]], Awaitable[None]]
+
+
+async def save_batch(rows: List[dict]) -> None:
+    """Сохранить пачку тиков в БД одним INSERT."""
+    async with AsyncSessionLocal() as session:
+        created = await PriceRepository(session).bulk_create(rows)
+    await publish_prices(created)
+
+
+def is_number(value: Any) -> bool:
+    """Число JSON (bool в Python - тоже int, но ценой не является)."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class PriceStreamIngestor:
+    """Сервис потокового сбора цен с микро-пачечной записью в БД."""
+
+    def __init__(
+        self,
+        tickers: Iterable[str],
+        ws_client: Optional[DeribitWebSocketClient] = None,
+        sink: Optional[BatchSink] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_pending: Optional[int] = None,
+    ):
+        """Инициализация сервиса."""
+        self.tickers = [ticker.upper() for ticker in tickers]
+        self.ws_client = ws_client or DeribitWebSocketClient()
+        self.sink = sink or save_batch
+        self.batch_size = batch_size or settings.stream_batch_size
+        self.flush_interval = flush_interval or settings.stream_flush_interval
+        self.max_pending = max_pending or settings.stream_max_pending
+        # Ключ (ticker, момент в мс): повтор одного и того же тика не дублируется
+        self._pending: Dict[Tuple[str, int], dict] = {}
+        self._flush_lock = asyncio.Lock()
+
+    def add_tick(self, params: Any) -> None:
+        """
+        Добавить уведомление подписки в текущую пачку.
+
+        Уведомления другого формата (чужой канал, нет цены или времени)
+        пропускаются с предупреждением, чтобы не остановить сбор.
+        """
+        channel = params.get("channel") if isinstance(params, dict) else None
+        data = params.get("data") if isinstance(params, dict) else None
+        is_price_index = isinstance(channel, str) and channel.startswith(PRICE_INDEX_CHANNEL_PREFIX)
+        if not is_price_index or not isinstance(data, dict):
+            logger.warning(f"Skipping unexpected subscription notification: {params!r}")
+            return
+        price = data.get("price")
+        timestamp = data.get("timestamp")
+        if not is_number(price) or not is_number(timestamp):
+            logger.warning(f"Skipping malformed tick on {channel}: {data!r}")
+            return
+        ticker = ticker_from_channel(channel)
+        timestamp_ms = int(timestamp)
+        key = (ticker, timestamp_ms)
+        if key in self._pending:
+            return
+        if len(self._pending) >= self.max_pending:
+            # БД не успевает: отбрасываем самые старые тики
+            oldest = next(iter(self._pending))
+            del self._pending[oldest]
+            logger.warning(f"Pending buffer full ({self.max_pending}), dropping tick {oldest}")
+        self._pending[key] = price_row(ticker, price, timestamp_ms)
+
+    async def flush(self) -> None:
+        """Записать накопленную пачку; при ошибке тики остаются в буфере."""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch = self._pending
+            self._pending = {}
+            try:
+                await self.sink(list(batch.values()))
+                logger.debug(f"Flushed {len(batch)} ticks")
+            except Exception as e:
+                logger.error(f"Failed to flush {len(batch)} ticks: {e}", exc_info=True)
+                batch.update(self._pending)
+                self._pending = batch
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def run(self) -> None:
+        """Подписаться на индексы и писать тики до отмены задачи."""
+        channels = [price_index_channel(ticker) for ticker in self.tickers]
+        flusher = asyncio.create_task(self._flush_periodically())
+        try:
+            async for params in self.ws_client.subscribe(channels):
+                self.add_tick(params)
+                if len(self._pending) >= self.batch_size:
+                    await self.flush()
+        finally:
+            flusher.cancel()
+            await self.flush()
+
+
+async def _load_tickers() -> List[str]:
+    async with AsyncSessionLocal() as session:
+        return await load_active_tickers(session)
+
+
+async def _wait_registry_change(tickers: List[str]) -> List[str]:
+    """Дождаться изменения реестра инструментов и вернуть новые тикеры."""
+    while True:
+        await asyncio.sleep(settings.instruments_reload_interval)
+        try:
+            new_tickers = await _load_tickers()
+        except Exception as e:
+            logger.warning(f"Failed to reload instrument registry: {e}")
+            continue
+        if set(new_tickers) != set(tickers):
+            return new_tickers
+
+
+async def _run_service() -> None:
+    start_metrics_server()
+    loop = asyncio.get_running_loop()
+    service_task = asyncio.current_task()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, service_task.cancel)
+    # С журналом тики пишутся на диск, в БД их переносит отдельная задача
+    buffer = get_ingest_buffer()
+    sink = buffer.put if buffer is not None else save_batch
+    drainer = asyncio.create_task(buffer.run_drainer(save_batch)) if buffer is not None else None
+    try:
+        tickers = await _load_tickers()
+        while True:
+            # При изменении реестра сервис переподписывается на новый набор тикеров
+            ingest_task = asyncio.create_task(PriceStreamIngestor(tickers, sink=sink).run())
+            watch_task = asyncio.create_task(_wait_registry_change(tickers))
+            try:
+                await asyncio.wait({ingest_task, watch_task}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                ingest_task.cancel()
+                watch_task.cancel()
+                await asyncio.gather(ingest_task, watch_task, return_exceptions=True)
+            if watch_task.cancelled():
+                # Подписка завершилась раньше изменения реестра: пробрасываем ее ошибку
+                ingest_task.result()
+                return
+            tickers = watch_task.result()
+            logger.info(f"Instrument registry changed, resubscribing to {len(tickers)} tickers")
+    except asyncio.CancelledError:
+        logger.info("Stream ingestion stopped")
+    finally:
+        if drainer is not None:
+            drainer.cancel()
+            await asyncio.gather(drainer, return_exceptions=True)
+        await close_redis()
+
+
+def main() -> None:
+    """Точка входа сервиса."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    asyncio.run(_run_service())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,19 @@
+import asyncio
 import logging
+import time
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.api.broadcast import price_broadcaster
 from app.api.routes import router
+from app.cache.events import PriceEventListener
+from app.cache.instruments import instrument_registry
+from app.cache.latest_price import latest_price_cache
+from app.client.deribit_client import close_deribit_client
 from app.config import settings
-from app.db.database import init_db
+from app.db.database import AsyncSessionLocal, init_db
+from app.metrics import HTTP_REQUEST_DURATION, ingestion_lag, render_metrics
 
 logging.basicConfig(
     level=logging.INFO,
@@ -21,9 +29,24 @@ async def lifespan(app: FastAPI):
     logger.info("Initializing database...")
     await init_db()
     logger.info("Database initialized")
+    async with AsyncSessionLocal() as session:
+        tickers = await instrument_registry.load(session)
+    logger.info(f"Instrument registry loaded: {len(tickers)} tickers")
+    background_tasks = [asyncio.create_task(instrument_registry.run(AsyncSessionLocal))]
+    price_events = PriceEventListener(
+        handlers=[latest_price_cache.update_many, price_broadcaster.publish, ingestion_lag.record],
+        on_connect=latest_price_cache.clear,
+    )
+    app.state.price_events = price_events
+    if settings.price_events_enabled:
+        background_tasks.append(asyncio.create_task(price_events.run()))
     yield
     # Shutdown
     logger.info("Shutting down...")
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await close_deribit_client()
 
 
 app = FastAPI(
@@ -44,6 +67,20 @@ app.add_middleware(
 app.include_router(router)
 
 
+@app.middleware("http")
+async def observe_request_duration(request: Request, call_next):
+    """Учет длительности запросов в метриках (по шаблону пути маршрута)."""
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    # Запросы вне маршрутов (404) не размножают метки по произвольным путям
+    path = route.path if route is not None else "unmatched"
+    HTTP_REQUEST_DURATION.labels(path, request.method, response.status_code).observe(
+        time.perf_counter() - started
+    )
+    return response
+
+
 @app.get("/")
 async def root():
     """Корневой эндпоинт."""
@@ -58,3 +95,10 @@ async def root():
 async def health_check():
     """Проверка здоровья приложения."""
     return {"status": "healthy"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики Prometheus."""
+    content, media_type = render_metrics()
+    return Response(content=content, headers={"Content-Type": media_type})
@@ -0,0 +1,206 @@
+"""
+Метрики Prometheus.
+
+Процесс API отдает метрики на /metrics. Потоковый сервис ingestion и
+процессы Celery worker поднимают отдельный HTTP-сервер метрик на порту
+METRICS_PORT (процессы prefork - на METRICS_PORT + номер процесса), если
+порт задан.
+
+Метрики:
+
+- deribit_fetch_duration_seconds{ticker, outcome} - запрос индексной цены
+  к Deribit (вместе с повторами);
+- deribit_db_query_duration_seconds{method} и deribit_db_rows{method} -
+  время и число строк методов PriceRepository;
+- deribit_http_request_duration_seconds{route, method, status} - запросы
+  к API;
+- deribit_ingestion_lag_seconds{ticker} - текущее время минус timestamp
+  последней сохраненной цены тикера (процесс API узнает о ценах из событий
+  ingestion);
+- deribit_db_pool_* и deribit_http_pool_* - заполненность пулов соединений
+  SQLAlchemy и aiohttp.
+
+Отставание ingestion и заполненность пулов вычисляются в момент сбора,
+поэтому на горячем пути остается только запись в гистограммы.
+"""
+import functools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple, TypeVar
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Histogram, generate_latest, start_http_server
+from prometheus_client.core import GaugeMetricFamily
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+FETCH_DURATION = Histogram(
+    "deribit_fetch_duration_seconds",
+    "Длительность запроса индексной цены к Deribit",
+    ["ticker", "outcome"],
+)
+DB_QUERY_DURATION = Histogram(
+    "deribit_db_query_duration_seconds",
+    "Длительность методов PriceRepository",
+    ["method"],
+)
+DB_ROWS = Histogram(
+    "deribit_db_rows",
+    "Число строк, возвращенных или записанных методом PriceRepository",
+    ["method"],
+    buckets=(0, 1, 10, 100, 1000, 10_000, 100_000, 1_000_000),
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "deribit_http_request_duration_seconds",
+    "Длительность обработки запросов к API",
+    ["route", "method", "status"],
+)
+
+
+def count_rows(result: Any) -> int:
+    """Число строк результата: длина списка, для одиночного результата - 0 или 1."""
+    return len(result) if isinstance(result, list) else int(result is not None)
+
+
+def count_page_rows(result: Tuple[list, Any]) -> int:
+    """Число строк результата-страницы (строки, позиция следующей страницы)."""
+    return len(result[0])
+
+
+def observe_query(
+    method: str,
+    count: Callable[[Any], int] = count_rows,
+) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    """
+    Декоратор async-метода репозитория: время выполнения и число строк.
+
+    Args:
+        method: Имя метода в метках
+        count: Функция подсчета строк результата
+    """
+    def decorator(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        duration = DB_QUERY_DURATION.labels(method)
+        rows = DB_ROWS.labels(method)
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            started = time.perf_counter()
+            result = await func(*args, **kwargs)
+            duration.observe(time.perf_counter() - started)
+            rows.observe(count(result))
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+class IngestionLagCollector:
+    """Отставание ingestion по тикерам, вычисляемое в момент сбора метрик."""
+
+    def __init__(self):
+        """Инициализация коллектора."""
+        self._last_timestamps: Dict[str, int] = {}
+
+    def record(self, prices: Iterable[Any]) -> None:
+        """Учесть сохраненные цены (объекты с полями ticker и timestamp)."""
+        for price in prices:
+            if price.timestamp > self._last_timestamps.get(price.ticker, 0):
+                self._last_timestamps[price.ticker] = price.timestamp
+
+    def collect(self):
+        lag = GaugeMetricFamily(
+            "deribit_ingestion_lag_seconds",
+            "Текущее время минус timestamp последней сохраненной цены",
+            labels=["ticker"],
+        )
+        now = time.time()
+        for ticker, timestamp in sorted(self._last_timestamps.items()):
+            lag.add_metric([ticker], now - timestamp)
+        yield lag
+
+
+def engine_pool_stats(engine: Any) -> Optional[Dict[str, int]]:
+    """Состояние пула SQLAlchemy engine или None для пулов без учета соединений."""
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return None
+    return {
+        "limit": pool.size() + max(pool._max_overflow, 0),
+        "in_use": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+    }
+
+
+class PoolCollector:
+    """Заполненность зарегистрированных пулов соединений БД и HTTP."""
+
+    def __init__(self):
+        """Инициализация коллектора."""
+        self._db_pools: Dict[str, Callable[[], Optional[Dict[str, int]]]] = {}
+        self._http_pools: Dict[str, Callable[[], Optional[Dict[str, int]]]] = {}
+
+    def register_engine(self, name: str, engine: Any) -> None:
+        """Зарегистрировать engine SQLAlchemy (AsyncEngine или Engine)."""
+        self._db_pools[name] = functools.partial(engine_pool_stats, engine)
+
+    def register_http_pool(self, name: str, stats: Callable[[], Optional[Dict[str, int]]]) -> None:
+        """Зарегистрировать пул HTTP: функция возвращает limit, in_use и idle или None."""
+        self._http_pools[name] = stats
+
+    @staticmethod
+    def _families(prefix: str, description: str, pools: Dict[str, Callable[[], Optional[Dict[str, int]]]]):
+        limit = GaugeMetricFamily(f"{prefix}_limit", f"Максимум соединений пула {description}", labels=["pool"])
+        connections = GaugeMetricFamily(
+            f"{prefix}_connections",
+            f"Соединения пула {description} по состоянию",
+            labels=["pool", "state"],
+        )
+        for name, stats_func in sorted(pools.items()):
+            stats = stats_func()
+            if stats is None:
+                continue
+            limit.add_metric([name], stats.pop("limit"))
+            for state, value in stats.items():
+                connections.add_metric([name, state], value)
+        return limit, connections
+
+    def collect(self):
+        yield from self._families("deribit_db_pool", "SQLAlchemy", self._db_pools)
+        yield from self._families("deribit_http_pool", "aiohttp", self._http_pools)
+
+
+ingestion_lag = IngestionLagCollector()
+pools = PoolCollector()
+REGISTRY.register(ingestion_lag)
+REGISTRY.register(pools)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Текущие метрики в текстовом формате Prometheus и их MIME-тип."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port_offset: int = 0) -> bool:
+    """
+    Поднять HTTP-сервер метрик для процессов без API.
+
+    Args:
+        port_offset: Смещение порта (номер процесса worker)
+
+    Returns:
+        Запущен ли сервер (METRICS_PORT задан и порт свободен)
+    """
+    if not settings.metrics_port:
+        return False
+    port = settings.metrics_port + port_offset
+    try:
+        start_http_server(port)
+    except OSError as e:
+        logger.warning(f"Failed to start metrics server on port {port}: {e}")
+        return False
+    logger.info(f"Metrics server listening on port {port}")
+    return True
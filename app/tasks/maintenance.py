@@ -0,0 +1,63 @@
+import logging
+
+from app.cache.instruments import refresh_instruments as refresh_instrument_registry
+from app.client.deribit_client import get_deribit_client
+from app.db.archive import archive_closed_months, get_archive
+from app.db.partitions import maintain_partitions as maintain_price_partitions
+from app.tasks.runtime import get_engine, get_session_maker, run_async
+from celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(name="app.tasks.maintenance.maintain_partitions")
+def maintain_partitions() -> dict:
+    """
+    Создать будущие партиции prices и применить политику хранения.
+
+    Returns:
+        Словарь с созданными и отсоединенными/удаленными партициями
+    """
+    async def _maintain():
+        async with get_engine().begin() as conn:
+            return await maintain_price_partitions(conn)
+
+    result = run_async(_maintain())
+    logger.info(f"Partition maintenance: {result}")
+    return result
+
+
+@celery_app.task(name="app.tasks.maintenance.archive_prices")
+def archive_prices() -> dict:
+    """
+    Перенести закрытые месяцы из prices в Parquet архив.
+
+    Returns:
+        Словарь с путями записанных файлов
+    """
+    archive = get_archive()
+    if archive is None:
+        return {"archived": []}
+
+    async def _archive():
+        async with get_session_maker()() as session:
+            return await archive_closed_months(session, archive)
+
+    written = run_async(_archive())
+    logger.info(f"Archived {len(written)} ticker-months")
+    return {"archived": written}
+
+
+@celery_app.task(name="app.tasks.maintenance.refresh_instruments")
+def refresh_instruments() -> dict:
+    """
+    Синхронизировать реестр инструментов с индексами Deribit.
+
+    Returns:
+        Словарь с добавленными и деактивированными тикерами
+    """
+    async def _refresh():
+        async with get_session_maker()() as session:
+            return await refresh_instrument_registry(session, get_deribit_client())
+
+    return run_async(_refresh())
@@ -1,75 +1,72 @@
 import logging
 import time
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from typing import List
 
-from app.client.deribit_client import DeribitClient
+from app.cache.events import get_redis
+from app.cache.instruments import instrument_registry
+from app.client.deribit_client import get_deribit_client
 from app.config import settings
-from app.db.crud import PriceRepository
+from app.ingest.buffer import get_ingest_buffer
+from app.ingest.polling import poll_and_store
+from app.ingest.sharding import assign_tickers, claim_tickers, tick_number
+from app.tasks.runtime import get_session_maker, run_async
 from celery_app import celery_app
 
 logger = logging.getLogger(__name__)
 
 
-def create_session_maker():
-    """Создать async sessionmaker для использования в Celery задаче."""
-    engine = create_async_engine(settings.database_url, echo=False)
-    return async_sessionmaker(
-        engine,
-        class_=AsyncSession,
-        expire_on_commit=False,
-    )
-
-
 @celery_app.task(name="app.tasks.price_fetcher.fetch_and_save_prices")
 def fetch_and_save_prices() -> dict:
     """
-    Получить цены BTC_USD и ETH_USD и сохранить в БД.
+    Параллельно получить цены активных тикеров реестра и сохранить в БД.
+
+    При CELERY_PRICE_SHARDS > 1 задача только делит тикеры на шарды и ставит
+    по задаче fetch_price_shard на шард: их выполняют свободные worker.
 
     Returns:
-        Словарь с результатами выполнения
+        Словарь с результатами выполнения (или с тикерами шардов)
     """
-    import asyncio
+    if settings.celery_price_shards > 1:
+        return dispatch_price_shards()
+    # Запуск в event loop процесса worker (см. app.tasks.runtime)
+    return run_async(poll_and_store(get_deribit_client(), get_session_maker(), buffer=get_ingest_buffer()))
 
-    async def _fetch_and_save():
-        """Внутренняя async функция для выполнения задачи."""
-        client = DeribitClient()
-        tickers = ["BTC_USD", "ETH_USD"]
-        results = {"success": [], "failed": []}
-        current_timestamp = int(time.time())
 
-        session_maker = create_session_maker()
-        async with session_maker() as async_session:
-            repository = PriceRepository(async_session)
+def dispatch_price_shards() -> dict:
+    """Поставить задачи шардов текущего тика."""
+    tick = tick_number(time.time(), settings.poll_interval)
+    shards = [f"shard-{index}" for index in range(settings.celery_price_shards)]
+    assignment = assign_tickers(run_async(instrument_registry.refresh(get_session_maker())), shards)
+    for shard, tickers in assignment.items():
+        if tickers:
+            # Задача, не взятая до следующего тика, уже не нужна
+            fetch_price_shard.apply_async((tickers, tick), expires=settings.poll_interval)
+    logger.info(f"Dispatched tick {tick} to {sum(1 for tickers in assignment.values() if tickers)} shards")
+    return {"tick": tick, "shards": assignment}
 
-            for ticker in tickers:
-                try:
-                    price = await client.get_index_price(ticker)
-                    if price is not None:
-                        await repository.create(ticker, price, current_timestamp)
-                        results["success"].append({"ticker": ticker, "price": price})
-                        logger.info(f"Successfully saved price for {ticker}: {price}")
-                    else:
-                        results["failed"].append({"ticker": ticker, "reason": "Price is None"})
-                        logger.warning(f"Failed to get price for {ticker}: price is None")
-                except Exception as e:
-                    error_msg = str(e)
-                    results["failed"].append({"ticker": ticker, "reason": error_msg})
-                    logger.error(f"Unexpected error fetching price for {ticker}: {e}", exc_info=True)
 
-            try:
-                await async_session.commit()
-            except Exception as e:
-                await async_session.rollback()
-                logger.error(f"Database error: {e}")
-                raise
+@celery_app.task(name="app.tasks.price_fetcher.fetch_price_shard", bind=True, acks_late=True)
+def fetch_price_shard(self, tickers: List[str], tick: int) -> dict:
+    """
+    Опросить тикеры одного шарда.
 
-        return results
+    Тикеры занимаются на тик ключами Redis (см. app.ingest.sharding):
+    повторная доставка задачи после гибели worker не опрашивает тикер,
+    если его уже опросила другая задача этого тика.
 
-    # Запуск async функции в синхронном контексте Celery
-    try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    Args:
+        tickers: Тикеры шарда
+        tick: Номер тика
+
+    Returns:
+        Словарь с результатами выполнения
+    """
+    async def _fetch_shard():
+        claimed = await claim_tickers(
+            get_redis(), tickers, tick, self.request.id, max(2 * settings.poll_interval, 1.0),
+        )
+        if not claimed:
+            return {"success": [], "failed": []}
+        return await poll_and_store(get_deribit_client(), get_session_maker(), claimed, get_ingest_buffer())
 
-    return loop.run_until_complete(_fetch_and_save())
+    return run_async(_fetch_shard())
@@ -0,0 +1,164 @@
+"""
+Окружение выполнения async-кода в процессах Celery worker.
+
+Каждый процесс worker держит один event loop и один async engine с пулом
+соединений: они создаются по сигналу worker_process_init (после fork) и
+закрываются при остановке процесса. Задачи переиспользуют прогретые
+соединения вместо создания нового engine на каждый запуск.
+
+Для пулов без дочерних процессов (например, -P solo) окружение создается
+лениво при первом обращении.
+
+С журналом упреждающей записи задачи опроса только дописывают цены в
+журнал. В БД его переносит поток BufferDrainer главного процесса worker со
+своим event loop и engine: loop процесса задач работает только во время
+задачи, а сборщик должен работать и между ними.
+"""
+import asyncio
+import logging
+import threading
+from functools import partial
+from typing import Any, Coroutine, Optional, TypeVar
+from billiard.process import current_process
+from celery.signals import worker_process_init, worker_process_shutdown, worker_ready, worker_shutdown
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+from app.cache.events import close_redis
+from app.client.deribit_client import close_deribit_client
+from app.config import settings
+from app.db.database import create_engine, create_session_maker
+from app.ingest.buffer import SegmentBuffer, get_ingest_buffer
+from app.ingest.polling import store_batch
+from app.metrics import pools, start_metrics_server
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_engine: Optional[AsyncEngine] = None
+_session_maker: Optional[async_sessionmaker] = None
+_drainer: Optional["BufferDrainer"] = None
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Получить event loop текущего процесса."""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+def get_engine() -> AsyncEngine:
+    """Получить async engine текущего процесса."""
+    global _engine
+    if _engine is None:
+        _engine = create_engine()
+        pools.register_engine("worker", _engine)
+    return _engine
+
+
+def get_session_maker() -> async_sessionmaker:
+    """Получить фабрику сессий на engine текущего процесса."""
+    global _session_maker
+    if _session_maker is None:
+        _session_maker = create_session_maker(get_engine())
+    return _session_maker
+
+
+def run_async(coro: Coroutine[Any, Any, T]) -> T:
+    """Выполнить корутину в event loop текущего процесса."""
+    return get_loop().run_until_complete(coro)
+
+
+async def _close_resources() -> None:
+    global _engine, _session_maker
+    await close_deribit_client()
+    await close_redis()
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = None
+    _session_maker = None
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs) -> None:
+    """Создать loop и engine в новом процессе worker."""
+    global _loop, _engine, _session_maker
+    # Ресурсы, унаследованные от родителя через fork, не используются
+    _loop = None
+    _engine = None
+    _session_maker = None
+    get_loop()
+    get_session_maker()
+    # Дочерние процессы prefork пронумерованы, у каждого свой порт метрик
+    start_metrics_server(getattr(current_process(), "index", 0))
+    logger.info("Worker process runtime initialized")
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def shutdown_worker_process(**kwargs) -> None:
+    """Закрыть HTTP-пул, engine и event loop процесса."""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        return
+    _loop.run_until_complete(_close_resources())
+    _loop.close()
+    _loop = None
+    logger.info("Worker process runtime shut down")
+
+
+class BufferDrainer(threading.Thread):
+    """Поток, переносящий журнал упреждающей записи в БД до stop()."""
+
+    def __init__(self, buffer: SegmentBuffer):
+        """Инициализация потока с собственными event loop и engine."""
+        super().__init__(name="ingest-buffer-drainer", daemon=True)
+        self.buffer = buffer
+        self._loop = asyncio.new_event_loop()
+        self._engine = create_engine()
+        self._task = self._loop.create_task(
+            buffer.run_drainer(partial(store_batch, create_session_maker(self._engine)))
+        )
+
+    def run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.run_until_complete(close_redis())
+            self._loop.run_until_complete(self._engine.dispose())
+            self._loop.close()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Остановить сборщик (текущая пачка дописывается не дольше timeout секунд)."""
+        if self.is_alive():
+            self._loop.call_soon_threadsafe(self._task.cancel)
+            self.join(timeout)
+
+
+@worker_ready.connect
+def start_buffer_drainer(**kwargs) -> None:
+    """Запустить сборщик журнала в главном процессе worker."""
+    global _drainer
+    buffer = get_ingest_buffer()
+    if buffer is None or _drainer is not None:
+        return
+    _drainer = BufferDrainer(buffer)
+    _drainer.start()
+    logger.info(f"Ingest buffer drainer started for {buffer.directory}")
+
+
+@worker_shutdown.connect
+def stop_buffer_drainer(**kwargs) -> None:
+    """Остановить сборщик журнала при остановке worker."""
+    global _drainer
+    if _drainer is None:
+        return
+    _drainer.stop(settings.ingest_shutdown_timeout)
+    _drainer = None
+    logger.info("Ingest buffer drainer stopped")
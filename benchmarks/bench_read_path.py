@@ -0,0 +1,145 @@
+"""
+Сравнение путей чтения больших диапазонов цен.
+
+- orm: PriceRepository.get_by_ticker_and_date_range (ORM-объекты Price),
+  валидация PriceListResponse и сериализация так, как это делает FastAPI
+  для response_model;
+- lean: PriceRepository.get_rows_by_ticker_and_date_range (кортежи
+  столбцов) и dumps_price_list (orjson).
+
+Для каждого пути измеряется время чтения из БД и время сериализации
+(медиана по повторам). Результат выводится в JSON.
+
+Запуск:
+    python -m benchmarks.bench_read_path --rows 100000
+    python -m benchmarks.bench_read_path --database-url postgresql+asyncpg://...
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from decimal import Decimal
+from typing import Awaitable, Callable, Dict, List
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.api.schemas import PriceListResponse
+from app.api.serialization import dumps_price_list
+from app.db.crud import BULK_INSERT_CHUNK_SIZE, PriceRepository
+from app.db.models import Base, Price
+
+TICKER = "BTC_USD"
+START_TIMESTAMP = 1704067200
+
+
+async def seed(session_maker: async_sessionmaker, rows: int) -> None:
+    """Заполнить таблицу prices поминутными ценами одного тикера."""
+    created_at = datetime(2024, 1, 1)
+    async with session_maker() as session:
+        await session.execute(delete(Price).where(Price.ticker == TICKER))
+        for chunk_start in range(0, rows, BULK_INSERT_CHUNK_SIZE):
+            chunk = [
+                {
+                    "ticker": TICKER,
+                    "price": Decimal("42000.12345678") + index,
+                    "timestamp": START_TIMESTAMP + index * 60,
+                    "created_at": created_at,
+                }
+                for index in range(chunk_start, min(chunk_start + BULK_INSERT_CHUNK_SIZE, rows))
+            ]
+            await session.execute(insert(Price), chunk)
+        await session.commit()
+
+
+async def read_orm(session_maker: async_sessionmaker) -> Callable[[], bytes]:
+    """Прочитать ORM-объекты; вернуть функцию сериализации ответа."""
+    async with session_maker() as session:
+        prices = await PriceRepository(session).get_by_ticker_and_date_range(TICKER)
+
+    def serialize() -> bytes:
+        # Как FastAPI для response_model: валидация, dump в JSON-режиме, json.dumps
+        response = PriceListResponse(ticker=TICKER, count=len(prices), prices=prices)
+        content = PriceListResponse.model_validate(response.model_dump()).model_dump(mode="json")
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+    return serialize
+
+
+async def read_lean(session_maker: async_sessionmaker) -> Callable[[], bytes]:
+    """Прочитать строки столбцов; вернуть функцию сериализации ответа."""
+    async with session_maker() as session:
+        rows = await PriceRepository(session).get_rows_by_ticker_and_date_range(TICKER)
+    return lambda: dumps_price_list(TICKER, rows)
+
+
+async def measure(
+    session_maker: async_sessionmaker,
+    read: Callable[[async_sessionmaker], Awaitable[Callable[[], bytes]]],
+    repeat: int,
+) -> Dict[str, float]:
+    """Медианы времени чтения и сериализации в миллисекундах."""
+    read_times: List[float] = []
+    serialize_times: List[float] = []
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        serialize = await read(session_maker)
+        read_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        size = len(serialize())
+        serialize_times.append(time.perf_counter() - started)
+
+    read_ms = statistics.median(read_times) * 1000
+    serialize_ms = statistics.median(serialize_times) * 1000
+    return {
+        "read_ms": round(read_ms, 1),
+        "serialize_ms": round(serialize_ms, 1),
+        "total_ms": round(read_ms + serialize_ms, 1),
+        "body_bytes": size,
+    }
+
+
+async def run(database_url: str, rows: int, repeat: int) -> dict:
+    """Выполнить бенчмарк и вернуть результаты."""
+    engine = create_async_engine(database_url)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+        await seed(session_maker, rows)
+
+        results = {
+            "orm": await measure(session_maker, read_orm, repeat),
+            "lean": await measure(session_maker, read_lean, repeat),
+        }
+        results["speedup"] = round(results["orm"]["total_ms"] / results["lean"]["total_ms"], 2)
+        return {"database": engine.dialect.name, "rows": rows, "repeat": repeat, "results": results}
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    """Точка входа бенчмарка."""
+    parser = argparse.ArgumentParser(description="Бенчмарк чтения больших диапазонов цен")
+    parser.add_argument("--rows", type=int, default=100_000, help="Число строк в ответе")
+    parser.add_argument("--repeat", type=int, default=5, help="Число повторов")
+    parser.add_argument(
+        "--database-url",
+        default=None,
+        help="URL БД (по умолчанию временная SQLite через aiosqlite)",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_url = args.database_url or f"sqlite+aiosqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+        report = asyncio.run(run(database_url, args.rows, args.repeat))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+"""
+Нагрузочный бенчмарк API и ingestion.
+
+Таблица prices заполняется синтетическими поминутными ценами тикеров из
+настройки TICKERS (по умолчанию 1 000 000 строк в PostgreSQL или 200 000 во
+временной SQLite в быстром режиме), после чего измеряются:
+
+- routes: для каждого маршрута /api/prices/* - задержка p50/p99 и RPS при
+  заданной конкурентности. По умолчанию запросы обрабатывает приложение в
+  этом же процессе (httpx ASGITransport, без сети); с --base-url запросы
+  отправляются в запущенный сервер, который должен смотреть в ту же БД;
+- ingestion: скорость записи строк через PriceRepository.bulk_create и
+  полный цикл «опрос фейкового сервера Deribit (app.client.fake_server) +
+  запись тика» для набора тикеров.
+
+Отчет - JSON с коммитом git, параметрами запуска и метриками; ключи
+стабильны, поэтому отчеты разных коммитов можно сравнивать (--baseline
+добавляет изменение каждой метрики в процентах).
+
+Запуск:
+    python -m benchmarks.bench_suite --output bench.json
+    python -m benchmarks.bench_suite --database-url postgresql+asyncpg://... --rows 5000000
+    python -m benchmarks.bench_suite --baseline bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.api.routes import router
+from app.cache.latest_price import latest_price_cache
+from app.client.deribit_client import DeribitClient
+from app.client.fake_server import FakeDeribitServer
+from app.client.resilience import RetryPolicy, TokenBucket
+from app.config import settings
+from app.db.crud import BULK_INSERT_CHUNK_SIZE, PriceRepository, RollupRepository
+from app.db.database import get_db, get_session_factory
+from app.db.models import ROLLUP_MODELS, Base, Price
+from app.ingest.polling import fetch_prices, price_row
+
+START_TIMESTAMP = 1704067200
+STEP_SECONDS = 60
+DAY_SECONDS = 86400
+# Тикер для замеров записи; строки удаляются после замера
+INGEST_TICKER = "BENCH_USD"
+
+
+class RouteCase(NamedTuple):
+    """Маршрут бенчмарка: имя, путь с параметрами и заголовки запроса."""
+
+    name: str
+    url: str
+    headers: Dict[str, str] = {}
+
+
+def git_commit() -> Dict[str, Optional[object]]:
+    """Текущий коммит git и признак незакоммиченных изменений."""
+    try:
+        sha = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True, check=True,
+        ).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"sha": None, "dirty": None}
+    return {"sha": sha, "dirty": dirty}
+
+
+def route_cases(tickers: List[str], last_timestamp: int) -> List[RouteCase]:
+    """Маршруты с параметрами, покрывающими типичные запросы к засеянным данным."""
+    ticker = tickers[0]
+    day_start = last_timestamp - DAY_SECONDS
+    week_start = last_timestamp - 7 * DAY_SECONDS
+    many = "&".join(f"ticker={name}" for name in tickers)
+    return [
+        RouteCase("all_first_page", f"/api/prices/all?ticker={ticker}&limit=1000"),
+        RouteCase("all_offset_page", f"/api/prices/all?ticker={ticker}&limit=1000&offset=100000"),
+        RouteCase("latest", f"/api/prices/latest?ticker={ticker}"),
+        RouteCase("latest_many", f"/api/prices/latest/many?{many}"),
+        RouteCase("filter_day", f"/api/prices/filter?ticker={ticker}&start_date={day_start}&end_date={last_timestamp}"),
+        RouteCase(
+            "filter_day_arrow",
+            f"/api/prices/filter?ticker={ticker}&start_date={day_start}&end_date={last_timestamp}",
+            {"Accept": "application/vnd.apache.arrow.stream"},
+        ),
+        RouteCase("ohlc_1h_week", f"/api/prices/ohlc?ticker={ticker}&interval=1h&start_date={week_start}&end_date={last_timestamp}"),
+        RouteCase("ohlc_1d_year", f"/api/prices/ohlc?ticker={ticker}&interval=1d&end_date={last_timestamp}"),
+        RouteCase("export_day_ndjson", f"/api/prices/export?ticker={ticker}&start_date={day_start}&end_date={last_timestamp}"),
+    ]
+
+
+async def delete_prices(session: AsyncSession, tickers: List[str]) -> None:
+    """Удалить цены тикеров вместе с их агрегатами (без коммита)."""
+    await session.execute(delete(Price).where(Price.ticker.in_(tickers)))
+    for model in ROLLUP_MODELS:
+        await session.execute(delete(model).where(model.ticker.in_(tickers)))
+
+
+async def seed(session_maker: async_sessionmaker, tickers: List[str], rows: int) -> int:
+    """
+    Заполнить таблицу prices поминутными ценами тикеров (поровну на тикер).
+
+    Строки вставляются простым INSERT, затем агрегаты пересчитываются
+    одним запросом на таблицу (RollupRepository.rebuild): свечи OHLC
+    читаются из агрегатов, как в рабочем режиме.
+
+    Returns:
+        Timestamp последней записи
+    """
+    per_ticker = max(1, rows // len(tickers))
+    created_at = datetime(2024, 1, 1)
+    async with session_maker() as session:
+        await delete_prices(session, tickers)
+        for ticker_index, ticker in enumerate(tickers):
+            base_price = Decimal(40000 // (ticker_index + 1))
+            for chunk_start in range(0, per_ticker, BULK_INSERT_CHUNK_SIZE):
+                chunk = [
+                    {
+                        "ticker": ticker,
+                        "price": base_price + Decimal(index % 1000) / 100,
+                        "timestamp": START_TIMESTAMP + index * STEP_SECONDS,
+                        "created_at": created_at,
+                    }
+                    for index in range(chunk_start, min(chunk_start + BULK_INSERT_CHUNK_SIZE, per_ticker))
+                ]
+                await session.execute(insert(Price), chunk)
+        await session.commit()
+        if settings.rollups_enabled:
+            for ticker in tickers:
+                await RollupRepository(session).rebuild(ticker)
+    return START_TIMESTAMP + (per_ticker - 1) * STEP_SECONDS
+
+
+async def seeded_state(session_maker: async_sessionmaker, tickers: List[str]) -> Tuple[int, Optional[int]]:
+    """Число строк тикеров и timestamp последней записи уже засеянной БД."""
+    async with session_maker() as session:
+        result = await session.execute(
+            select(func.count(), func.max(Price.timestamp)).where(Price.ticker.in_(tickers))
+        )
+        count, last_timestamp = result.one()
+    return count, last_timestamp
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Перцентиль отсортированной выборки (ближайший ранг)."""
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def measure_route(
+    client: httpx.AsyncClient,
+    case: RouteCase,
+    requests: int,
+    concurrency: int,
+    warmup: int,
+) -> Dict[str, float]:
+    """Задержки и пропускная способность маршрута."""
+    for _ in range(warmup):
+        await client.get(case.url, headers=case.headers)
+
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await client.get(case.url, headers=case.headers)
+            await response.aread()
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "rps": round(len(latencies) / elapsed, 1),
+    }
+
+
+def make_app(session_maker: async_sessionmaker) -> FastAPI:
+    """Приложение с маршрутами цен поверх сессий бенчмарка (без lifespan)."""
+    app = FastAPI()
+    app.include_router(router)
+
+    async def override_get_db():
+        async with session_maker() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: session_maker
+    return app
+
+
+async def bench_routes(
+    session_maker: async_sessionmaker,
+    cases: List[RouteCase],
+    args: argparse.Namespace,
+) -> Dict[str, dict]:
+    """Замеры всех маршрутов."""
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+    else:
+        transport = httpx.ASGITransport(app=make_app(session_maker))
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60)
+
+    results: Dict[str, dict] = {}
+    async with client:
+        for case in cases:
+            # Кэш последних цен прогревается первым запросом маршрута, как в работающем API
+            latest_price_cache.clear()
+            results[case.name] = await measure_route(client, case, args.requests, args.concurrency, args.warmup)
+    return results
+
+
+async def bench_bulk_create(session_maker: async_sessionmaker, rows: int, batch_size: int) -> Dict[str, float]:
+    """Скорость записи строк через PriceRepository.bulk_create пачками batch_size."""
+    elapsed = 0.0
+    async with session_maker() as session:
+        repository = PriceRepository(session)
+        for batch_start in range(0, rows, batch_size):
+            batch = [
+                {"ticker": INGEST_TICKER, "price": Decimal("100.5"), "timestamp": START_TIMESTAMP + index}
+                for index in range(batch_start, min(batch_start + batch_size, rows))
+            ]
+            started = time.perf_counter()
+            await repository.bulk_create(batch)
+            elapsed += time.perf_counter() - started
+        await delete_prices(session, [INGEST_TICKER])
+        await session.commit()
+    return {"rows": rows, "batch_size": batch_size, "rows_per_s": round(rows / elapsed, 1)}
+
+
+async def bench_fetch_and_store(session_maker: async_sessionmaker, tickers: int, ticks: int) -> Dict[str, float]:
+    """
+    Полный цикл ingestion: опрос фейкового сервера Deribit и запись тика.
+
+    Ограничитель частоты клиента отключен, чтобы измерялся сам цикл.
+    """
+    names = [f"bench{index}_usd" for index in range(tickers)]
+    server = FakeDeribitServer(prices={name: 100.0 + index for index, name in enumerate(names)})
+    await server.start()
+    client = DeribitClient(
+        base_url=server.base_url,
+        retry_policy=RetryPolicy(max_attempts=1),
+        rate_limiter=TokenBucket(rate=1e9, capacity=1e9),
+    )
+    stored = 0
+    fetch_elapsed = 0.0
+    store_elapsed = 0.0
+    try:
+        async with client, session_maker() as session:
+            repository = PriceRepository(session)
+            for _ in range(ticks):
+                started = time.perf_counter()
+                prices, _ = await fetch_prices(client, names)
+                fetched = time.perf_counter()
+                created = await repository.bulk_create(
+                    price_row(ticker, price.price, price.timestamp_ms) for ticker, price in prices.items()
+                )
+                store_elapsed += time.perf_counter() - fetched
+                fetch_elapsed += fetched - started
+                stored += len(created)
+            await delete_prices(session, [name.upper() for name in names])
+            await session.commit()
+    finally:
+        await server.stop()
+    total = fetch_elapsed + store_elapsed
+    return {
+        "tickers": tickers,
+        "ticks": ticks,
+        "rows": stored,
+        "tick_ms": round(total / ticks * 1000, 3),
+        "fetch_ms": round(fetch_elapsed / ticks * 1000, 3),
+        "store_ms": round(store_elapsed / ticks * 1000, 3),
+        "rows_per_s": round(stored / total, 1),
+    }
+
+
+async def run(database_url: str, args: argparse.Namespace) -> dict:
+    """Выполнить бенчмарк и вернуть отчет."""
+    tickers = [ticker.upper() for ticker in settings.tickers]
+    # Пул PostgreSQL не должен быть узким местом при заданной конкурентности
+    engine_options = {"pool_size": args.concurrency} if database_url.startswith("postgresql") else {}
+    engine = create_async_engine(database_url, **engine_options)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+        rows = args.rows or (1_000_000 if engine.dialect.name == "postgresql" else 200_000)
+        count, last_timestamp = await seeded_state(session_maker, tickers)
+        seed_s = None
+        if args.reuse_seed and count and last_timestamp is not None:
+            rows = count
+        else:
+            started = time.perf_counter()
+            last_timestamp = await seed(session_maker, tickers, rows)
+            seed_s = round(time.perf_counter() - started, 1)
+
+        routes = await bench_routes(session_maker, route_cases(tickers, last_timestamp), args)
+        ingestion = {
+            "bulk_create": await bench_bulk_create(session_maker, args.ingest_rows, args.ingest_batch),
+            "fetch_and_store": await bench_fetch_and_store(session_maker, args.ingest_tickers, args.ingest_ticks),
+        }
+        return {
+            "commit": git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "database": engine.dialect.name,
+            "target": args.base_url or "in-process",
+            "params": {
+                "rows": rows,
+                "tickers": tickers,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "seed_s": seed_s,
+            },
+            "routes": routes,
+            "ingestion": ingestion,
+        }
+    finally:
+        await engine.dispose()
+
+
+def compare(baseline: dict, report: dict) -> Dict[str, Dict[str, float]]:
+    """
+    Изменение метрик относительно отчета baseline в процентах.
+
+    Для задержек рост - ухудшение, для RPS и rows_per_s - улучшение.
+    """
+    changes: Dict[str, Dict[str, float]] = {}
+    sections = [("routes", ("p50_ms", "p99_ms", "rps")), ("ingestion", ("rows_per_s", "tick_ms"))]
+    for section, metrics in sections:
+        for name, current in report.get(section, {}).items():
+            previous = baseline.get(section, {}).get(name, {})
+            for metric in metrics:
+                if metric in current and previous.get(metric):
+                    delta = (current[metric] - previous[metric]) / previous[metric] * 100
+                    changes.setdefault(f"{section}.{name}", {})[metric] = round(delta, 1)
+    return changes
+
+
+def main() -> None:
+    """Точка входа бенчмарка."""
+    parser = argparse.ArgumentParser(description="Нагрузочный бенчмарк API и ingestion")
+    parser.add_argument(
+        "--database-url",
+        default=None,
+        help="URL БД (по умолчанию временная SQLite через aiosqlite - быстрый режим)",
+    )
+    parser.add_argument("--rows", type=int, default=None, help="Число синтетических строк (все тикеры)")
+    parser.add_argument("--reuse-seed", action="store_true", help="Не пересеивать БД, если данные уже есть")
+    parser.add_argument("--base-url", default=None, help="URL запущенного API вместо приложения в процессе")
+    parser.add_argument("--requests", type=int, default=500, help="Число запросов на маршрут")
+    parser.add_argument("--concurrency", type=int, default=10, help="Число одновременных запросов")
+    parser.add_argument("--warmup", type=int, default=5, help="Число прогревочных запросов на маршрут")
+    parser.add_argument("--ingest-rows", type=int, default=100_000, help="Строк для замера bulk_create")
+    parser.add_argument("--ingest-batch", type=int, default=1000, help="Размер пачки bulk_create")
+    parser.add_argument("--ingest-tickers", type=int, default=50, help="Тикеров в цикле опроса")
+    parser.add_argument("--ingest-ticks", type=int, default=50, help="Тиков в цикле опроса")
+    parser.add_argument("--output", default=None, help="Файл для отчета (по умолчанию stdout)")
+    parser.add_argument("--baseline", default=None, help="Отчет предыдущего запуска для сравнения")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_url = args.database_url or f"sqlite+aiosqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+        report = asyncio.run(run(database_url, args))
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        report["baseline"] = {"commit": baseline.get("commit"), "change_pct": compare(baseline, report)}
+
+    content = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(content + "\n")
+    else:
+        print(content)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,13 @@
 from celery import Celery
+from celery.schedules import crontab
 from app.config import settings
+from app.ingest.scheduler import aligned
 
 celery_app = Celery(
     "deribit_client",
     broker=settings.celery_broker_url,
     backend=settings.celery_result_backend,
-    include=["app.tasks.price_fetcher"],
+    include=["app.tasks.price_fetcher", "app.tasks.maintenance"],
 )
 
 celery_app.conf.update(
@@ -15,9 +17,25 @@ celery_app.conf.update(
     timezone="UTC",
     enable_utc=True,
     beat_schedule={
-        "fetch-prices-every-minute": {
-            "task": "app.tasks.price_fetcher.fetch_and_save_prices",
-            "schedule": 60.0,  # каждую минуту
+        "refresh-instruments": {
+            "task": "app.tasks.maintenance.refresh_instruments",
+            "schedule": settings.instruments_refresh_interval,
+        },
+        "maintain-partitions-daily": {
+            "task": "app.tasks.maintenance.maintain_partitions",
+            "schedule": crontab(hour=0, minute=5),
+        },
+        # Архивирование до политики хранения, чтобы не удалить неархивированные партиции
+        "archive-prices-daily": {
+            "task": "app.tasks.maintenance.archive_prices",
+            "schedule": crontab(hour=0, minute=0),
         },
     },
 )
+
+if settings.celery_price_polling:
+    celery_app.conf.beat_schedule["fetch-prices-every-minute"] = {
+        "task": "app.tasks.price_fetcher.fetch_and_save_prices",
+        # Ровно на границах POLL_INTERVAL (по умолчанию в начале каждой минуты)
+        "schedule": aligned(settings.poll_interval),
+    }
@@ -2,12 +2,14 @@ import pytest
 import pytest_asyncio
 from datetime import datetime, timedelta
 from decimal import Decimal
+from unittest.mock import patch
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from app.main import app
+from app.cache.latest_price import latest_price_cache
 from app.db.models import Base, Price
-from app.db.database import get_db
+from app.db.database import get_db, get_session_factory
 
 
 # Тестовая база данных
@@ -50,6 +52,8 @@ async def db_session():
 async def client(db_session):
     """Фикстура для создания тестового клиента."""
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: TestSessionLocal
+    latest_price_cache.clear()
     async with AsyncClient(app=app, base_url="http://test") as ac:
         yield ac
     app.dependency_overrides.clear()
@@ -129,6 +133,25 @@ async def test_get_latest_price_not_found(client, db_session):
     assert data["price"] is None
 
 
+@pytest.mark.asyncio
+async def test_get_latest_prices_many(client, db_session, sample_prices):
+    """Тест получения последних цен нескольких тикеров одним запросом."""
+    response = await client.get("/api/prices/latest/many?ticker=eth_usd&ticker=BTC_USD&ticker=ETH_USD")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == 2
+    assert [item["ticker"] for item in data["prices"]] == ["ETH_USD", "BTC_USD"]
+    assert float(data["prices"][0]["price"]["price"]) == 2500.25
+    assert float(data["prices"][1]["price"]["price"]) == 45200.00
+
+
+@pytest.mark.asyncio
+async def test_get_latest_prices_many_invalid_ticker(client):
+    """Тест пакетного запроса с невалидным тикером."""
+    response = await client.get("/api/prices/latest/many?ticker=BTC_USD&ticker=INVALID")
+    assert response.status_code == 400
+
+
 @pytest.mark.asyncio
 async def test_get_prices_by_date(client, db_session, sample_prices):
     """Тест получения цен с фильтром по дате."""
@@ -160,3 +183,177 @@ async def test_get_prices_by_date_invalid_range(client):
         f"/api/prices/filter?ticker=BTC_USD&start_date={start_timestamp}&end_date={end_timestamp}"
     )
     assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_get_all_prices_cursor_pagination(client, db_session, sample_prices):
+    """Тест постраничного получения цен по курсору."""
+    response = await client.get("/api/prices/all?ticker=BTC_USD&limit=2")
+    assert response.status_code == 200
+    first_page = response.json()
+    assert first_page["count"] == 2
+    assert first_page["next_cursor"] is not None
+
+    response = await client.get(
+        f"/api/prices/all?ticker=BTC_USD&limit=2&cursor={first_page['next_cursor']}"
+    )
+    assert response.status_code == 200
+    second_page = response.json()
+    assert second_page["count"] == 1
+    assert second_page["next_cursor"] is None
+
+    timestamps = [p["timestamp"] for p in first_page["prices"] + second_page["prices"]]
+    assert timestamps == sorted(timestamps, reverse=True)
+    assert len(set(timestamps)) == 3
+
+
+@pytest.mark.asyncio
+async def test_get_all_prices_invalid_cursor(client):
+    """Тест получения цен с поврежденным курсором."""
+    response = await client.get("/api/prices/all?ticker=BTC_USD&cursor=invalid")
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_get_prices_columnar_format(client, db_session, sample_prices):
+    """Тест колоночного формата ответа по заголовку Accept."""
+    response = await client.get(
+        "/api/prices/filter?ticker=BTC_USD",
+        headers={"Accept": "application/vnd.deribit.prices.columnar+json"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.deribit.prices.columnar+json"
+    data = response.json()
+    assert data["count"] == 3
+    assert data["timestamps"] == sorted(data["timestamps"], reverse=True)
+    assert len(data["prices"]) == 3
+
+
+@pytest.mark.asyncio
+async def test_get_all_prices_not_acceptable(client):
+    """Тест неподдерживаемого формата ответа."""
+    response = await client.get("/api/prices/all?ticker=BTC_USD", headers={"Accept": "text/html"})
+    assert response.status_code == 406
+
+
+@pytest.mark.asyncio
+async def test_get_all_prices_conditional_get(client, db_session, sample_prices):
+    """Тест ETag и ответа 304 без изменений данных."""
+    response = await client.get("/api/prices/all?ticker=BTC_USD")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "public, max-age=30"
+
+    response = await client.get(
+        "/api/prices/all?ticker=BTC_USD",
+        headers={"If-None-Match": response.headers["etag"]},
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+@pytest.mark.asyncio
+async def test_get_prices_by_date_closed_range_immutable(client, db_session, sample_prices):
+    """Тест неизменяемого закрытого диапазона старше горизонта опоздавших записей."""
+    end_date = sample_prices[1].timestamp
+    with patch("app.api.caching.settings.http_cache_settle_seconds", 30):
+        response = await client.get(f"/api/prices/filter?ticker=BTC_USD&end_date={end_date}")
+    assert response.status_code == 200
+    assert response.json()["count"] == 2
+    assert "immutable" in response.headers["cache-control"]
+
+    # Пока горизонт не прошел, диапазон кэшируется как обычный ряд
+    response = await client.get(f"/api/prices/filter?ticker=BTC_USD&end_date={end_date}")
+    assert response.headers["cache-control"] == "public, max-age=30"
+
+
+@pytest.mark.asyncio
+async def test_get_prices_by_date_closed_range_late_write(client, db_session, sample_prices):
+    """Тест: опоздавшая запись в закрытый диапазон меняет ETag."""
+    end_date = sample_prices[1].timestamp
+    url = f"/api/prices/filter?ticker=BTC_USD&end_date={end_date}"
+    etag = (await client.get(url)).headers["etag"]
+
+    db_session.add(Price(
+        ticker="BTC_USD",
+        price=Decimal("45050.00"),
+        timestamp=sample_prices[0].timestamp + 30,
+        created_at=datetime.utcnow(),
+    ))
+    await db_session.commit()
+
+    response = await client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["count"] == 3
+
+
+@pytest.mark.asyncio
+async def test_export_prices_csv(client, db_session, sample_prices):
+    """Тест потоковой выгрузки цен в CSV."""
+    response = await client.get("/api/prices/export?ticker=BTC_USD&format=csv")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.strip().splitlines()
+    assert lines[0] == "id,ticker,price,timestamp,timestamp_ms,created_at"
+    assert len(lines) == 4
+
+
+@pytest.mark.asyncio
+async def test_export_prices_ndjson(client, db_session, sample_prices):
+    """Тест потоковой выгрузки цен в NDJSON."""
+    import json
+
+    response = await client.get("/api/prices/export?ticker=BTC_USD")
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.strip().splitlines()]
+    assert len(rows) == 3
+    assert [row["timestamp"] for row in rows] == sorted(row["timestamp"] for row in rows)
+
+
+@pytest.mark.asyncio
+async def test_get_ohlc(client, db_session):
+    """Тест получения свечей OHLC (агрегаты заполняются при вставке)."""
+    from app.db.crud import PriceRepository
+
+    now = int(datetime.now().timestamp())
+    await PriceRepository(db_session).bulk_create([
+        {"ticker": "BTC_USD", "price": 45000.50, "timestamp": now - 120},
+        {"ticker": "BTC_USD", "price": 45100.75, "timestamp": now - 60},
+        {"ticker": "BTC_USD", "price": 45200.00, "timestamp": now},
+    ])
+    response = await client.get(
+        f"/api/prices/ohlc?ticker=BTC_USD&interval=1d&start_date={now - 86400}&end_date={now}"
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["interval"] == "1d"
+    assert sum(candle["count"] for candle in data["candles"]) == 3
+    candle = data["candles"][-1]
+    assert Decimal(candle["high"]) >= Decimal(candle["low"])
+
+
+@pytest.mark.asyncio
+async def test_sub_second_prices(client, db_session):
+    """Тест: несколько цен тикера в пределах секунды не конфликтуют."""
+    from app.db.crud import PriceRepository
+
+    now = int(datetime.now().timestamp()) + 10
+    created = await PriceRepository(db_session).bulk_create([
+        {"ticker": "BTC_USD", "price": 45000.50, "timestamp": now, "timestamp_ms": 0},
+        {"ticker": "BTC_USD", "price": 45000.75, "timestamp": now, "timestamp_ms": 750},
+        {"ticker": "BTC_USD", "price": 45000.60, "timestamp": now, "timestamp_ms": 250},
+    ])
+    assert len(created) == 3
+
+    response = await client.get("/api/prices/latest?ticker=BTC_USD")
+    assert response.status_code == 200
+    latest = response.json()["price"]
+    assert (latest["timestamp"], latest["timestamp_ms"]) == (now, 750)
+    assert Decimal(latest["price"]) == Decimal("45000.75")
+
+
+@pytest.mark.asyncio
+async def test_get_ohlc_invalid_interval(client):
+    """Тест получения свечей с неподдерживаемым интервалом."""
+    response = await client.get("/api/prices/ohlc?ticker=BTC_USD&interval=7m")
+    assert response.status_code == 400
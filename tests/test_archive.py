@@ -0,0 +1,224 @@
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import patch
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.archive import PriceArchive
+from app.db.crud import PriceRepository, RollupRepository, split_by_archived_months
+from app.db.models import ROLLUP_MODELS, Price, PriceRollup1d, PriceRollup1m
+from app.db.partitions import month_bounds
+
+
+def make_rows(ticker, timestamps):
+    """Создать строки архива для набора timestamp."""
+    return [
+        (index, ticker, Decimal("100.50000000") + index, timestamp, datetime(2024, 1, 1), 0)
+        for index, timestamp in enumerate(timestamps, start=1)
+    ]
+
+
+def test_archive_write_and_read_range(tmp_path):
+    """Тест записи месяца в Parquet и чтения диапазона."""
+    archive = PriceArchive(str(tmp_path))
+    january_start, _ = month_bounds(2024, 1)
+    february_start, _ = month_bounds(2024, 2)
+    archive.write_month("BTC_USD", 2024, 1, make_rows("BTC_USD", [january_start, january_start + 60]))
+    archive.write_month("BTC_USD", 2024, 2, make_rows("BTC_USD", [february_start]))
+
+    assert archive.archived_months("BTC_USD") == [(2024, 1), (2024, 2)]
+
+    rows = archive.read_range("BTC_USD", start_timestamp=january_start + 1)
+    assert [row[3] for row in rows] == [january_start + 60, february_start]
+    assert rows[0][2] == Decimal("102.50000000")
+    assert archive.read_range("ETH_USD") == []
+
+
+def test_archive_rewrite_skips_duplicates(tmp_path):
+    """Тест повторного архивирования месяца без дублей."""
+    archive = PriceArchive(str(tmp_path))
+    start, _ = month_bounds(2024, 1)
+    archive.write_month("BTC_USD", 2024, 1, make_rows("BTC_USD", [start, start + 60]))
+    archive.write_month("BTC_USD", 2024, 1, make_rows("BTC_USD", [start + 60, start + 120]))
+
+    rows = archive.read_range("BTC_USD")
+    assert [row[3] for row in rows] == [start, start + 60, start + 120]
+
+
+def test_archive_manifest_is_cached(tmp_path):
+    """Тест: список месяцев кэшируется до истечения TTL и сбрасывается записью."""
+    archive = PriceArchive(str(tmp_path), manifest_ttl=3600)
+    writer = PriceArchive(str(tmp_path))
+    january_start, _ = month_bounds(2024, 1)
+    february_start, _ = month_bounds(2024, 2)
+    archive.write_month("BTC_USD", 2024, 1, make_rows("BTC_USD", [january_start]))
+    assert archive.archived_months("BTC_USD") == [(2024, 1)]
+
+    # Месяц, записанный другим процессом, виден после истечения TTL
+    writer.write_month("BTC_USD", 2024, 2, make_rows("BTC_USD", [february_start]))
+    assert archive.archived_months("BTC_USD") == [(2024, 1)]
+    archive.manifest_ttl = 0
+    assert archive.archived_months("BTC_USD") == [(2024, 1), (2024, 2)]
+
+
+def test_archive_read_page(tmp_path):
+    """Тест чтения страницы архива до курсора с нижней границей."""
+    archive = PriceArchive(str(tmp_path))
+    january_start, _ = month_bounds(2024, 1)
+    february_start, _ = month_bounds(2024, 2)
+    archive.write_month("BTC_USD", 2024, 1, make_rows("BTC_USD", [january_start, january_start + 60]))
+    archive.write_month("BTC_USD", 2024, 2, make_rows("BTC_USD", [february_start, february_start + 60]))
+
+    rows = archive.read_page("BTC_USD", 3)
+    assert [row.timestamp for row in rows] == [february_start + 60, february_start, january_start + 60]
+    rows = archive.read_page("BTC_USD", 10, before=(february_start, 1))
+    assert [row.timestamp for row in rows] == [january_start + 60, january_start]
+    rows = archive.read_page("BTC_USD", 10, before=(february_start + 60, 2), floor=january_start + 1)
+    assert [row.timestamp for row in rows] == [february_start, january_start + 60]
+
+
+def test_split_by_archived_months():
+    """Тест разбиения диапазона на архивные месяцы и промежутки."""
+    january = month_bounds(2024, 1)
+    february = month_bounds(2024, 2)
+
+    assert split_by_archived_months(None, None, [january]) == [
+        (None, january[0] - 1, False), (january[0], january[1] - 1, True), (january[1], None, False),
+    ]
+    assert split_by_archived_months(january[0] + 10, february[0] + 10, [january, february]) == [
+        (january[0] + 10, january[1] - 1, True), (february[0], february[0] + 10, True),
+    ]
+
+
+@pytest_asyncio.fixture
+async def archived_repository(tmp_path):
+    """Репозиторий на SQLite: январь 2024 в архиве, февраль и поздняя январская запись в БД."""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Price.__table__.create)
+    january_start, _ = month_bounds(2024, 1)
+    february_start, _ = month_bounds(2024, 2)
+    archive = PriceArchive(str(tmp_path))
+    archive.write_month("BTC_USD", 2024, 1, make_rows("BTC_USD", [january_start, january_start + 60]))
+
+    with patch("app.db.archive.settings.archive_uri", str(tmp_path)), \
+            patch("app.db.archive._archive", None), \
+            patch("app.db.crud.settings.rollups_enabled", False):
+        async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+            repository = PriceRepository(session)
+            await repository.bulk_create([
+                {"ticker": "BTC_USD", "price": Decimal("1"), "timestamp": january_start + 30, "timestamp_ms": 500},
+                {"ticker": "BTC_USD", "price": Decimal("2"), "timestamp": february_start},
+                {"ticker": "BTC_USD", "price": Decimal("3"), "timestamp": february_start + 60},
+            ])
+            yield repository
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_export_stream_includes_archived_months(archived_repository):
+    """Тест: выгрузка объединяет архив и БД по возрастанию времени."""
+    january_start, _ = month_bounds(2024, 1)
+    february_start, _ = month_bounds(2024, 2)
+
+    rows = [
+        row
+        async for partition in archived_repository.stream_by_ticker_and_date_range("BTC_USD", partition_size=2)
+        for row in partition
+    ]
+
+    assert [(row.timestamp, row.timestamp_ms) for row in rows] == [
+        (january_start, 0), (january_start + 30, 500), (january_start + 60, 0),
+        (february_start, 0), (february_start + 60, 0),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_page_rows_include_archived_months(archived_repository):
+    """Тест: keyset-пагинация /all продолжается в архивных месяцах."""
+    timestamps = []
+    cursor = None
+    while True:
+        rows, cursor = await archived_repository.get_page_rows_by_ticker("BTC_USD", limit=2, cursor=cursor)
+        timestamps.extend(row.timestamp for row in rows)
+        if cursor is None:
+            break
+
+    january_start, _ = month_bounds(2024, 1)
+    february_start, _ = month_bounds(2024, 2)
+    assert timestamps == [february_start + 60, february_start, january_start + 60, january_start + 30, january_start]
+
+    rows, _ = await archived_repository.get_page_rows_by_ticker("BTC_USD", limit=2, offset=3)
+    assert [row.timestamp for row in rows] == [january_start + 30, january_start]
+
+
+@pytest.mark.asyncio
+async def test_range_version_changes_on_late_write(archived_repository):
+    """Тест: опоздавшая запись в закрытый диапазон меняет его версию."""
+    january_start, january_end = month_bounds(2024, 1)
+    before = await archived_repository.get_range_version("BTC_USD", None, january_end - 1)
+    assert before.count == 1
+    assert before.max_moment == (january_start + 30) * 1000 + 500
+    assert [version[:2] for version in before.archive] == [(2024, 1)]
+    assert before.modified_at is not None
+
+    await archived_repository.bulk_create([
+        {"ticker": "BTC_USD", "price": Decimal("4"), "timestamp": january_start + 10},
+    ])
+    after = await archived_repository.get_range_version("BTC_USD", None, january_end - 1)
+    assert after.count == 2
+    assert after.max_moment == before.max_moment
+    assert after != before
+
+
+@pytest.mark.asyncio
+async def test_raw_ohlc_includes_archived_months(archived_repository):
+    """Тест: свечи по сырым ценам строятся и по архивным месяцам."""
+    january_start, _ = month_bounds(2024, 1)
+    february_start, _ = month_bounds(2024, 2)
+
+    candles = await archived_repository.get_ohlc("BTC_USD", 86400, january_start, february_start + 3600)
+
+    assert [(candle.bucket, candle.count) for candle in candles] == [(january_start, 3), (february_start, 2)]
+    first = candles[0]
+    assert (first.open, first.low, first.close) == (Decimal("101.50000000"), Decimal("1"), Decimal("102.50000000"))
+
+
+@pytest.mark.asyncio
+async def test_rollup_rebuild_recomputes_archived_months(tmp_path):
+    """Тест: пересчет агрегатов не теряет архивные месяцы."""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        for table in (Price.__table__, *(model.__table__ for model in ROLLUP_MODELS)):
+            await conn.run_sync(table.create)
+    january_start, _ = month_bounds(2024, 1)
+    february_start, _ = month_bounds(2024, 2)
+    PriceArchive(str(tmp_path)).write_month(
+        "BTC_USD", 2024, 1, make_rows("BTC_USD", [january_start, january_start + 60]),
+    )
+
+    with patch("app.db.archive.settings.archive_uri", str(tmp_path)), patch("app.db.archive._archive", None):
+        async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+            await PriceRepository(session).bulk_create([
+                {"ticker": "BTC_USD", "price": Decimal("1"), "timestamp": january_start + 30},
+                {"ticker": "BTC_USD", "price": Decimal("2"), "timestamp": february_start},
+            ])
+            await RollupRepository(session).rebuild(start_timestamp=january_start + 3600)
+
+            result = await session.execute(
+                select(PriceRollup1d.bucket, PriceRollup1d.count, PriceRollup1d.open, PriceRollup1d.close)
+                .order_by(PriceRollup1d.bucket)
+            )
+            days = result.all()
+            minutes = (await session.execute(select(func.sum(PriceRollup1m.count)))).scalar_one()
+    await engine.dispose()
+
+    # Сутки 1 января пересчитаны целиком: архив и поздняя запись из БД
+    assert [tuple(day) for day in days] == [
+        (january_start, 3, Decimal("101.50000000"), Decimal("102.50000000")),
+        (february_start, 1, Decimal("2"), Decimal("2")),
+    ]
+    # Минутные агрегаты до начала диапазона не пересчитывались и не удалялись
+    assert minutes == 2
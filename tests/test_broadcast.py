@@ -0,0 +1,91 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+import pytest
+
+from app.api.broadcast import PriceBroadcaster, TooManySubscribersError, stream_price_events
+from app.api.schemas import PriceResponse
+from app.cache.latest_price import latest_price_cache
+
+
+def make_price(ticker: str, timestamp: int, price: str = "45000.50") -> PriceResponse:
+    """Создать тестовую цену."""
+    return PriceResponse(
+        id=timestamp,
+        ticker=ticker,
+        price=Decimal(price),
+        timestamp=timestamp,
+        created_at=datetime(2024, 1, 1),
+    )
+
+
+def event_prices(chunk: bytes) -> list:
+    """Цены из порции событий SSE."""
+    return [
+        json.loads(line[len(b"data: "):])["price"]
+        for line in chunk.split(b"\n")
+        if line.startswith(b"data: ")
+    ]
+
+
+@pytest.mark.asyncio
+async def test_broadcaster_fans_out_by_ticker():
+    """Тест рассылки цен только подписчикам тикера."""
+    broadcaster = PriceBroadcaster(queue_size=10, max_subscribers=10)
+    btc = broadcaster.subscribe(["BTC_USD"])
+    both = broadcaster.subscribe(["BTC_USD", "ETH_USD"])
+
+    broadcaster.publish([make_price("BTC_USD", 100, "1"), make_price("ETH_USD", 100, "2")])
+
+    assert event_prices(b"".join(await btc.get_many())) == ["1"]
+    assert event_prices(b"".join(await both.get_many())) == ["1", "2"]
+
+    broadcaster.unsubscribe(btc)
+    broadcaster.unsubscribe(both)
+    assert broadcaster.subscriber_count == 0
+    assert broadcaster._subscribers == {}
+
+
+@pytest.mark.asyncio
+async def test_broadcaster_drops_oldest_for_slow_subscriber():
+    """Тест вытеснения старых событий у медленного подписчика."""
+    broadcaster = PriceBroadcaster(queue_size=2, max_subscribers=10)
+    subscription = broadcaster.subscribe(["BTC_USD"])
+
+    broadcaster.publish([make_price("BTC_USD", timestamp, str(timestamp)) for timestamp in (1, 2, 3)])
+    broadcaster.publish([make_price("BTC_USD", 0, "0")])
+
+    assert subscription.dropped == 1
+    assert event_prices(b"".join(await subscription.get_many())) == ["2", "3"]
+
+
+def test_broadcaster_subscriber_limit():
+    """Тест лимита подписчиков."""
+    broadcaster = PriceBroadcaster(queue_size=1, max_subscribers=1)
+    broadcaster.subscribe(["BTC_USD"])
+
+    assert broadcaster.is_full
+    with pytest.raises(TooManySubscribersError):
+        broadcaster.subscribe(["ETH_USD"])
+
+
+@pytest.mark.asyncio
+async def test_stream_price_events():
+    """Тест потока SSE: снимок из кэша, новые цены, heartbeat и отписка."""
+    broadcaster = PriceBroadcaster(queue_size=10, max_subscribers=10)
+    latest_price_cache.clear()
+    latest_price_cache.set(make_price("BTC_USD", 100, "1"))
+    stream = stream_price_events(broadcaster, ["BTC_USD"], heartbeat_interval=0.05)
+    try:
+        assert (await stream.__anext__()).startswith(b"retry:")
+        assert event_prices(await stream.__anext__()) == ["1"]
+
+        broadcaster.publish([make_price("BTC_USD", 200, "2")])
+        assert event_prices(await stream.__anext__()) == ["2"]
+        assert await stream.__anext__() == b": keepalive\n\n"
+        assert broadcaster.subscriber_count == 1
+    finally:
+        await stream.aclose()
+        latest_price_cache.clear()
+
+    assert broadcaster.subscriber_count == 0
@@ -0,0 +1,124 @@
+import fcntl
+import os
+import zlib
+from decimal import Decimal
+import pytest
+
+from app.ingest.buffer import BufferFullError, SegmentBuffer, decode_record, encode_record
+
+
+def make_rows(count: int, start: int = 0) -> list:
+    """Записи о ценах с последовательными timestamp."""
+    return [
+        {"ticker": "BTC_USD", "price": 45000.5 + index, "timestamp": 1704067200 + index, "timestamp_ms": index % 1000}
+        for index in range(start, start + count)
+    ]
+
+
+class Sink:
+    """Приемник пачек журнала с возможностью имитировать сбой БД."""
+
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+
+    async def __call__(self, rows):
+        if self.fail:
+            raise ConnectionError("database is unavailable")
+        self.batches.append(rows)
+
+    @property
+    def rows(self):
+        return [row for batch in self.batches for row in batch]
+
+
+def test_record_roundtrip_and_corruption():
+    """Тест кодирования записи и отбрасывания поврежденных строк."""
+    row = {"ticker": "BTC_USD", "price": Decimal("45000.12345678"), "timestamp": 1704067200, "timestamp_ms": 250}
+    line = encode_record(row)
+    assert decode_record(line) == row
+    assert decode_record(line.replace(b"45000", b"46000")) is None
+    assert decode_record(line[:20]) is None
+
+
+@pytest.mark.parametrize("payload", [
+    b'{"ticker": 1, "price": 2, "timestamp": 3, "timestamp_ms": 4}',
+    b'["BTC_USD", "45000", 1704067200]',
+    b'["BTC_USD", "not a price", 1704067200, 0]',
+    b'42',
+])
+def test_decode_record_rejects_wrong_shape(payload):
+    """Тест: строка с верной CRC, но другой структурой записи отбрасывается."""
+    line = b"%08x %s\n" % (zlib.crc32(payload), payload)
+    assert decode_record(line) is None
+
+
+@pytest.mark.asyncio
+async def test_drain_in_batches_and_remove_segments(tmp_path):
+    """Тест переноса журнала пачками и удаления перенесенных сегментов."""
+    buffer = SegmentBuffer(str(tmp_path), segment_bytes=1024, fsync=False)
+    for start in range(0, 100, 10):
+        await buffer.put(make_rows(10, start))
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".log")]) > 1
+
+    sink = Sink()
+    assert await buffer.drain(sink, batch_size=25) == 100
+    assert [row["timestamp"] for row in sink.rows] == [1704067200 + index for index in range(100)]
+    assert all(len(batch) <= 25 for batch in sink.batches)
+    assert buffer.size_bytes == 0
+
+    assert await buffer.drain(sink) == 0
+
+
+@pytest.mark.asyncio
+async def test_drain_failure_keeps_records(tmp_path):
+    """Тест: при сбое БД записи остаются в журнале и переносятся позже."""
+    buffer = SegmentBuffer(str(tmp_path), fsync=False)
+    await buffer.put(make_rows(5))
+
+    sink = Sink()
+    sink.fail = True
+    with pytest.raises(ConnectionError):
+        await buffer.drain(sink)
+
+    await buffer.put(make_rows(5, start=5))
+    sink.fail = False
+    assert await buffer.drain(sink) == 10
+    assert len(sink.rows) == 10
+
+
+@pytest.mark.asyncio
+async def test_torn_tail_does_not_lose_next_records(tmp_path):
+    """Тест: недописанная строка после аварийной остановки отбрасывается."""
+    buffer = SegmentBuffer(str(tmp_path), fsync=False)
+    buffer.append(make_rows(2))
+    segment_path = os.path.join(tmp_path, sorted(os.listdir(tmp_path))[-1])
+    with open(segment_path, "ab") as segment:
+        segment.write(encode_record(make_rows(1, start=2)[0])[:15])
+    buffer.append(make_rows(1, start=3))
+
+    sink = Sink()
+    assert await buffer.drain(sink) == 3
+    assert [row["timestamp"] for row in sink.rows] == [1704067200, 1704067201, 1704067203]
+
+
+@pytest.mark.asyncio
+async def test_segment_locked_by_another_drainer_is_skipped(tmp_path):
+    """Тест: сегмент, который переносит другой процесс, пропускается."""
+    buffer = SegmentBuffer(str(tmp_path), fsync=False)
+    buffer.append(make_rows(3))
+    segment_path = os.path.join(tmp_path, sorted(name for name in os.listdir(tmp_path) if name.endswith(".log"))[0])
+
+    sink = Sink()
+    with open(segment_path, "rb") as segment:
+        fcntl.flock(segment, fcntl.LOCK_EX)
+        assert await buffer.drain(sink) == 0
+    assert await buffer.drain(sink) == 3
+
+
+def test_buffer_full(tmp_path):
+    """Тест ограничения размера журнала."""
+    buffer = SegmentBuffer(str(tmp_path), max_bytes=500, fsync=False)
+    buffer.append(make_rows(3))
+    with pytest.raises(BufferFullError):
+        buffer.append(make_rows(10))
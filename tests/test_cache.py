@@ -0,0 +1,84 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+import pytest
+
+from app.api.schemas import PriceResponse
+from app.cache.events import PriceEventListener, close_redis, publish_prices
+from app.cache.latest_price import LatestPriceCache
+
+
+def make_price(timestamp: int, price: str = "45000.50", timestamp_ms: int = 0) -> PriceResponse:
+    """Создать тестовую цену."""
+    return PriceResponse(
+        id=timestamp,
+        ticker="BTC_USD",
+        price=Decimal(price),
+        timestamp=timestamp,
+        timestamp_ms=timestamp_ms,
+        created_at=datetime(2024, 1, 1),
+    )
+
+
+def test_latest_price_cache_keeps_newest():
+    """Тест: более старая цена не вытесняет новую."""
+    cache = LatestPriceCache(ttl=60)
+    cache.set(make_price(200, "2"))
+    cache.set(make_price(100, "1"))
+
+    entry = cache.get("BTC_USD")
+    assert entry.price.timestamp == 200
+    assert json.loads(entry.body)["price"]["price"] == "2"
+
+    # В пределах секунды порядок определяет timestamp_ms
+    cache.set(make_price(200, "3", timestamp_ms=500))
+    cache.set(make_price(200, "4", timestamp_ms=250))
+    assert cache.get("BTC_USD").price.price == Decimal("3")
+
+
+def test_latest_price_cache_expires():
+    """Тест истечения TTL."""
+    cache = LatestPriceCache(ttl=60)
+    cache.set(make_price(100))
+    cache._entries["BTC_USD"].expires_at = 0
+
+    assert cache.get("BTC_USD") is None
+
+
+def test_latest_price_cache_disabled():
+    """Тест отключенного кэша."""
+    cache = LatestPriceCache(ttl=0)
+    cache.set(make_price(100))
+
+    assert cache.get("BTC_USD") is None
+
+
+def test_price_event_listener_dispatch_updates_cache():
+    """Тест обновления кэша событием из Redis."""
+    cache = LatestPriceCache(ttl=60)
+    listener = PriceEventListener(handlers=[cache.update_many])
+    payload = [make_price(300, "45300.00").model_dump(mode="json")]
+
+    listener.dispatch(json.dumps(payload))
+
+    entry = cache.get("BTC_USD")
+    assert entry.price.price == Decimal("45300.00")
+
+
+@pytest.mark.asyncio
+@patch("app.cache.events.redis.from_url")
+async def test_publish_prices_reuses_process_client(mock_from_url):
+    """Тест: публикации идут через один клиент Redis на event loop."""
+    client = MagicMock()
+    client.publish = AsyncMock()
+    client.aclose = AsyncMock()
+    mock_from_url.return_value = client
+
+    await publish_prices([make_price(100)])
+    await publish_prices([make_price(200)])
+    await close_redis()
+
+    mock_from_url.assert_called_once()
+    assert client.publish.await_count == 2
+    client.aclose.assert_awaited_once()
@@ -1,14 +1,22 @@
 import pytest
+import pytest_asyncio
 from unittest.mock import AsyncMock, patch
 from aiohttp import ClientResponse
 
-from app.client.deribit_client import DeribitClient
+from app.client.deribit_client import DeribitClient, close_deribit_client, get_deribit_client
+from app.client.resilience import RetryPolicy
+
+
+@pytest_asyncio.fixture
+async def client():
+    """Фикстура клиента с закрытием пула соединений после теста (повторы без задержки)."""
+    async with DeribitClient(retry_policy=RetryPolicy(base_delay=0)) as deribit_client:
+        yield deribit_client
 
 
 @pytest.mark.asyncio
-async def test_get_index_price_success():
+async def test_get_index_price_success(client):
     """Тест успешного получения цены."""
-    client = DeribitClient()
     mock_response_data = {
         "jsonrpc": "2.0",
         "result": {
@@ -33,9 +41,8 @@ async def test_get_index_price_success():
 
 
 @pytest.mark.asyncio
-async def test_get_index_price_not_found():
+async def test_get_index_price_not_found(client):
     """Тест случая, когда цена не найдена в ответе."""
-    client = DeribitClient()
     mock_response_data = {
         "jsonrpc": "2.0",
         "result": {},
@@ -53,10 +60,8 @@ async def test_get_index_price_not_found():
 
 
 @pytest.mark.asyncio
-async def test_get_index_price_http_error():
+async def test_get_index_price_http_error(client):
     """Тест обработки HTTP ошибки."""
-    client = DeribitClient()
-
     with patch("aiohttp.ClientSession.get") as mock_get:
         mock_response = AsyncMock(spec=ClientResponse)
         mock_response.status = 500
@@ -68,11 +73,45 @@ async def test_get_index_price_http_error():
 
 
 @pytest.mark.asyncio
-async def test_get_index_price_client_error():
+async def test_get_index_price_client_error(client):
     """Тест обработки ошибки клиента."""
-    client = DeribitClient()
-
     with patch("aiohttp.ClientSession.get", side_effect=Exception("Connection error")):
         price = await client.get_index_price("BTC_USD")
 
         assert price is None
+
+
+@pytest.mark.asyncio
+async def test_session_is_reused_between_calls():
+    """Тест переиспользования одной HTTP-сессии между запросами."""
+    mock_response_data = {"result": {"index_price": 100.0}}
+
+    async with DeribitClient() as client:
+        session = client._session
+        with patch("aiohttp.ClientSession.get") as mock_get:
+            mock_response = AsyncMock(spec=ClientResponse)
+            mock_response.status = 200
+            mock_response.json = AsyncMock(return_value=mock_response_data)
+            mock_get.return_value.__aenter__.return_value = mock_response
+
+            await client.get_index_price("BTC_USD")
+            await client.get_index_price("ETH_USD")
+
+        assert client._session is session
+        assert mock_get.call_count == 2
+
+    assert client.closed
+
+
+@pytest.mark.asyncio
+async def test_shared_client_is_singleton():
+    """Тест общего клиента процесса."""
+    client = get_deribit_client()
+    assert get_deribit_client() is client
+
+    await client.start()
+    await close_deribit_client()
+
+    assert client.closed
+    assert get_deribit_client() is not client
+    await close_deribit_client()
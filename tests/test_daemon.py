@@ -0,0 +1,88 @@
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+import pytest
+
+from app.ingest.buffer import SegmentBuffer
+from app.ingest.daemon import IngestionDaemon
+from app.ingest.polling import price_row
+
+
+def make_daemon(interval=0.05):
+    """Демон с моками клиента и БД (реестр остается с тикерами по умолчанию)."""
+    session_maker = MagicMock(side_effect=ConnectionError("database is unavailable"))
+    return IngestionDaemon(MagicMock(), session_maker, interval=interval)
+
+
+@pytest.mark.asyncio
+async def test_daemon_polls_and_finishes_current_poll_on_stop():
+    """Тест опросов на границах интервала и корректной остановки."""
+    daemon = make_daemon()
+    polls = []
+    finished = []
+
+    async def poll_and_store(client, session_maker, tickers, buffer):
+        polls.append(list(tickers))
+        await asyncio.sleep(0.03)
+        finished.append(True)
+        return {"success": [{"ticker": ticker, "price": 1.0} for ticker in tickers], "failed": []}
+
+    with patch("app.ingest.daemon.poll_and_store", poll_and_store):
+        task = asyncio.create_task(daemon.run())
+        while len(polls) < 3:
+            await asyncio.sleep(0.005)
+        # Остановка во время опроса: опрос завершается, новые не начинаются
+        daemon.stop()
+        await asyncio.wait_for(task, timeout=1)
+
+    assert len(finished) == len(polls)
+    assert polls[0] == ["BTC_USD", "ETH_USD"]
+    assert daemon.runs == len(polls)
+    assert daemon.health()["status"] == "healthy"
+
+
+@pytest.mark.asyncio
+async def test_daemon_drains_buffer_in_background(tmp_path):
+    """Тест: опрос только пишет в журнал, в БД журнал переносит фоновая задача."""
+    daemon = make_daemon()
+    daemon.buffer = SegmentBuffer(str(tmp_path), fsync=False)
+    stored = []
+
+    async def poll_and_store(client, session_maker, tickers, buffer):
+        await buffer.put([price_row(ticker, 1.0, 1704067200000 + daemon.runs) for ticker in tickers])
+        return {"success": [{"ticker": ticker, "price": 1.0} for ticker in tickers], "failed": []}
+
+    store_batch = AsyncMock(side_effect=lambda session_maker, rows: stored.extend(rows))
+    with patch("app.ingest.daemon.poll_and_store", poll_and_store), \
+            patch("app.ingest.daemon.store_batch", store_batch), \
+            patch("app.ingest.buffer.settings.ingest_buffer_drain_interval", 0.01):
+        task = asyncio.create_task(daemon.run())
+        while len(stored) < 4:
+            await asyncio.sleep(0.005)
+        daemon.stop()
+        await asyncio.wait_for(task, timeout=1)
+
+    assert store_batch.await_args.args[0] is daemon.session_maker
+    assert {row["ticker"] for row in stored} == {"BTC_USD", "ETH_USD"}
+
+
+@pytest.mark.asyncio
+async def test_daemon_health_reports_stale_after_failures():
+    """Тест /health: 503, если успешных опросов нет дольше трех интервалов."""
+    daemon = make_daemon(interval=0.01)
+
+    async def failing_poll_and_store(client, session_maker, tickers, buffer):
+        return {"success": [], "failed": [{"ticker": ticker, "reason": "Price is None"} for ticker in tickers]}
+
+    with patch("app.ingest.daemon.poll_and_store", failing_poll_and_store):
+        await daemon.poll(time.time())
+        await daemon.poll(time.time())
+
+    daemon.started_at -= 60
+    response = await daemon._handle_health(None)
+    state = json.loads(response.text)
+    assert response.status == 503
+    assert state["status"] == "stale"
+    assert state["consecutive_failures"] == 2
+    assert state["last_success_at"] is None
@@ -0,0 +1,70 @@
+from datetime import datetime
+from decimal import Decimal
+import msgpack
+import orjson
+import pyarrow as pa
+import pytest
+
+from app.api.formats import (
+    ARROW_FORMAT,
+    COLUMNAR_JSON_FORMAT,
+    JSON_FORMAT,
+    MSGPACK_FORMAT,
+    dumps_arrow,
+    dumps_columnar_json,
+    dumps_msgpack,
+    negotiate_price_format,
+)
+
+ROWS = [
+    (2, "BTC_USD", Decimal("50001.50000000"), 1704067260, datetime(2024, 1, 1, 0, 1), 500),
+    (1, "BTC_USD", Decimal("50000.12345678"), 1704067200, datetime(2024, 1, 1), 0),
+]
+
+
+@pytest.mark.parametrize(
+    "accept, expected",
+    [
+        (None, JSON_FORMAT),
+        ("*/*", JSON_FORMAT),
+        ("application/json", JSON_FORMAT),
+        ("application/vnd.deribit.prices.columnar+json", COLUMNAR_JSON_FORMAT),
+        ("application/x-msgpack", MSGPACK_FORMAT),
+        ("application/json;q=0.5, application/vnd.apache.arrow.stream", ARROW_FORMAT),
+        ("text/html, application/msgpack;q=0.9, */*;q=0.1", MSGPACK_FORMAT),
+    ],
+)
+def test_negotiate_price_format(accept, expected):
+    """Тест выбора формата по заголовку Accept."""
+    assert negotiate_price_format(accept) is expected
+
+
+def test_negotiate_price_format_not_acceptable():
+    """Тест ошибки для неподдерживаемых форматов."""
+    with pytest.raises(ValueError):
+        negotiate_price_format("text/html, application/json;q=0")
+
+
+def test_columnar_json_and_msgpack():
+    """Тест колоночного JSON и MessagePack."""
+    expected = {
+        "ticker": "BTC_USD",
+        "count": 2,
+        "timestamps": [1704067260, 1704067200],
+        "timestamps_ms": [500, 0],
+        "prices": ["50001.50000000", "50000.12345678"],
+        "next_cursor": "cursor",
+    }
+    assert orjson.loads(dumps_columnar_json("BTC_USD", ROWS, "cursor")) == expected
+    assert msgpack.unpackb(dumps_msgpack("BTC_USD", ROWS, "cursor")) == expected
+
+
+def test_arrow_ipc_stream():
+    """Тест Arrow IPC stream с метаданными."""
+    table = pa.ipc.open_stream(dumps_arrow("BTC_USD", ROWS, "cursor")).read_all()
+
+    assert table.column("timestamp").to_pylist() == [1704067260, 1704067200]
+    assert table.column("timestamp_ms").to_pylist() == [500, 0]
+    assert table.column("price").to_pylist() == [Decimal("50001.50000000"), Decimal("50000.12345678")]
+    assert table.schema.metadata == {b"ticker": b"BTC_USD", b"next_cursor": b"cursor"}
+    assert pa.ipc.open_stream(dumps_arrow("BTC_USD", [])).read_all().num_rows == 0
@@ -0,0 +1,89 @@
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+import pytest
+from starlette.requests import Request
+
+from app.api.caching import cache_headers, http_date, is_not_modified, load_latest_price, price_watermark
+from app.cache.latest_price import LatestPriceCache
+
+
+def make_request(path="/api/prices/all", query="ticker=BTC_USD", headers=None):
+    """Создать запрос Starlette с заголовками."""
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": query.encode(),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+    })
+
+
+def test_cache_headers_depend_on_watermark_and_variant():
+    """Тест ETag по водяному знаку, параметрам и варианту представления."""
+    headers = cache_headers(make_request(), 1704067200, max_age=30)
+
+    assert headers["Cache-Control"] == "public, max-age=30"
+    assert headers["Last-Modified"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+    assert cache_headers(make_request(), 1704067200, max_age=30)["ETag"] == headers["ETag"]
+    assert cache_headers(make_request(), 1704067260, max_age=30)["ETag"] != headers["ETag"]
+    assert cache_headers(make_request(query="ticker=ETH_USD"), 1704067200, max_age=30)["ETag"] != headers["ETag"]
+    assert cache_headers(make_request(), 1704067200, max_age=30, variant="application/msgpack")["ETag"] != headers["ETag"]
+    assert "Last-Modified" not in cache_headers(make_request(), None, max_age=30)
+    assert cache_headers(make_request(), 1, max_age=60, immutable=True)["Cache-Control"] == "public, max-age=60, immutable"
+
+
+def test_is_not_modified_if_none_match():
+    """Тест If-None-Match (приоритетнее If-Modified-Since)."""
+    headers = cache_headers(make_request(), 1704067200, max_age=30)
+    etag = headers["ETag"]
+
+    assert is_not_modified(make_request(headers={"If-None-Match": f'"other", W/{etag}'}), headers, 1704067200)
+    assert is_not_modified(make_request(headers={"If-None-Match": "*"}), headers, 1704067200)
+    assert not is_not_modified(
+        make_request(headers={"If-None-Match": '"other"', "If-Modified-Since": http_date(1704067200)}),
+        headers,
+        1704067200,
+    )
+
+
+def test_is_not_modified_if_modified_since():
+    """Тест If-Modified-Since по водяному знаку."""
+    headers = cache_headers(make_request(), 1704067200, max_age=30)
+
+    assert is_not_modified(make_request(headers={"If-Modified-Since": http_date(1704067200)}), headers, 1704067200)
+    assert not is_not_modified(make_request(headers={"If-Modified-Since": http_date(1704067199)}), headers, 1704067200)
+    assert not is_not_modified(make_request(headers={"If-Modified-Since": "garbage"}), headers, 1704067200)
+    assert not is_not_modified(make_request(), headers, 1704067200)
+
+
+def test_sub_second_watermark():
+    """Тест: ETag меняется внутри секунды, Last-Modified сравнивается по секундам."""
+    first = price_watermark(SimpleNamespace(timestamp=1704067200, timestamp_ms=250))
+    second = price_watermark(SimpleNamespace(timestamp=1704067200, timestamp_ms=750))
+    headers = cache_headers(make_request(), second, max_age=30)
+
+    assert cache_headers(make_request(), first, max_age=30)["ETag"] != headers["ETag"]
+    assert headers["Last-Modified"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+    assert is_not_modified(make_request(headers={"If-Modified-Since": http_date(1704067200)}), headers, second)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ttl", [60, 0])
+async def test_load_latest_price_reads_db_once(ttl):
+    """Тест: при промахе кэша последняя цена читается из БД один раз и возвращается вызывающему."""
+    repository = MagicMock()
+    repository.get_latest_by_ticker = AsyncMock(return_value=SimpleNamespace(
+        id=1, ticker="BTC_USD", price=Decimal("45000.5"), timestamp=1704067200, timestamp_ms=250,
+        created_at=datetime(2024, 1, 1),
+    ))
+
+    with patch("app.api.caching.latest_price_cache", LatestPriceCache(ttl=ttl)) as cache:
+        latest = await load_latest_price(repository, "BTC_USD")
+        assert price_watermark(latest) == 1704067200.25
+        repository.get_latest_by_ticker.assert_awaited_once_with("BTC_USD")
+        if cache.enabled:
+            assert cache.get("BTC_USD").price is latest
+            assert await load_latest_price(repository, "BTC_USD") is latest
+            repository.get_latest_by_ticker.assert_awaited_once()
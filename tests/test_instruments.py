@@ -0,0 +1,119 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.api.schemas import TickerQuery
+from app.cache.instruments import InstrumentRegistry, instrument_registry, load_active_tickers, refresh_instruments
+from app.client.deribit_client import DeribitClient
+from app.client.fake_server import FakeDeribitServer
+from app.client.resilience import RetryPolicy
+from app.db.crud import InstrumentRepository
+from app.db.models import Instrument
+
+
+@pytest_asyncio.fixture
+async def session():
+    """Фикстура сессии SQLite в памяти с таблицей instruments."""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Instrument.__table__.create)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def fake_server():
+    """Фикстура локального фейкового сервера Deribit."""
+    server = FakeDeribitServer(prices={"btc_usd": 45000.0, "sol_usd": 100.0})
+    await server.start()
+    yield server
+    await server.stop()
+
+
+def test_registry_membership_and_replace():
+    """Тест проверки тикера и замены набора."""
+    registry = InstrumentRegistry(["btc_usd"])
+    assert "BTC_USD" in registry
+    assert "SOL_USD" not in registry
+
+    registry.replace(["SOL_USD", "BTC_USD"])
+    registry.replace([])
+    assert registry.tickers == ["BTC_USD", "SOL_USD"]
+
+
+@pytest.mark.asyncio
+async def test_registry_refresh_keeps_known_tickers_without_db(session):
+    """Тест: при недоступной БД опрос получает последние известные тикеры."""
+    await InstrumentRepository(session).sync(["BTC_USD", "SOL_USD"])
+    registry = InstrumentRegistry(["BTC_USD"])
+
+    def failing_factory():
+        raise ConnectionError("database is unavailable")
+
+    assert await registry.refresh(failing_factory) == ["BTC_USD"]
+    assert await registry.refresh(lambda: _SessionContext(session), max_age=0) == ["BTC_USD", "SOL_USD"]
+    # Копия свежая: БД не читается до истечения max_age
+    assert await registry.refresh(failing_factory, max_age=60) == ["BTC_USD", "SOL_USD"]
+
+
+class _SessionContext:
+    """Фабрика сессий поверх уже открытой сессии."""
+
+    def __init__(self, session):
+        self.session = session
+
+    async def __aenter__(self):
+        return self.session
+
+    async def __aexit__(self, *exc_info):
+        return None
+
+
+def test_ticker_query_uses_registry():
+    """Тест валидации тикера по реестру."""
+    tickers = instrument_registry.tickers
+    try:
+        instrument_registry.replace(["SOL_USD"])
+        assert TickerQuery(ticker="sol_usd").ticker == "SOL_USD"
+        with pytest.raises(ValueError, match="Unknown ticker"):
+            TickerQuery(ticker="BTC_USD")
+    finally:
+        instrument_registry.replace(tickers)
+
+
+@pytest.mark.asyncio
+async def test_instrument_sync(session):
+    """Тест синхронизации реестра: добавление, деактивация, возврат."""
+    repository = InstrumentRepository(session)
+    assert await load_active_tickers(session) == ["BTC_USD", "ETH_USD"]
+
+    assert await repository.sync(["btc_usd", "eth_usd"]) == {"added": ["BTC_USD", "ETH_USD"], "deactivated": []}
+    assert await repository.sync(["BTC_USD", "SOL_USD"]) == {"added": ["SOL_USD"], "deactivated": ["ETH_USD"]}
+    assert await repository.get_active_names() == ["BTC_USD", "SOL_USD"]
+    assert await repository.sync(["BTC_USD", "ETH_USD", "SOL_USD"]) == {"added": ["ETH_USD"], "deactivated": []}
+    assert await load_active_tickers(session) == ["BTC_USD", "ETH_USD", "SOL_USD"]
+
+
+@pytest.mark.asyncio
+async def test_refresh_instruments_from_deribit(session, fake_server):
+    """Тест обновления реестра из public/get_index_price_names."""
+    async with DeribitClient(base_url=fake_server.base_url) as client:
+        assert await client.get_index_price_names() == ["BTC_USD", "SOL_USD"]
+        changes = await refresh_instruments(session, client)
+
+    assert changes == {"added": ["BTC_USD", "SOL_USD"], "deactivated": []}
+
+    registry = InstrumentRegistry()
+    assert await registry.load(session) == ["BTC_USD", "SOL_USD"]
+
+
+@pytest.mark.asyncio
+async def test_refresh_instruments_keeps_registry_on_error(session):
+    """Тест: при ошибке Deribit реестр не меняется."""
+    await InstrumentRepository(session).sync(["BTC_USD"])
+    async with DeribitClient(base_url="http://127.0.0.1:1/api/v2", retry_policy=RetryPolicy(max_attempts=1)) as client:
+        changes = await refresh_instruments(session, client)
+
+    assert changes == {"added": [], "deactivated": []}
+    assert await InstrumentRepository(session).get_active_names() == ["BTC_USD"]
@@ -0,0 +1,118 @@
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from prometheus_client import REGISTRY
+
+from app.client.deribit_client import DeribitClient
+from app.client.fake_server import FakeDeribitServer
+from app.client.resilience import RetryPolicy
+from app.main import app
+from app.metrics import IngestionLagCollector, PoolCollector, count_page_rows, observe_query
+
+
+@pytest_asyncio.fixture
+async def fake_server():
+    """Фикстура локального фейкового сервера Deribit."""
+    server = FakeDeribitServer()
+    await server.start()
+    yield server
+    await server.stop()
+
+
+def sample(name: str, **labels) -> float:
+    """Значение метрики из глобального реестра (0, если ее еще нет)."""
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_observe_query_records_duration_and_rows():
+    """Тест учета времени и числа строк методов репозитория."""
+    @observe_query("test_list")
+    async def get_list():
+        return [1, 2, 3]
+
+    @observe_query("test_page", count=count_page_rows)
+    async def get_page():
+        return [1, 2], (10, 1)
+
+    before = sample("deribit_db_rows_sum", method="test_list")
+    assert await get_list() == [1, 2, 3]
+    assert await get_page() == ([1, 2], (10, 1))
+
+    assert sample("deribit_db_rows_sum", method="test_list") == before + 3
+    assert sample("deribit_db_rows_sum", method="test_page") >= 2
+    assert sample("deribit_db_query_duration_seconds_count", method="test_list") >= 1
+
+
+def test_ingestion_lag_collector():
+    """Тест отставания ingestion по последней сохраненной цене тикера."""
+    collector = IngestionLagCollector()
+    now = int(time.time())
+    collector.record([
+        SimpleNamespace(ticker="BTC_USD", timestamp=now - 30),
+        SimpleNamespace(ticker="BTC_USD", timestamp=now - 10),
+        SimpleNamespace(ticker="ETH_USD", timestamp=now - 60),
+    ])
+    collector.record([SimpleNamespace(ticker="BTC_USD", timestamp=now - 50)])
+
+    samples = {sample.labels["ticker"]: sample.value for sample in next(collector.collect()).samples}
+    assert 10 <= samples["BTC_USD"] < 12
+    assert 60 <= samples["ETH_USD"] < 62
+
+
+def test_pool_collector_skips_unavailable_pools():
+    """Тест gauge пулов: закрытые пулы не попадают в метрики."""
+    collector = PoolCollector()
+    collector.register_http_pool("open", lambda: {"limit": 100, "in_use": 3, "idle": 2})
+    collector.register_http_pool("closed", lambda: None)
+
+    families = {family.name: family for family in collector.collect()}
+    limits = {sample.labels["pool"]: sample.value for sample in families["deribit_http_pool_limit"].samples}
+    connections = {
+        (sample.labels["pool"], sample.labels["state"]): sample.value
+        for sample in families["deribit_http_pool_connections"].samples
+    }
+    assert limits == {"open": 100}
+    assert connections == {("open", "in_use"): 3, ("open", "idle"): 2}
+
+
+@pytest.mark.asyncio
+async def test_fetch_duration_and_pool_stats(fake_server):
+    """Тест гистограммы запросов к Deribit по тикеру и состояния пула клиента."""
+    client = DeribitClient(base_url=fake_server.base_url, retry_policy=RetryPolicy(max_attempts=1))
+    assert client.pool_stats() is None
+
+    before = sample("deribit_fetch_duration_seconds_count", ticker="BTC_USD", outcome="ok")
+    async with client:
+        assert await client.get_index_price("btc_usd") is not None
+        fake_server.fail_next(500)
+        assert await client.get_index_price("eth_usd") is None
+        stats = client.pool_stats()
+
+    assert sample("deribit_fetch_duration_seconds_count", ticker="BTC_USD", outcome="ok") == before + 1
+    assert sample("deribit_fetch_duration_seconds_count", ticker="ETH_USD", outcome="error") >= 1
+    assert stats["limit"] == client.pool_limit
+    assert stats["in_use"] == 0
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_without_connector_internals(fake_server):
+    """Тест: без внутренних полей коннектора aiohttp состояние пула неизвестно."""
+    async with DeribitClient(base_url=fake_server.base_url) as client:
+        with patch.object(client._session.connector, "_acquired", None):
+            assert client.pool_stats() is None
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint():
+    """Тест эндпоинта /metrics и учета запросов к API по шаблону маршрута."""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.get("/health")
+        response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'deribit_http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in response.text
@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.db.partitions import add_months, apply_retention, ensure_partitions, month_bounds, partition_name
+
+
+def make_conn(partition_names):
+    """Мок соединения, возвращающий список партиций."""
+    result = MagicMock()
+    result.scalars.return_value = partition_names
+    conn = MagicMock()
+    conn.execute = AsyncMock(return_value=result)
+    return conn
+
+
+def executed_sql(conn):
+    """SQL, выполненный через мок соединения (без запроса списка партиций)."""
+    return [str(call.args[0]) for call in conn.execute.await_args_list[1:]]
+
+
+def test_month_helpers():
+    """Тест вычисления месяцев и границ партиций."""
+    assert add_months(2024, 11, 3) == (2025, 2)
+    assert add_months(2024, 1, -1) == (2023, 12)
+    assert month_bounds(2024, 1) == (1704067200, 1706745600)
+    assert partition_name(2024, 1) == "prices_y2024m01"
+
+
+@pytest.mark.asyncio
+async def test_ensure_partitions_creates_missing_months():
+    """Тест создания недостающих партиций на будущие месяцы."""
+    conn = make_conn(["prices_y2024m12"])
+    now = datetime(2024, 12, 15, tzinfo=timezone.utc)
+
+    created = await ensure_partitions(conn, months_ahead=2, now=now)
+
+    assert created == ["prices_y2025m01", "prices_y2025m02"]
+    assert "FOR VALUES FROM (1735689600) TO (1738368000)" in executed_sql(conn)[1]
+
+
+@pytest.mark.asyncio
+async def test_apply_retention_detaches_old_partitions():
+    """Тест отсоединения партиций старше срока хранения."""
+    conn = make_conn(["prices_y2024m10", "prices_default", "prices_y2024m08", "prices_y2024m09"])
+    now = datetime(2024, 12, 15, tzinfo=timezone.utc)
+
+    retired = await apply_retention(conn, retain_months=3, mode="detach", now=now)
+
+    assert retired == ["prices_y2024m08"]
+    assert executed_sql(conn) == ["ALTER TABLE prices DETACH PARTITION prices_y2024m08"]
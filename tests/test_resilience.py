@@ -0,0 +1,127 @@
+import asyncio
+import time
+from email.utils import formatdate
+import pytest
+import pytest_asyncio
+
+from app.client.deribit_client import DeribitClient
+from app.client.fake_server import FakeDeribitServer
+from app.client.resilience import CircuitBreaker, RetryPolicy, TokenBucket, parse_retry_after
+
+
+@pytest_asyncio.fixture
+async def fake_server():
+    """Фикстура локального фейкового сервера Deribit."""
+    server = FakeDeribitServer()
+    await server.start()
+    yield server
+    await server.stop()
+
+
+def make_client(server, **kwargs) -> DeribitClient:
+    """Клиент фейкового сервера с повторами без задержки."""
+    kwargs.setdefault("retry_policy", RetryPolicy(max_attempts=3, base_delay=0))
+    return DeribitClient(base_url=server.base_url, **kwargs)
+
+
+def test_retry_policy_delay():
+    """Тест экспоненциальной задержки с jitter и приоритета Retry-After."""
+    policy = RetryPolicy(base_delay=0.1, max_delay=0.3)
+    for attempt in range(5):
+        assert 0 <= policy.delay(attempt) <= min(0.3, 0.1 * 2 ** attempt)
+    assert policy.delay(0, retry_after=2.5) == 2.5
+
+
+def test_parse_retry_after():
+    """Тест разбора Retry-After в секундах и датой HTTP."""
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert 8 <= parse_retry_after(formatdate(time.time() + 10, usegmt=True)) <= 10
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_transitions():
+    """Тест размыкания, пробного запроса и замыкания цепи."""
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    await asyncio.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    await asyncio.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_token_bucket_reserve_and_pause():
+    """Тест всплеска, очереди резервирований и паузы."""
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
+
+    bucket = TokenBucket(rate=10, capacity=2)
+    bucket.pause(1.0)
+    assert bucket.reserve() == pytest.approx(1.1, abs=0.01)
+
+
+@pytest.mark.asyncio
+async def test_retries_server_errors(fake_server):
+    """Тест повторов при 5xx."""
+    fake_server.fail_next(503, count=2)
+    async with make_client(fake_server) as client:
+        assert await client.get_index_price("BTC_USD") is not None
+    assert fake_server.rest_requests == 3
+
+
+@pytest.mark.asyncio
+async def test_gives_up_after_max_attempts(fake_server):
+    """Тест отказа после исчерпания попыток."""
+    fake_server.fail_next(500, count=5)
+    async with make_client(fake_server) as client:
+        assert await client.get_index_price("BTC_USD") is None
+    assert fake_server.rest_requests == 3
+
+
+@pytest.mark.asyncio
+async def test_does_not_retry_client_errors(fake_server):
+    """Тест: ошибка запроса (неизвестный индекс) не повторяется."""
+    async with make_client(fake_server) as client:
+        assert await client.get_index_price("UNKNOWN") is None
+    assert fake_server.rest_requests == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_response_honors_retry_after(fake_server):
+    """Тест паузы ограничителя частоты по Retry-After при 429."""
+    fake_server.fail_next(429, headers={"Retry-After": "0.2"})
+    async with make_client(fake_server) as client:
+        started = time.monotonic()
+        assert await client.get_index_price("BTC_USD") is not None
+        assert time.monotonic() - started >= 0.2
+        assert client._breaker("public/get_index_price").failures == 0
+    assert fake_server.rest_requests == 2
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_skips_requests(fake_server):
+    """Тест: при разомкнутой цепи запросы к методу не отправляются."""
+    fake_server.fail_next(500, count=2)
+    async with make_client(fake_server, retry_policy=RetryPolicy(max_attempts=1)) as client:
+        client._breakers["public/get_index_price"] = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        assert await client.get_index_price("BTC_USD") is None
+        assert await client.get_index_price("BTC_USD") is None
+        assert await client.get_index_price("BTC_USD") is None
+        # Другие методы API не затронуты
+        assert await client.get_index_price_names() == ["BTC_USD", "ETH_USD"]
+    assert fake_server.rest_requests == 3
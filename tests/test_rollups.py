@@ -0,0 +1,76 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.crud import RollupRepository, aggregate_prices
+from app.db.models import Price, PriceRollup1d, PriceRollup1h, PriceRollup1m
+
+
+def make_price(timestamp: int, price: str) -> Price:
+    """Создать запись о цене без сохранения в БД."""
+    return Price(ticker="BTC_USD", price=Decimal(price), timestamp=timestamp)
+
+
+def test_aggregate_prices_builds_candles_regardless_of_order():
+    """Тест свертки цен в агрегаты при произвольном порядке записей."""
+    prices = [
+        make_price(3630, "3"),
+        make_price(3600, "1"),
+        make_price(3659, "2"),
+        make_price(3660, "10"),
+    ]
+
+    rows = {row["bucket"]: row for row in aggregate_prices(prices, 60)}
+
+    assert set(rows) == {3600, 3660}
+    first = rows[3600]
+    assert (first["open"], first["high"], first["low"], first["close"]) == (
+        Decimal("1"), Decimal("3"), Decimal("1"), Decimal("2"),
+    )
+    assert first["price_sum"] == Decimal("6")
+    assert first["count"] == 3
+    assert rows[3660]["count"] == 1
+
+
+@pytest.mark.parametrize(
+    "interval_seconds, model",
+    [(60, PriceRollup1m), (300, PriceRollup1m), (3600, PriceRollup1h), (86400, PriceRollup1d)],
+)
+def test_model_for_interval_picks_coarsest_rollup(interval_seconds, model):
+    """Тест выбора самой грубой подходящей таблицы агрегатов."""
+    assert RollupRepository.model_for_interval(interval_seconds) is model
+
+
+def test_aggregate_prices_orders_same_second_by_milliseconds():
+    """Тест open/close по миллисекундам внутри одной секунды."""
+    prices = [
+        Price(ticker="BTC_USD", price=Decimal("2"), timestamp=3600, timestamp_ms=900),
+        Price(ticker="BTC_USD", price=Decimal("1"), timestamp=3600, timestamp_ms=100),
+        Price(ticker="BTC_USD", price=Decimal("3"), timestamp=3600, timestamp_ms=500),
+    ]
+
+    [row] = aggregate_prices(prices, 60)
+
+    assert (row["open"], row["close"]) == (Decimal("1"), Decimal("2"))
+    assert (row["open_moment"], row["close_moment"]) == (3600100, 3600900)
+
+
+@pytest.mark.asyncio
+async def test_apply_keeps_close_when_older_same_second_tick_arrives_later():
+    """Тест: запись той же секунды, пришедшая позже, но более ранняя, не меняет close."""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(PriceRollup1m.__table__.create)
+        await conn.run_sync(PriceRollup1h.__table__.create)
+        await conn.run_sync(PriceRollup1d.__table__.create)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        repository = RollupRepository(session)
+        await repository.apply([Price(ticker="BTC_USD", price=Decimal("2"), timestamp=3600, timestamp_ms=900)])
+        await repository.apply([Price(ticker="BTC_USD", price=Decimal("1"), timestamp=3600, timestamp_ms=100)])
+        await repository.apply([Price(ticker="BTC_USD", price=Decimal("3"), timestamp=3600, timestamp_ms=950)])
+        rollup = await session.get(PriceRollup1m, ("BTC_USD", 3600))
+    await engine.dispose()
+
+    assert (rollup.open, rollup.close, rollup.count) == (Decimal("1"), Decimal("3"), 3)
+    assert (rollup.open_moment, rollup.close_moment) == (3600100, 3600950)
@@ -0,0 +1,72 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+import pytest
+
+from app.ingest.scheduler import aligned, next_boundary, run_aligned
+
+
+def test_next_boundary():
+    """Тест границ интервала, кратных интервалу от начала эпохи."""
+    assert next_boundary(60, 1704067200) == 1704067260
+    assert next_boundary(60, 1704067259.9) == 1704067260
+    assert next_boundary(0.25, 1704067200.3) == pytest.approx(1704067200.5)
+
+
+@pytest.mark.asyncio
+async def test_run_aligned_sub_second_interval():
+    """Тест запусков на границах интервала меньше секунды."""
+    interval = 0.05
+    runs = []
+
+    async def job(boundary):
+        runs.append((boundary, time.time()))
+
+    task = asyncio.create_task(run_aligned(job, interval))
+    await asyncio.sleep(0.3)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert len(runs) >= 3
+    for boundary, started in runs:
+        assert boundary / interval == pytest.approx(round(boundary / interval))
+        assert -0.005 < started - boundary < interval
+    steps = [round((b - a) / interval) for (a, _), (b, _) in zip(runs, runs[1:])]
+    assert set(steps) == {1}
+
+
+@pytest.mark.asyncio
+async def test_run_aligned_skips_missed_boundaries():
+    """Тест: долгий запуск не вызывает серию догоняющих запусков."""
+    interval = 0.05
+    boundaries = []
+
+    async def job(boundary):
+        boundaries.append(boundary)
+        if len(boundaries) == 1:
+            await asyncio.sleep(interval * 3)
+
+    task = asyncio.create_task(run_aligned(job, interval))
+    await asyncio.sleep(interval * 6)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert len(boundaries) >= 2
+    assert round((boundaries[1] - boundaries[0]) / interval) >= 3
+    assert all(boundary > boundaries[0] + interval * 2.5 for boundary in boundaries[1:])
+
+
+def test_aligned_celery_schedule():
+    """Тест расписания Celery beat по границам минуты."""
+    now = datetime(2024, 1, 1, 0, 1, 30, tzinfo=timezone.utc)
+    every_minute = aligned(60, nowfun=lambda: now)
+
+    # Запуск в 00:01:00 - следующий в 00:02:00, а не через минуту после запуска
+    state = every_minute.is_due(datetime(2024, 1, 1, 0, 1, 0, 500000, tzinfo=timezone.utc))
+    assert not state.is_due
+    assert state.next == pytest.approx(30)
+
+    # Граница 00:01:00 пройдена после предыдущего запуска
+    state = every_minute.is_due(datetime(2024, 1, 1, 0, 0, 59, tzinfo=timezone.utc))
+    assert state.is_due
+    assert state.next == pytest.approx(30)
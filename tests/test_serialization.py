@@ -0,0 +1,31 @@
+from datetime import datetime
+from decimal import Decimal
+
+from app.api.schemas import PriceListResponse, PriceResponse
+from app.api.serialization import dumps_price_list
+
+
+def test_dumps_price_list_matches_response_model():
+    """Тест совпадения быстрой сериализации с PriceListResponse."""
+    rows = [
+        (2, "BTC_USD", Decimal("50000.12345678"), 1704067260, datetime(2024, 1, 1, 0, 1, 0, 123456), 250),
+        (1, "BTC_USD", Decimal("50000.00000000"), 1704067200, datetime(2024, 1, 1), 0),
+    ]
+    expected = PriceListResponse(
+        ticker="BTC_USD",
+        count=len(rows),
+        prices=[
+            PriceResponse(
+                id=row[0], ticker=row[1], price=row[2], timestamp=row[3], timestamp_ms=row[5], created_at=row[4],
+            )
+            for row in rows
+        ],
+        next_cursor="cursor",
+    )
+
+    assert dumps_price_list("BTC_USD", rows, next_cursor="cursor") == expected.model_dump_json().encode()
+
+
+def test_dumps_price_list_empty():
+    """Тест сериализации пустого списка."""
+    assert dumps_price_list("ETH_USD", []) == b'{"ticker":"ETH_USD","count":0,"prices":[],"next_cursor":null}'
@@ -0,0 +1,154 @@
+import time
+from collections import Counter
+from unittest.mock import AsyncMock, MagicMock, patch
+import pytest
+
+from app.ingest.sharding import MEMBERS_KEY, ShardMember, assign_tickers, claim_tickers, shard_owner
+
+TICKERS = [f"T{index}_USD" for index in range(300)]
+
+
+class FakePipeline:
+    """Конвейер команд поверх FakeRedis."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return None
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+        return command
+
+    async def execute(self):
+        results = [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+        self.commands = []
+        return results
+
+
+class FakeRedis:
+    """Подмножество команд Redis, которые использует шардирование."""
+
+    def __init__(self):
+        self.values = {}
+        self.sorted_sets = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value.encode()
+        return True
+
+    async def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+    async def zadd(self, key, mapping):
+        self.sorted_sets.setdefault(key, {}).update(mapping)
+
+    async def zremrangebyscore(self, key, low, high):
+        members = self.sorted_sets.get(key, {})
+        for member in [member for member, score in members.items() if score <= high]:
+            del members[member]
+
+    async def zrangebyscore(self, key, low, high):
+        return [member.encode() for member, score in self.sorted_sets.get(key, {}).items() if score >= low]
+
+    async def zrem(self, key, member):
+        self.sorted_sets.get(key, {}).pop(member, None)
+
+    async def aclose(self):
+        return None
+
+
+def test_assign_tickers_is_balanced_and_stable():
+    """Тест: тикеры делятся поровну, при входе участника переходят только к нему."""
+    members = ["a", "b", "c"]
+    assignment = assign_tickers(TICKERS, members)
+    assert sorted(ticker for tickers in assignment.values() for ticker in tickers) == sorted(TICKERS)
+    assert all(60 <= len(tickers) <= 140 for tickers in assignment.values())
+
+    owners = {ticker: shard_owner(ticker, members) for ticker in TICKERS}
+    grown = {ticker: shard_owner(ticker, members + ["d"]) for ticker in TICKERS}
+    moved = [ticker for ticker in TICKERS if owners[ticker] != grown[ticker]]
+    assert moved and all(grown[ticker] == "d" for ticker in moved)
+
+    shrunk = {ticker: shard_owner(ticker, ["a", "c"]) for ticker in TICKERS}
+    assert all(shrunk[ticker] == owners[ticker] for ticker in TICKERS if owners[ticker] != "b")
+
+
+@pytest.mark.asyncio
+async def test_claim_tickers_once_per_tick():
+    """Тест: в пределах тика тикер занимает только один участник."""
+    redis = FakeRedis()
+    assert await claim_tickers(redis, ["BTC_USD", "ETH_USD"], 1, "a", 2.0) == ["BTC_USD", "ETH_USD"]
+    assert await claim_tickers(redis, ["ETH_USD", "SOL_USD"], 1, "b", 2.0) == ["SOL_USD"]
+    # Повтор тем же участником (повторная доставка задачи) не теряет его тикеры
+    assert await claim_tickers(redis, ["BTC_USD"], 1, "a", 2.0) == ["BTC_USD"]
+    assert await claim_tickers(redis, ["ETH_USD"], 2, "b", 2.0) == ["ETH_USD"]
+
+
+@pytest.mark.asyncio
+async def test_shard_members_rebalance_without_double_fetch():
+    """Тест перераспределения при входе и выбывании участника."""
+    redis = FakeRedis()
+    first = ShardMember(redis, member_id="first", ttl=10)
+    second = ShardMember(redis, member_id="second", ttl=10)
+
+    await first.heartbeat()
+    assert await first.claim(TICKERS, 1, 1.0) == TICKERS
+
+    await second.heartbeat()
+    await first.heartbeat()
+    assert first.members == second.members == ["first", "second"]
+    claimed = await first.claim(TICKERS, 2, 1.0) + await second.claim(TICKERS, 2, 1.0)
+    assert Counter(claimed) == Counter(TICKERS)
+
+    # Участник без heartbeat дольше TTL выбывает, его тикеры переходят к остальным
+    redis.sorted_sets[MEMBERS_KEY]["second"] = time.time() - 1
+    await first.heartbeat()
+    assert first.members == ["first"]
+    assert await first.claim(TICKERS, 3, 1.0) == TICKERS
+
+    await first.close()
+    assert "first" not in redis.sorted_sets[MEMBERS_KEY]
+
+
+@pytest.mark.asyncio
+async def test_stale_view_does_not_double_fetch():
+    """Тест: пока второй участник не увидел первого, тикер все равно опрашивается один раз."""
+    redis = FakeRedis()
+    first = ShardMember(redis, member_id="first", ttl=10)
+    late = ShardMember(redis, member_id="late", ttl=10)
+    await first.heartbeat()
+    await late.heartbeat()
+    # first еще не знает о late и считает все тикеры своими
+
+    claimed = await first.claim(TICKERS, 1, 1.0) + await late.claim(TICKERS, 1, 1.0)
+    assert Counter(claimed) == Counter(TICKERS)
+
+
+@patch("app.tasks.price_fetcher.fetch_price_shard")
+@patch("app.tasks.price_fetcher.instrument_registry")
+@patch("app.tasks.price_fetcher.get_session_maker")
+def test_celery_fan_out_to_shard_tasks(mock_get_session_maker, mock_instrument_registry, mock_fetch_price_shard):
+    """Тест разбиения тика Celery на задачи шардов."""
+    from app.tasks.price_fetcher import fetch_and_save_prices
+
+    mock_instrument_registry.refresh = AsyncMock(return_value=TICKERS)
+    mock_get_session_maker.return_value = MagicMock()
+    with patch("app.tasks.price_fetcher.settings.celery_price_shards", 4):
+        result = fetch_and_save_prices()
+
+    dispatched = [call.args[0] for call in mock_fetch_price_shard.apply_async.call_args_list]
+    assert len(dispatched) == 4
+    assert sorted(ticker for tickers, _ in dispatched for ticker in tickers) == sorted(TICKERS)
+    assert {tick for _, tick in dispatched} == {result["tick"]}
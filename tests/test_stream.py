@@ -0,0 +1,116 @@
+import asyncio
+import pytest
+import pytest_asyncio
+
+from app.client.deribit_ws import DeribitWebSocketClient
+from app.client.fake_server import FakeDeribitServer
+from app.ingest.stream import PriceStreamIngestor
+
+
+@pytest_asyncio.fixture
+async def fake_server():
+    """Фикстура локального фейкового сервера Deribit."""
+    server = FakeDeribitServer(tick_interval=0.02)
+    await server.start()
+    yield server
+    await server.stop()
+
+
+async def wait_for(condition, timeout: float = 5.0):
+    """Дождаться выполнения условия."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("Condition was not met in time")
+        await asyncio.sleep(0.01)
+
+
+def make_ingestor(server, batches):
+    """Создать сервис с записью пачек в список."""
+    async def sink(rows):
+        batches.append(rows)
+
+    ws_client = DeribitWebSocketClient(
+        url=server.ws_url,
+        heartbeat_interval=1,
+        reconnect_initial_delay=0.01,
+    )
+    return PriceStreamIngestor(
+        ["BTC_USD", "ETH_USD"],
+        ws_client=ws_client,
+        sink=sink,
+        flush_interval=0.05,
+    )
+
+
+@pytest.mark.asyncio
+async def test_stream_ingestor_writes_batches(fake_server):
+    """Тест записи тиков из подписки микро-пачками."""
+    batches = []
+    task = asyncio.create_task(make_ingestor(fake_server, batches).run())
+    try:
+        await wait_for(lambda: {row["ticker"] for batch in batches for row in batch} == {"BTC_USD", "ETH_USD"})
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    rows = [row for batch in batches for row in batch]
+    keys = [(row["ticker"], row["timestamp"], row["timestamp_ms"]) for row in rows]
+    assert len(keys) == len(set(keys))
+    assert all(row["price"] > 0 for row in rows)
+
+
+@pytest.mark.asyncio
+async def test_stream_ingestor_resubscribes_after_disconnect(fake_server):
+    """Тест переподключения и повторной подписки после обрыва."""
+    batches = []
+    task = asyncio.create_task(make_ingestor(fake_server, batches).run())
+    try:
+        await wait_for(lambda: fake_server.subscribe_count == 1 and batches)
+        await fake_server.drop_connections()
+        await wait_for(lambda: fake_server.subscribe_count == 2)
+        flushed = len(batches)
+        await wait_for(lambda: len(batches) > flushed)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_stream_ingestor_skips_malformed_notifications(fake_server):
+    """Тест: уведомления другого формата пропускаются, сбор продолжается."""
+    batches = []
+    task = asyncio.create_task(make_ingestor(fake_server, batches).run())
+    try:
+        await wait_for(lambda: fake_server.subscribe_count == 1 and batches)
+        for params in [
+            {"channel": "deribit_price_index.btc_usd"},
+            {"channel": "deribit_price_index.btc_usd", "data": {"price": "n/a", "timestamp": 1250}},
+            {"channel": "deribit_price_index.btc_usd", "data": {"price": 1.0}},
+            {"channel": "book.BTC-PERPETUAL.raw", "data": []},
+            {"type": "test_request"},
+            [],
+        ]:
+            await fake_server.send_notification(params)
+        flushed = len(batches)
+        await wait_for(lambda: len(batches) > flushed + 1)
+        assert not task.done()
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_stream_ingestor_keeps_ticks_when_sink_fails(fake_server):
+    """Тест сохранения тиков в буфере при ошибке записи."""
+    async def failing_sink(rows):
+        raise RuntimeError("database is down")
+
+    ingestor = make_ingestor(fake_server, [])
+    ingestor.sink = failing_sink
+    ingestor.add_tick({"channel": "deribit_price_index.btc_usd", "data": {"price": 1.0, "timestamp": 1250}})
+
+    await ingestor.flush()
+
+    assert list(ingestor._pending) == [("BTC_USD", 1250)]
+    assert ingestor._pending[("BTC_USD", 1250)]["timestamp_ms"] == 250
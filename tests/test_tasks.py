@@ -1,9 +1,39 @@
+import asyncio
 import pytest
 from unittest.mock import AsyncMock, patch, MagicMock
 import time
+from functools import partial
 
+from app.cache.instruments import InstrumentRegistry
+from app.client.deribit_client import PriceTick
+from app.ingest.buffer import SegmentBuffer
+from app.ingest.polling import fetch_prices, price_row, store_batch
 from app.tasks.price_fetcher import fetch_and_save_prices
-from app.client.deribit_client import DeribitClient
+
+
+@pytest.fixture(autouse=True)
+def mock_publish_prices():
+    """Мок публикации событий о ценах в Redis."""
+    with patch("app.ingest.polling.publish_prices", new_callable=AsyncMock) as mock_publish:
+        yield mock_publish
+
+
+@pytest.fixture(autouse=True)
+def instrument_registry():
+    """Свежая копия реестра тикеров процесса на каждый тест."""
+    with patch("app.ingest.polling.instrument_registry", InstrumentRegistry(["BTC_USD", "ETH_USD"])) as registry:
+        yield registry
+
+
+@pytest.fixture
+def mock_load_active_tickers():
+    """Мок чтения активных тикеров из реестра инструментов."""
+    with patch(
+        "app.cache.instruments.load_active_tickers",
+        new_callable=AsyncMock,
+        return_value=["BTC_USD", "ETH_USD"],
+    ) as mock_load:
+        yield mock_load
 
 
 @pytest.fixture
@@ -20,32 +50,37 @@ def mock_db_session():
 def mock_price_repository(mock_db_session):
     """Мок репозитория цен."""
     repository = MagicMock()
-    repository.create = AsyncMock()
+    repository.bulk_create = AsyncMock(
+        side_effect=lambda rows: [MagicMock(ticker=row["ticker"]) for row in rows]
+    )
     return repository
 
 
-@patch("app.tasks.price_fetcher.create_session_maker")
-@patch("app.tasks.price_fetcher.PriceRepository")
-@patch("app.tasks.price_fetcher.DeribitClient")
+@patch("app.tasks.price_fetcher.get_session_maker")
+@patch("app.ingest.polling.PriceRepository")
+@patch("app.tasks.price_fetcher.get_deribit_client")
 def test_fetch_and_save_prices_success(
-    mock_client_class,
+    mock_get_client,
     mock_repository_class,
-    mock_create_session_maker,
+    mock_get_session_maker,
     mock_db_session,
     mock_price_repository,
+    mock_load_active_tickers,
 ):
     """Тест успешного получения и сохранения цен."""
     # Настройка моков
     mock_client = MagicMock()
-    mock_client.get_index_price = AsyncMock(side_effect=[45000.50, 2500.25])
-    mock_client_class.return_value = mock_client
+    mock_client.get_index_price_tick = AsyncMock(
+        side_effect=[PriceTick(45000.50, 1704067200123), PriceTick(2500.25, 1704067200987)]
+    )
+    mock_get_client.return_value = mock_client
 
     # Мокируем sessionmaker и его вызов как async context manager
     mock_context_manager = AsyncMock()
     mock_context_manager.__aenter__ = AsyncMock(return_value=mock_db_session)
     mock_context_manager.__aexit__ = AsyncMock(return_value=None)
     mock_session_maker = MagicMock(return_value=mock_context_manager)
-    mock_create_session_maker.return_value = mock_session_maker
+    mock_get_session_maker.return_value = mock_session_maker
     mock_repository_class.return_value = mock_price_repository
 
     # Выполнение задачи
@@ -56,31 +91,36 @@ def test_fetch_and_save_prices_success(
     assert "failed" in result
     assert len(result["success"]) == 2
     assert len(result["failed"]) == 0
-    assert mock_client.get_index_price.call_count == 2
+    assert mock_client.get_index_price_tick.call_count == 2
+    mock_price_repository.bulk_create.assert_awaited_once()
+    rows = mock_price_repository.bulk_create.await_args.args[0]
+    # Каждая цена сохраняется со своим моментом ответа с точностью до миллисекунды
+    assert {(row["timestamp"], row["timestamp_ms"]) for row in rows} == {(1704067200, 123), (1704067200, 987)}
 
 
-@patch("app.tasks.price_fetcher.create_session_maker")
-@patch("app.tasks.price_fetcher.PriceRepository")
-@patch("app.tasks.price_fetcher.DeribitClient")
+@patch("app.tasks.price_fetcher.get_session_maker")
+@patch("app.ingest.polling.PriceRepository")
+@patch("app.tasks.price_fetcher.get_deribit_client")
 def test_fetch_and_save_prices_partial_failure(
-    mock_client_class,
+    mock_get_client,
     mock_repository_class,
-    mock_create_session_maker,
+    mock_get_session_maker,
     mock_db_session,
     mock_price_repository,
+    mock_load_active_tickers,
 ):
     """Тест частичного сбоя при получении цен."""
     # Настройка моков
     mock_client = MagicMock()
-    mock_client.get_index_price = AsyncMock(side_effect=[45000.50, None])
-    mock_client_class.return_value = mock_client
+    mock_client.get_index_price_tick = AsyncMock(side_effect=[PriceTick(45000.50, 1704067200123), None])
+    mock_get_client.return_value = mock_client
 
     # Мокируем sessionmaker и его вызов как async context manager
     mock_context_manager = AsyncMock()
     mock_context_manager.__aenter__ = AsyncMock(return_value=mock_db_session)
     mock_context_manager.__aexit__ = AsyncMock(return_value=None)
     mock_session_maker = MagicMock(return_value=mock_context_manager)
-    mock_create_session_maker.return_value = mock_session_maker
+    mock_get_session_maker.return_value = mock_session_maker
     mock_repository_class.return_value = mock_price_repository
 
     # Выполнение задачи
@@ -92,28 +132,29 @@ def test_fetch_and_save_prices_partial_failure(
     assert result["failed"][0]["ticker"] in ["BTC_USD", "ETH_USD"]
 
 
-@patch("app.tasks.price_fetcher.create_session_maker")
-@patch("app.tasks.price_fetcher.PriceRepository")
-@patch("app.tasks.price_fetcher.DeribitClient")
+@patch("app.tasks.price_fetcher.get_session_maker")
+@patch("app.ingest.polling.PriceRepository")
+@patch("app.tasks.price_fetcher.get_deribit_client")
 def test_fetch_and_save_prices_client_error(
-    mock_client_class,
+    mock_get_client,
     mock_repository_class,
-    mock_create_session_maker,
+    mock_get_session_maker,
     mock_db_session,
     mock_price_repository,
+    mock_load_active_tickers,
 ):
     """Тест обработки ошибки клиента."""
     # Настройка моков
     mock_client = MagicMock()
-    mock_client.get_index_price = AsyncMock(side_effect=Exception("API Error"))
-    mock_client_class.return_value = mock_client
+    mock_client.get_index_price_tick = AsyncMock(side_effect=Exception("API Error"))
+    mock_get_client.return_value = mock_client
 
     # Мокируем sessionmaker и его вызов как async context manager
     mock_context_manager = AsyncMock()
     mock_context_manager.__aenter__ = AsyncMock(return_value=mock_db_session)
     mock_context_manager.__aexit__ = AsyncMock(return_value=None)
     mock_session_maker = MagicMock(return_value=mock_context_manager)
-    mock_create_session_maker.return_value = mock_session_maker
+    mock_get_session_maker.return_value = mock_session_maker
     mock_repository_class.return_value = mock_price_repository
 
     # Выполнение задачи
@@ -121,3 +162,130 @@ def test_fetch_and_save_prices_client_error(
 
     # Проверки
     assert len(result["failed"]) >= 1
+
+
+@patch("app.tasks.price_fetcher.get_ingest_buffer")
+@patch("app.tasks.price_fetcher.get_session_maker")
+@patch("app.ingest.polling.PriceRepository")
+@patch("app.tasks.price_fetcher.get_deribit_client")
+def test_fetch_and_save_prices_buffered_during_db_outage(
+    mock_get_client,
+    mock_repository_class,
+    mock_get_session_maker,
+    mock_get_ingest_buffer,
+    mock_db_session,
+    mock_price_repository,
+    tmp_path,
+):
+    """Тест: при недоступной БД тикеры берутся из реестра в памяти, цены копятся в журнале."""
+    mock_client = MagicMock()
+    mock_client.get_index_price_tick = AsyncMock(side_effect=[
+        PriceTick(45000.50, 1704067200100),
+        PriceTick(2500.25, 1704067200200),
+        PriceTick(45001.00, 1704067260100),
+        PriceTick(2501.00, 1704067260200),
+    ])
+    mock_get_client.return_value = mock_client
+
+    # БД недоступна: не открывается ни одна сессия, в том числе для чтения реестра
+    mock_context_manager = AsyncMock()
+    mock_context_manager.__aenter__ = AsyncMock(side_effect=ConnectionError("database is unavailable"))
+    mock_context_manager.__aexit__ = AsyncMock(return_value=None)
+    mock_get_session_maker.return_value = MagicMock(return_value=mock_context_manager)
+    mock_repository_class.return_value = mock_price_repository
+    mock_get_ingest_buffer.return_value = SegmentBuffer(str(tmp_path), fsync=False)
+
+    result = fetch_and_save_prices()
+    assert len(result["success"]) == 2
+    assert mock_client.get_index_price_tick.call_count == 2
+    assert mock_get_ingest_buffer.return_value.size_bytes > 0
+
+    # Опрос не ждет БД: в БД журнал переносит только сборщик
+    fetch_and_save_prices()
+    mock_price_repository.bulk_create.assert_not_called()
+
+    stored = []
+    mock_context_manager.__aenter__ = AsyncMock(return_value=mock_db_session)
+    mock_price_repository.bulk_create.side_effect = lambda rows: stored.extend(rows) or []
+    buffer = mock_get_ingest_buffer.return_value
+    asyncio.run(buffer.drain(partial(store_batch, mock_get_session_maker.return_value)))
+    assert len(stored) == 4
+    assert buffer.size_bytes == 0
+
+
+@pytest.mark.asyncio
+async def test_fetch_prices_bounded_concurrency_and_timeout():
+    """Тест ограничения параллелизма и таймаута на тикер."""
+    in_flight = 0
+    max_in_flight = 0
+
+    async def get_index_price_tick(ticker):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        try:
+            await asyncio.sleep(1.0 if ticker == "SLOW" else 0.01)
+            return PriceTick(100.0, 1704067200000)
+        finally:
+            in_flight -= 1
+
+    mock_client = MagicMock()
+    mock_client.get_index_price_tick = get_index_price_tick
+    tickers = ["SLOW"] + [f"T{i}" for i in range(9)]
+
+    prices, failed = await fetch_prices(mock_client, tickers, concurrency=3, timeout=0.1)
+
+    assert max_in_flight <= 3
+    assert len(prices) == 9
+    assert failed == [{"ticker": "SLOW", "reason": "Timeout after 0.1s"}]
+
+
+@patch("app.tasks.runtime.create_engine")
+def test_worker_runtime_reuses_loop_and_engine(mock_create_engine):
+    """Тест переиспользования loop и engine между запусками задач."""
+    from app.tasks import runtime
+
+    engine = MagicMock()
+    engine.dispose = AsyncMock()
+    # Пул без учета соединений: мок не попадает в метрики пулов
+    engine.pool = MagicMock(spec=[])
+    mock_create_engine.return_value = engine
+
+    runtime.init_worker_process()
+    loop = runtime.get_loop()
+    session_maker = runtime.get_session_maker()
+
+    assert runtime.run_async(asyncio.sleep(0, result=1)) == 1
+    assert runtime.get_loop() is loop
+    assert runtime.get_session_maker() is session_maker
+    mock_create_engine.assert_called_once()
+
+    runtime.shutdown_worker_process()
+
+    engine.dispose.assert_awaited_once()
+    assert loop.is_closed()
+
+
+@patch("app.tasks.runtime.store_batch", new_callable=AsyncMock)
+@patch("app.tasks.runtime.create_engine")
+def test_worker_buffer_drainer_thread(mock_create_engine, mock_store_batch, tmp_path):
+    """Тест переноса журнала в БД потоком сборщика между задачами."""
+    from app.tasks.runtime import BufferDrainer
+
+    engine = MagicMock()
+    engine.dispose = AsyncMock()
+    mock_create_engine.return_value = engine
+    buffer = SegmentBuffer(str(tmp_path), fsync=False)
+    buffer.append([price_row("BTC_USD", 45000.5, 1704067200123)])
+
+    drainer = BufferDrainer(buffer)
+    drainer.start()
+    deadline = time.time() + 2
+    while not mock_store_batch.await_count and time.time() < deadline:
+        time.sleep(0.01)
+    drainer.stop(timeout=2)
+
+    assert not drainer.is_alive()
+    rows = mock_store_batch.await_args.args[1]
+    assert [(row["ticker"], row["timestamp_ms"]) for row in rows] == [("BTC_USD", 123)]
+    engine.dispose.assert_awaited_once()